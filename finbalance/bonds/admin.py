@@ -1,3 +1,16 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Portfolio, PortfolioBond
+
+
+class PortfolioBondInline(admin.TabularInline):
+    model = PortfolioBond
+    raw_id_fields = ('bond',)
+    extra = 1
+
+
+@admin.register(Portfolio)
+class PortfolioAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'fecha_creacion')
+    search_fields = ('nombre',)
+    inlines = [PortfolioBondInline]
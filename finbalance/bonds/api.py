@@ -0,0 +1,73 @@
+"""
+Serialización de las métricas de bonos para la API JSON.
+"""
+import hashlib
+import json
+import math
+
+from .engine.metrics import ESCALARES, bond_schedule
+from .engine.streaming import needs_streaming
+
+# Campos que se pueden pedir con ?fields= (además de 'flujos' con ?schedule=1)
+CAMPOS = ESCALARES + ('periodos_por_anio', 'periodo_nombre', 'dias_capitalizacion', 'diagnostico_tir')
+
+# Máximo de bonos por consulta en bloque
+MAX_BONOS = 200
+
+
+def parse_fields(valor):
+    """
+    Campos pedidos en ?fields=a,b,c (todos si no se indica). ValueError si alguno no existe
+    """
+    if not valor:
+        return CAMPOS
+    campos = tuple(dict.fromkeys(campo.strip() for campo in valor.split(',') if campo.strip()))
+    desconocidos = [campo for campo in campos if campo not in CAMPOS]
+    if desconocidos:
+        raise ValueError(f"Campos desconocidos: {', '.join(desconocidos)}")
+    return campos
+
+
+def parse_ids(valor):
+    """
+    IDs de ?ids=1,2,3 sin repetir y en el orden pedido. ValueError si no son válidos
+    """
+    try:
+        ids = list(dict.fromkeys(int(parte) for parte in (valor or '').split(',') if parte.strip()))
+    except ValueError:
+        raise ValueError("ids debe ser una lista de números separados por comas")
+    if not ids:
+        raise ValueError("Indique al menos un id en ?ids=")
+    if len(ids) > MAX_BONOS:
+        raise ValueError(f"Como máximo {MAX_BONOS} bonos por consulta")
+    return ids
+
+
+def parse_flag(valor):
+    return (valor or '').lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+
+def _numero(valor):
+    return None if isinstance(valor, float) and math.isnan(valor) else valor
+
+
+def metrics_payload(bond, metricas, campos=CAMPOS, schedule=False):
+    """
+    Diccionario serializable con las métricas pedidas del bono. Las métricas de
+    los cronogramas largos traen sólo una ventana: el completo se construye aparte
+    """
+    datos = {'id': bond.id, 'huella': bond.fingerprint}
+    for campo in campos:
+        datos[campo] = _numero(metricas[campo])
+    if schedule:
+        flujos = bond_schedule(bond) if needs_streaming(bond) else metricas['flujos']
+        datos['flujos'] = flujos.to_dict()
+    return datos
+
+
+def etag(huellas, campos, schedule):
+    """
+    ETag fuerte: depende de las huellas de los bonos y de la forma de la respuesta
+    """
+    datos = json.dumps([list(huellas), list(campos), bool(schedule)])
+    return '"%s"' % hashlib.sha256(datos.encode('utf-8')).hexdigest()
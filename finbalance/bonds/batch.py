@@ -0,0 +1,129 @@
+"""
+Revalorización masiva de bonos en paralelo.
+
+Los bonos se leen como registros planos con .values().iterator(), se agrupan en
+lotes y cada lote se envía a un proceso del pool, que lo valoriza y guarda sus
+instantáneas en bloque. El proceso principal sólo lee los registros y mantiene
+un número acotado de lotes en vuelo, de modo que ni el cálculo ni la escritura
+se serializan en él.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.db import connection
+
+from .engine import INPUT_FIELDS, instrumentation
+from .models import Bond, BondMetrics
+from .snapshots import save_snapshots, stale_q
+from .workers import init_worker, value_and_save
+
+TAMANO_LOTE = 200
+
+# Lotes pendientes por proceso: mantiene ocupado al pool sin leer toda la tabla
+LOTES_EN_VUELO_POR_PROCESO = 2
+
+
+class BatchResult:
+    """
+    Resumen de una revalorización
+    """
+
+    def __init__(self, procesos):
+        self.procesos = procesos
+        self.leidos = 0
+        self.calculados = 0
+        self.errores = []
+        self.segundos = 0.0
+
+    @property
+    def bonos_por_segundo(self):
+        return self.leidos / self.segundos if self.segundos else 0.0
+
+
+def bond_records(queryset, stale_only=False, tamano=TAMANO_LOTE):
+    """
+    Lotes de registros planos (dict) con los datos de entrada de los bonos.
+
+    Se recorre la tabla por id en páginas completas, sin dejar un cursor abierto
+    mientras los procesos escriben (en SQLite eso bloquearía las escrituras).
+    """
+    if stale_only:
+        queryset = queryset.filter(stale_q())
+    registros = queryset.order_by('pk').values('id', *INPUT_FIELDS)
+    ultimo = 0
+    while lote := list(registros.filter(pk__gt=ultimo)[:tamano]):
+        ultimo = lote[-1]['id']
+        yield lote
+
+
+def save_results(resultados):
+    """
+    Guarda en bloque los resultados [(id, huella, metricas)] de value_records
+    """
+    return save_snapshots(
+        BondMetrics.from_metrics(Bond(pk=pk), metricas, huella)
+        for pk, huella, metricas in resultados
+    )
+
+
+def _pool(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'finbalance.settings'), connection.settings_dict['NAME']),
+    )
+
+
+def revalue_bonds(queryset=None, workers=None, chunk_size=TAMANO_LOTE, stale_only=False, progress=None):
+    """
+    Recalcula y guarda las métricas de los bonos del queryset (por defecto, todos).
+
+    workers=1 calcula en el proceso actual, sin pool. `progress(resultado)` se
+    llama cada vez que termina un lote. stale_only=True sólo lee los bonos sin
+    instantánea vigente (ver snapshots.stale_q).
+    """
+    if queryset is None:
+        queryset = Bond.objects.all()
+    workers = workers or os.cpu_count() or 1
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        workers = 1  # Los otros procesos no verían la base en memoria
+    resultado = BatchResult(workers)
+    inicio = time.perf_counter()
+    lotes = bond_records(queryset, stale_only, chunk_size)
+
+    def registrar(cantidad, salida):
+        calculados, errores = salida
+        resultado.leidos += cantidad
+        resultado.calculados += calculados
+        resultado.errores.extend(errores)
+        if progress:
+            progress(resultado)
+
+    def registrar_capturado(cantidad, salida):
+        # Las etapas medidas en el proceso hijo se suman a las de este proceso
+        salida, muestras = salida
+        instrumentation.merge(muestras)
+        registrar(cantidad, salida)
+
+    if workers == 1:
+        for lote in lotes:
+            registrar(len(lote), value_and_save(lote))
+    else:
+        with _pool(workers) as executor:
+            pendientes = {}
+            maximo = workers * LOTES_EN_VUELO_POR_PROCESO
+            for lote in lotes:
+                futuro = executor.submit(instrumentation.capture, instrumentation.is_enabled(), value_and_save, lote)
+                pendientes[futuro] = len(lote)
+                if len(pendientes) >= maximo:
+                    terminados, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                    for futuro in terminados:
+                        registrar_capturado(pendientes.pop(futuro), futuro.result())
+            for futuro in list(pendientes):
+                registrar_capturado(pendientes.pop(futuro), futuro.result())
+
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
@@ -0,0 +1,174 @@
+"""
+Benchmarks del cálculo de métricas de bonos.
+
+Mide por separado cada etapa de calculate_bond_metrics sobre una grilla de
+plazos, frecuencias, tipos de gracia y costes, y compara los resultados contra
+una corrida anterior guardada en JSON.
+"""
+import gc
+import itertools
+import platform
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+
+from .engine import ENGINE_VERSION
+from .engine.metrics import (
+    calculate_bond_metrics, calculate_costes, calculate_duration_convexity, calculate_present_value,
+    calculate_rates, calculate_tcea_emisor, calculate_tcea_emisor_escudo, calculate_trea_bonista,
+    generate_cash_flows,
+)
+from .engine.terms import BondTerms
+from .engine.valuation import discount_factors
+
+ANIOS = (1, 5, 10, 30, 100)
+FRECUENCIAS = (1, 2, 3, 4, 6, 12, 360)  # 360: cupón diario
+GRACIAS = (None, 'parcial', 'total')
+COSTES = {
+    'sin_costes': {},
+    'emisor': {'porcentaje_estructuracion': Decimal('0.45'), 'porcentaje_colocacion': Decimal('0.25'),
+               'porcentaje_flotacion': Decimal('0.15'), 'porcentaje_cavali': Decimal('0.5')},
+    'ambos': {'porcentaje_prima': Decimal('1'), 'porcentaje_estructuracion': Decimal('0.45'),
+              'tipo_estructuracion': 'ambos', 'porcentaje_cavali': Decimal('0.5'), 'tipo_cavali': 'ambos'},
+}
+
+# Grilla reducida para corridas rápidas (p. ej. en cada commit)
+GRILLA_RAPIDA = {
+    'anios': (1, 10, 30),
+    'frecuencias': (1, 12, 360),
+    'gracias': (None, 'total'),
+    'costes': ('sin_costes', 'ambos'),
+}
+
+
+def case_terms(num_anios, frecuencia_cupon, tipo_gracia, costes):
+    """
+    Términos del bono de prueba para un caso de la grilla
+    """
+    return BondTerms(
+        valor_nominal=Decimal('1000'), valor_comercial=Decimal('1050'),
+        num_anios=num_anios, frecuencia_cupon=frecuencia_cupon, dias_por_anio=360,
+        tipo_tasa_interes='efectiva', tasa_interes=Decimal('8'), tasa_anual_descuento=Decimal('6'),
+        impuesto_renta=Decimal('30'), fecha_emision=date(2025, 1, 1),
+        tiene_plazo_gracia=tipo_gracia is not None, tipo_gracia=tipo_gracia,
+        periodos_gracia=min(2, num_anios * frecuencia_cupon - 1) if tipo_gracia else None,
+        **COSTES[costes],
+    )
+
+
+def grid(anios=ANIOS, frecuencias=FRECUENCIAS, gracias=GRACIAS, costes=tuple(COSTES)):
+    """
+    Casos de la grilla como diccionarios (num_anios, frecuencia_cupon, tipo_gracia, costes)
+    """
+    for n, f, g, c in itertools.product(anios, frecuencias, gracias, costes):
+        yield {'num_anios': n, 'frecuencia_cupon': f, 'tipo_gracia': g, 'costes': c}
+
+
+def case_key(caso):
+    return f"{caso['num_anios']}a-{caso['frecuencia_cupon']}f-{caso['tipo_gracia'] or 'sin_gracia'}-{caso['costes']}"
+
+
+# Cada muestra agrupa suficientes llamadas para durar al menos esto (s)
+DURACION_MINIMA_MUESTRA = 0.002
+
+
+def _medir(funcion, repeticiones):
+    """
+    Mejor tiempo (s) por llamada y mediana de `repeticiones` muestras, con el
+    último resultado. Como timeit: las etapas muy rápidas se repiten dentro de
+    cada muestra y el recolector de basura se desactiva mientras se mide.
+    """
+    resultado = funcion()
+    inicio = time.perf_counter()
+    funcion()
+    una_llamada = time.perf_counter() - inicio
+    llamadas = max(1, min(1000, int(DURACION_MINIMA_MUESTRA / max(una_llamada, 1e-9))))
+
+    tiempos = []
+    gc_activo = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            for _ in range(llamadas):
+                funcion()
+            tiempos.append((time.perf_counter() - inicio) / llamadas)
+    finally:
+        if gc_activo:
+            gc.enable()
+    return min(tiempos), statistics.median(tiempos), resultado
+
+
+def time_stages(bond, repeticiones=5):
+    """
+    Tiempos (ms, {'min', 'mediana'}) de cada etapa de calculate_bond_metrics para `bond`.
+
+    Las etapas se encadenan igual que en calculate_bond_metrics: cada una recibe
+    el resultado de la anterior.
+    """
+    ppa = bond.frecuencia_cupon
+    total_periodos = bond.num_anios * ppa
+    _, tep = calculate_rates(bond)
+    cok_periodo = (1 + float(bond.tasa_anual_descuento) / 100) ** (1 / ppa) - 1
+    costes = calculate_costes(bond)
+
+    etapas = {}
+
+    def registrar(nombre, funcion):
+        minimo, mediana, resultado = _medir(funcion, repeticiones)
+        etapas[nombre] = {'min': minimo * 1000, 'mediana': mediana * 1000}
+        return resultado
+
+    flujos = registrar('cronograma', lambda: generate_cash_flows(bond, tep, total_periodos))
+    factores = discount_factors(cok_periodo, flujos.periodo)
+    registrar('valor_presente', lambda: calculate_present_value(flujos, cok_periodo, factores))
+    registrar('duracion_convexidad', lambda: calculate_duration_convexity(flujos, cok_periodo, ppa, factores=factores))
+    _, tir_emisor = registrar('tcea_emisor', lambda: calculate_tcea_emisor(bond, flujos, costes, guess=tep))
+    registrar('tcea_emisor_escudo', lambda: calculate_tcea_emisor_escudo(bond, flujos, costes, guess=tir_emisor.rate))
+    registrar('trea_bonista', lambda: calculate_trea_bonista(bond, flujos, costes, guess=tir_emisor.rate))
+    registrar('total', lambda: calculate_bond_metrics(bond))
+    return etapas, len(flujos)
+
+
+def environment():
+    """Datos del entorno para interpretar los resultados"""
+    return {
+        'engine_version': ENGINE_VERSION,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+
+def _tiempos(fila):
+    """Etapas del motor más las peticiones de detalle, si se midieron"""
+    return {**fila['etapas'], **{clave: fila[clave] for clave in ('detalle', 'detalle_cache') if fila.get(clave)}}
+
+
+def compare(actual, base, umbral=0.2, piso_ms=0.05, medida='min'):
+    """
+    Regresiones de `actual` respecto de `base` (resultados de benchmark_metrics).
+
+    Se reporta una etapa si es más de `umbral` (fracción) más lenta y la
+    diferencia supera `piso_ms`, para no marcar ruido en tiempos muy pequeños.
+    Devuelve [(caso, etapa, ms_base, ms_actual)].
+    """
+    anteriores = {fila['caso_id']: fila for fila in base.get('resultados', [])}
+    regresiones = []
+    for fila in actual['resultados']:
+        anterior = anteriores.get(fila['caso_id'])
+        if anterior is None:
+            continue
+        tiempos = _tiempos(fila)
+        tiempos_base = _tiempos(anterior)
+        for etapa, tiempo in tiempos.items():
+            if etapa not in tiempos_base:
+                continue
+            ms_base, ms_actual = tiempos_base[etapa][medida], tiempo[medida]
+            if ms_actual > ms_base * (1 + umbral) and ms_actual - ms_base > piso_ms:
+                regresiones.append((fila['caso_id'], etapa, ms_base, ms_actual))
+    return regresiones
@@ -0,0 +1,187 @@
+"""
+Caché de resultados calculados por bono (métricas, etapas del cálculo y gráficos).
+
+Las claves se derivan de la huella del bono, por lo que nunca quedan obsoletas:
+si cambian los datos o la versión del motor, cambia la clave. El backend se elige
+en settings.CACHES; por defecto es `cache_backends.InstrumentedLocMemCache`.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db.models import prefetch_related_objects
+
+from .cache_backends import STATS, InstrumentedLocMemCache
+from .engine.planner import ETAPAS, assemble, calculate_incremental, stage_keys
+from .engine.streaming import needs_streaming, stream_bond_metrics
+from .models import Bond
+from .snapshots import aget_bond_metrics, get_bond_metrics
+
+_MISS = object()
+
+
+def memoize(namespace, key, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Devuelve el valor en caché para `key` o lo calcula con `compute()` y lo guarda
+    """
+    cache = caches['default']
+    valor = cache.get(key, _MISS)
+    if valor is not _MISS:
+        STATS.hit(namespace)
+        return valor
+    STATS.miss(namespace)
+    valor = compute()
+    cache.set(key, valor, timeout)
+    return valor
+
+
+async def amemoize(namespace, key, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Como memoize, para vistas asíncronas: `compute()` devuelve una corrutina
+    """
+    cache = caches['default']
+    valor = await cache.aget(key, _MISS)
+    if valor is not _MISS:
+        STATS.hit(namespace)
+        return valor
+    STATS.miss(namespace)
+    valor = await compute()
+    await cache.aset(key, valor, timeout)
+    return valor
+
+
+def metrics_key(bond):
+    return f'bonds:metricas:{bond.fingerprint}'
+
+
+def chart_key(bond, formato='png'):
+    return f'bonds:grafico:{formato}:{bond.fingerprint}'
+
+
+def schedule_json_key(bond):
+    return f'bonds:flujos_json:{bond.fingerprint}'
+
+
+def sensitivity_key(bond, shocks):
+    return f'bonds:sensibilidad:{shocks[0]}:{shocks[-1]}:{len(shocks)}:{bond.fingerprint}'
+
+
+def simulation_key(bond, parametros):
+    valores = ':'.join(f'{campo}={parametros[campo]}' for campo in sorted(parametros))
+    return f'bonds:simulacion:{valores}:{bond.fingerprint}'
+
+
+# Prefijo de las claves de las etapas del cálculo (ver engine.planner)
+ETAPAS_PREFIJO = 'bonds:etapa'
+
+
+def _contar_etapas(recalculadas):
+    for _ in range(len(ETAPAS) - recalculadas):
+        STATS.hit('etapas')
+    for _ in range(recalculadas):
+        STATS.miss('etapas')
+
+
+def planned_bond_metrics(bond):
+    """
+    Calcula las métricas del bono reutilizando las etapas en caché cuyas entradas
+    no cambiaron. Los cronogramas largos se calculan por bloques, sin etapas
+    (la etapa 'cronograma' guardaría el cronograma completo)
+    """
+    if needs_streaming(bond):
+        return stream_bond_metrics(bond)
+    metricas, recalculadas = calculate_incremental(bond, caches['default'], ETAPAS_PREFIJO)
+    _contar_etapas(len(recalculadas))
+    return metricas
+
+
+async def aplanned_bond_metrics(bond, calcular):
+    """
+    Versión asíncrona de planned_bond_metrics: `calcular(terms, conocidas)` es
+    una corrutina que devuelve las etapas que faltan (p. ej. compute_stages en
+    el ejecutor de procesos)
+    """
+    cache = caches['default']
+    claves = stage_keys(bond, ETAPAS_PREFIJO)
+    encontradas = await cache.aget_many(list(claves.values()))
+    conocidas = {nombre: encontradas[clave] for nombre, clave in claves.items() if clave in encontradas}
+    nuevas = {}
+    if len(conocidas) < len(claves):
+        nuevas = await calcular(bond.terms(), conocidas)
+        await cache.aset_many({claves[nombre]: valor for nombre, valor in nuevas.items()})
+    _contar_etapas(len(nuevas))
+    return assemble(bond, {**conocidas, **nuevas})
+
+
+def cached_bond_metrics(bond):
+    """
+    Métricas del bono: caché -> instantánea en base de datos -> cálculo
+    """
+    return memoize('metricas', metrics_key(bond), lambda: get_bond_metrics(bond, planned_bond_metrics))
+
+
+def cached_bonds_metrics(bonds):
+    """
+    Métricas de varios bonos ({id: métricas}) con una sola lectura de la caché
+    y, para los que falten, una sola consulta de instantáneas
+    """
+    cache = caches['default']
+    claves = {metrics_key(bond): bond for bond in bonds}
+    encontradas = cache.get_many(list(claves))
+    faltantes = [bond for clave, bond in claves.items() if clave not in encontradas]
+    for _ in encontradas:
+        STATS.hit('metricas')
+    if faltantes:
+        prefetch_related_objects(faltantes, 'metricas')
+        calculadas = {}
+        for bond in faltantes:
+            STATS.miss('metricas')
+            calculadas[metrics_key(bond)] = get_bond_metrics(bond, planned_bond_metrics)
+        cache.set_many(calculadas)
+        encontradas.update(calculadas)
+    return {bond.id: encontradas[clave] for clave, bond in claves.items()}
+
+
+async def acached_bond_metrics(bond, calcular):
+    """
+    Versión asíncrona de cached_bond_metrics; `calcular(bond)` es una corrutina
+    """
+    return await amemoize('metricas', metrics_key(bond), lambda: aget_bond_metrics(bond, calcular))
+
+
+BOND_COUNT_KEY = 'bonds:total'
+
+
+def bond_count_estimate(timeout=300):
+    """
+    Total aproximado de bonos: se recalcula cada `timeout` segundos o al crear/eliminar
+    """
+    return memoize('conteo', BOND_COUNT_KEY, Bond.objects.count, timeout)
+
+
+async def abond_count_estimate(timeout=300):
+    return await amemoize('conteo', BOND_COUNT_KEY, Bond.objects.acount, timeout)
+
+
+def invalidate_bond_count():
+    caches['default'].delete(BOND_COUNT_KEY)
+
+
+async def ainvalidate_bond_count():
+    await caches['default'].adelete(BOND_COUNT_KEY)
+
+
+def cache_report():
+    """
+    Datos para la página de estadísticas de la caché
+    """
+    cache = caches['default']
+    reporte = {
+        'backend': f'{type(cache).__module__}.{type(cache).__qualname__}',
+        'stats': STATS.summary(),
+        'evictions': STATS.evictions,
+        'entries': None,
+        'total_bytes': None,
+    }
+    if isinstance(cache, InstrumentedLocMemCache):
+        reporte['entries'] = cache.entries()
+        reporte['total_bytes'] = cache.total_bytes
+    return reporte
@@ -0,0 +1,140 @@
+"""
+Backends de caché instrumentados (sin dependencias de los modelos).
+"""
+import pickle
+import threading
+from collections import defaultdict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+# Bytes ocupados por cada caché local (compartido entre hilos, como LocMemCache)
+_tamanos = {}
+
+
+class CacheStats:
+    """
+    Contadores de aciertos, fallos y expulsiones del proceso actual
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = defaultdict(int)
+            self.misses = defaultdict(int)
+            self.evictions = 0
+
+    def hit(self, namespace):
+        with self._lock:
+            self.hits[namespace] += 1
+
+    def miss(self, namespace):
+        with self._lock:
+            self.misses[namespace] += 1
+
+    def evicted(self, cantidad=1):
+        with self._lock:
+            self.evictions += cantidad
+
+    def summary(self):
+        """Resumen por espacio de nombres: aciertos, fallos y tasa de aciertos"""
+        with self._lock:
+            filas = []
+            for namespace in sorted(set(self.hits) | set(self.misses)):
+                hits, misses = self.hits[namespace], self.misses[namespace]
+                total = hits + misses
+                filas.append({
+                    'namespace': namespace,
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': hits / total * 100 if total else 0.0,
+                })
+            return filas
+
+
+STATS = CacheStats()
+
+
+class InstrumentedLocMemCache(LocMemCache):
+    """
+    LocMemCache acotado por número de entradas y por bytes, con expulsión LRU.
+
+    OPTIONS admite, además de MAX_ENTRIES y CULL_FREQUENCY, MAX_BYTES (tamaño
+    máximo de los valores serializados). Las expulsiones se cuentan en STATS.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._max_bytes = params.get('OPTIONS', {}).get('MAX_BYTES')
+        self._tamano = _tamanos.setdefault(name, [0])
+
+    def _evict_lru(self):
+        key, valor = self._cache.popitem()
+        del self._expire_info[key]
+        self._tamano[0] -= len(valor)
+        STATS.evicted()
+
+    def _limit_bytes(self):
+        while self._max_bytes and self._tamano[0] > self._max_bytes and len(self._cache) > 1:
+            self._evict_lru()
+
+    def _cull(self):
+        if self._cull_frequency == 0:
+            STATS.evicted(len(self._cache))
+            self._cache.clear()
+            self._expire_info.clear()
+            self._tamano[0] = 0
+        else:
+            for _ in range(max(len(self._cache) // self._cull_frequency, 1)):
+                self._evict_lru()
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        # La entrada anterior se quita antes de escribir: así la expulsión dentro
+        # de super()._set no puede sacarla (y descontarla) otra vez
+        anterior = self._cache.pop(key, None)
+        if anterior is not None:
+            self._tamano[0] -= len(anterior)
+        super()._set(key, value, timeout)
+        self._tamano[0] += len(value)
+        self._limit_bytes()
+
+    def incr(self, key, delta=1, version=None):
+        # Como LocMemCache.incr, que reemplaza el valor sin pasar por _set
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if self._has_expired(key):
+                self._delete(key)
+                raise ValueError("Key '%s' not found" % key)
+            anterior = self._cache[key]
+            nuevo_valor = pickle.loads(anterior) + delta
+            valor = pickle.dumps(nuevo_valor, self.pickle_protocol)
+            self._cache[key] = valor
+            self._cache.move_to_end(key, last=False)
+            self._tamano[0] += len(valor) - len(anterior)
+            self._limit_bytes()
+        return nuevo_valor
+
+    def _delete(self, key):
+        valor = self._cache.get(key)
+        borrado = super()._delete(key)
+        if borrado:
+            self._tamano[0] -= len(valor)
+        return borrado
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._tamano[0] = 0
+
+    def entries(self):
+        """Claves y tamaño en bytes de cada entrada, de la más a la menos reciente"""
+        with self._lock:
+            return [(key, len(valor)) for key, valor in self._cache.items()]
+
+    @property
+    def total_bytes(self):
+        return self._tamano[0]
@@ -0,0 +1,47 @@
+"""
+Gráficos de los bonos con la API orientada a objetos de matplotlib.
+
+No se usa pyplot: cada gráfico crea su propia Figure, por lo que es seguro
+renderizar desde varios hilos a la vez. matplotlib se importa recién al dibujar
+el primer gráfico, para no cargarlo al arrancar cada worker o comando.
+"""
+from io import BytesIO
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# Con más periodos se dejan las marcas y etiquetas del eje X a matplotlib
+MAX_PERIODOS_DETALLE = 40
+
+
+def render_recovery_chart(flujos, formato='png'):
+    """
+    Gráfico de recuperación de capital (saldo pendiente vs. dinero recuperado)
+    """
+    from matplotlib.figure import Figure
+
+    periodos = flujos.periodo
+    saldo_pendiente = flujos.saldo
+    recuperado = flujos.saldo[0] - flujos.saldo  # Diferencia desde el inicial
+    marcador = 'o' if len(periodos) <= MAX_PERIODOS_DETALLE else None
+
+    # Crear gráfico
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
+    ax.plot(periodos, saldo_pendiente, label="Saldo Pendiente", color='red', marker=marcador)
+    ax.plot(periodos, recuperado, label="Dinero Recuperado", color='green', marker=marcador)
+
+    # Personalizar
+    ax.set_title("Recuperación de Capital")
+    ax.set_xlabel("Periodos")
+    ax.set_ylabel("Monto ($)")
+    ax.grid(True)
+    ax.legend()
+    if len(periodos) <= MAX_PERIODOS_DETALLE:
+        ax.set_xticks(periodos)
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format=formato)
+    return buffer.getvalue()
@@ -0,0 +1,110 @@
+"""
+Ejecutor acotado para el trabajo de CPU de las vistas asíncronas.
+
+El cálculo de métricas y el dibujo de gráficos se envían a un pool de procesos
+propio (FINBALANCE_COMPUTE_WORKERS procesos), así no ocupan el bucle de eventos
+ni los hilos que atienden las peticiones baratas (listado, API). Como mucho
+FINBALANCE_COMPUTE_QUEUE tareas esperan además de las que se están ejecutando;
+si la cola está llena se lanza ComputeBusy y la vista responde 503. Los
+procesos corren con menor prioridad (nice) para que, aun con pocos núcleos, el
+sistema operativo atienda primero a los procesos que sirven peticiones.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from .engine import instrumentation
+
+
+class ComputeBusy(Exception):
+    """No hay lugar en la cola del ejecutor de cálculo"""
+
+
+def _bajar_prioridad(incremento):
+    if incremento and hasattr(os, 'nice'):
+        os.nice(incremento)
+
+
+class BoundedExecutor:
+    """
+    Pool de procesos con un límite de tareas en curso más en espera.
+
+    Con workers=0 las tareas se ejecutan en el mismo hilo que las pide (sin
+    aislamiento; sólo para depurar o comparar en pruebas de carga).
+    """
+
+    def __init__(self, workers, cola, nice=0):
+        self.workers = workers
+        self.cola = cola
+        self.nice = nice
+        self._lugares = threading.BoundedSemaphore(max(workers, 1) + cola)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_bajar_prioridad, initargs=(self.nice,),
+                )
+            return self._pool
+
+    def _descartar_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, funcion, *args):
+        """
+        Ejecuta funcion(*args) en el pool y espera el resultado sin bloquear el bucle
+        """
+        if not self._lugares.acquire(blocking=False):
+            raise ComputeBusy
+        try:
+            if not self.workers:
+                return funcion(*args)
+            pool = self._get_pool()
+            try:
+                resultado, muestras = await asyncio.get_running_loop().run_in_executor(
+                    pool, instrumentation.capture, instrumentation.is_enabled(), funcion, *args,
+                )
+            except BrokenProcessPool:
+                # Un proceso murió: la próxima tarea arranca un pool nuevo
+                self._descartar_pool(pool)
+                raise
+            # Las etapas medidas en el proceso hijo cuentan para esta petición
+            instrumentation.merge(muestras)
+            return resultado
+        finally:
+            self._lugares.release()
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Ejecutor compartido del proceso, creado según la configuración actual"""
+    global _executor
+    with _executor_lock:
+        configuracion = (
+            settings.FINBALANCE_COMPUTE_WORKERS, settings.FINBALANCE_COMPUTE_QUEUE, settings.FINBALANCE_COMPUTE_NICE,
+        )
+        if _executor is None or (_executor.workers, _executor.cola, _executor.nice) != configuracion:
+            if _executor is not None:
+                _executor.shutdown()
+            _executor = BoundedExecutor(*configuracion)
+        return _executor
@@ -0,0 +1,58 @@
+"""
+Motor de cálculo financiero de bonos (sin dependencias de Django).
+"""
+import hashlib
+import json
+from decimal import Decimal
+
+# Subir este número cuando cambie cualquier resultado del motor: invalida las
+# métricas guardadas y las entradas en caché calculadas con la versión anterior.
+ENGINE_VERSION = 2
+
+# Campos del bono que determinan sus métricas
+INPUT_FIELDS = (
+    'valor_nominal',
+    'valor_comercial',
+    'num_anios',
+    'frecuencia_cupon',
+    'dias_por_anio',
+    'tipo_tasa_interes',
+    'capitalizacion',
+    'tasa_interes',
+    'tasa_anual_descuento',
+    'impuesto_renta',
+    'fecha_emision',
+    'tiene_plazo_gracia',
+    'periodos_gracia',
+    'tipo_gracia',
+    'porcentaje_prima',
+    'tipo_prima',
+    'porcentaje_estructuracion',
+    'tipo_estructuracion',
+    'porcentaje_colocacion',
+    'tipo_colocacion',
+    'porcentaje_flotacion',
+    'tipo_flotacion',
+    'porcentaje_cavali',
+    'tipo_cavali',
+    'metodo_amortizacion',
+)
+
+
+def _canonical(valor):
+    """
+    Representación estable de un valor de entrada ('8', 8.0 y Decimal('8.00') coinciden)
+    """
+    if valor is None or isinstance(valor, bool):
+        return valor
+    if isinstance(valor, (int, float, Decimal)):
+        return format(Decimal(str(valor)).normalize(), 'f')
+    return str(valor)
+
+
+def fingerprint(bond, campos=INPUT_FIELDS):
+    """
+    Huella SHA-256 de los datos de entrada del bono y de la versión del motor
+    """
+    datos = [ENGINE_VERSION] + [_canonical(getattr(bond, campo)) for campo in campos]
+    return hashlib.sha256(json.dumps(datos, ensure_ascii=False).encode('utf-8')).hexdigest()
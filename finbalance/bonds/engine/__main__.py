@@ -0,0 +1,134 @@
+"""
+Valoriza bonos desde la línea de comandos, sin Django.
+
+    python -m bonds.engine cartera.csv
+    python -m bonds.engine cartera.json --output-format csv -o resultados.csv
+    cat bono.json | python -m bonds.engine - --format json --schedule
+    python -m bonds.engine diarios.csv --streaming --schedule --window 0:30
+
+La entrada es un CSV con encabezados o un JSON (objeto, lista de objetos o
+{"bonos": [...]}) con los nombres de los campos del bono.
+"""
+import argparse
+import csv
+import json
+import math
+import sys
+
+from .metrics import ESCALARES, calculate_bond_metrics
+from .streaming import VENTANA, stream_bond_metrics
+from .terms import BondTerms
+
+
+def read_terms(archivo, formato):
+    """
+    Genera (número, BondTerms o excepción) por cada bono del archivo
+    """
+    if formato == 'json':
+        datos = json.load(archivo)
+        if isinstance(datos, dict):
+            datos = datos.get('bonos', [datos])
+        filas = enumerate(datos, start=1)
+    else:
+        filas = enumerate(csv.DictReader(archivo), start=1)
+    for numero, fila in filas:
+        if not isinstance(fila, dict):
+            yield numero, ValueError("cada bono debe ser un objeto")
+            continue
+        try:
+            terms = BondTerms.from_mapping(fila)
+        except (ValueError, TypeError, ArithmeticError) as e:
+            yield numero, e
+            continue
+        if terms.id is None:
+            terms.id = numero
+        yield numero, terms
+
+
+def _numero(valor):
+    return None if isinstance(valor, float) and math.isnan(valor) else valor
+
+
+def parse_window(valor):
+    """
+    Ventana 'INICIO:FIN' del cronograma (filas desde 0, FIN excluido)
+    """
+    inicio, separador, fin = valor.partition(':')
+    try:
+        inicio, fin = int(inicio), int(fin)
+    except ValueError:
+        raise argparse.ArgumentTypeError("la ventana debe tener la forma INICIO:FIN")
+    if not separador or inicio < 0 or fin < inicio:
+        raise argparse.ArgumentTypeError("la ventana debe tener la forma INICIO:FIN con 0 <= INICIO <= FIN")
+    return inicio, fin
+
+
+def price(terms, schedule=False, exact=False, streaming=False, ventana=VENTANA):
+    """
+    Resultado serializable (dict) de valorizar un bono.
+
+    Con streaming=True el cronograma no se construye completo y, con schedule,
+    sólo se incluyen las filas de `ventana`.
+    """
+    if streaming:
+        metricas = stream_bond_metrics(terms, ventana=ventana)
+    else:
+        metricas = calculate_bond_metrics(terms, exact=exact)
+    resultado = {'id': terms.id, **{clave: _numero(metricas[clave]) for clave in ESCALARES}}
+    resultado['diagnostico_tir'] = metricas['diagnostico_tir']
+    if schedule:
+        resultado['flujos'] = metricas['flujos'].to_dict()
+        if streaming:
+            resultado['total_periodos'] = metricas['total_periodos']
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bonds.engine', description="Valoriza bonos desde un archivo CSV o JSON")
+    parser.add_argument('archivo', help="Archivo de entrada ('-' para leer de la entrada estándar)")
+    parser.add_argument('--format', choices=('csv', 'json'), help="Formato de entrada (por defecto, según la extensión)")
+    parser.add_argument('--output-format', choices=('json', 'csv'), default='json', help="Formato de salida")
+    parser.add_argument('-o', '--output', help="Archivo de salida (por defecto, la salida estándar)")
+    parser.add_argument('--schedule', action='store_true', help="Incluir el cronograma de pagos (sólo JSON)")
+    parser.add_argument('--exact', action='store_true', help="Duración y convexidad en Decimal")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Calcular por bloques, con memoria constante (bonos muy largos o diarios)")
+    parser.add_argument('--window', type=parse_window, default=VENTANA, metavar='INICIO:FIN',
+                        help="Filas del cronograma a incluir con --streaming --schedule (por defecto, 0:60)")
+    args = parser.parse_args(argv)
+    if args.streaming and args.exact:
+        parser.error("--exact no se puede combinar con --streaming")
+
+    formato = args.format or ('json' if args.archivo.lower().endswith('.json') else 'csv')
+    entrada = sys.stdin if args.archivo == '-' else open(args.archivo, encoding='utf-8-sig', newline='')
+    salida = sys.stdout if not args.output else open(args.output, 'w', encoding='utf-8', newline='')
+
+    errores = 0
+    resultados = []
+    with entrada:
+        for numero, terms in read_terms(entrada, formato):
+            try:
+                if isinstance(terms, Exception):
+                    raise terms
+                resultados.append(price(terms, schedule=args.schedule, exact=args.exact,
+                                        streaming=args.streaming, ventana=args.window))
+            except (ValueError, TypeError, ArithmeticError) as e:
+                # Un bono inválido no detiene al resto; se reporta y el código de salida es 1
+                errores += 1
+                print(f"Bono {numero}: {e}", file=sys.stderr)
+
+    if args.output_format == 'csv':
+        writer = csv.writer(salida)
+        writer.writerow(('id', *ESCALARES))
+        for resultado in resultados:
+            writer.writerow([resultado['id'], *(resultado[clave] for clave in ESCALARES)])
+    else:
+        json.dump(resultados, salida, ensure_ascii=False, indent=2)
+        salida.write('\n')
+    if salida is not sys.stdout:
+        salida.close()
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
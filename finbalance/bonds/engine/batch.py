@@ -0,0 +1,33 @@
+"""
+Valorización de lotes de bonos en los procesos de trabajo.
+
+Los procesos reciben registros planos (diccionarios con los datos de entrada del
+bono), no instancias del ORM, y este módulo no importa Django: se puede ejecutar
+en cualquier proceso sin configurar el proyecto.
+"""
+from . import fingerprint
+from .streaming import bounded_bond_metrics
+from .terms import BondTerms
+
+
+def value_records(registros):
+    """
+    Calcula las métricas de cada registro.
+
+    Cada registro trae 'id', los INPUT_FIELDS y, opcionalmente, 'huella_guardada'
+    (la huella de la instantánea existente): si coincide, el bono se omite.
+    Devuelve (resultados, errores) con resultados = [(id, huella, metricas)] y
+    errores = [(id, mensaje)].
+    """
+    resultados = []
+    errores = []
+    for registro in registros:
+        try:
+            bono = BondTerms.from_mapping(registro)
+            huella = fingerprint(bono)
+            if registro.get('huella_guardada') == huella:
+                continue
+            resultados.append((bono.id, huella, bounded_bond_metrics(bono)))
+        except (ArithmeticError, ValueError, TypeError) as e:
+            errores.append((registro['id'], str(e)))
+    return resultados, errores
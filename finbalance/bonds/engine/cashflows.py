@@ -0,0 +1,215 @@
+"""
+Cronograma de pagos por el método francés en forma columnar.
+
+Los montos de cada concepto (cuota, interés, amortización, saldo, prima) se
+guardan en un único bloque NumPy, una fila contigua por concepto, y se
+construyen en una sola pasada usando las fórmulas cerradas de cada fase
+(gracia total, gracia parcial y periodo normal). Los periodos son siempre
+consecutivos, así que no se guardan: basta el primero.
+"""
+import numpy as np
+
+COLUMNAS = ('periodo', 'cuota', 'interes', 'amortizacion', 'saldo', 'prima', 'prima_calculo')
+
+# Columnas guardadas en el bloque de montos, en este orden
+MONTOS = COLUMNAS[1:]
+
+
+def _monto(indice):
+    return property(lambda self: self.montos[indice], doc=f"Columna '{MONTOS[indice]}' (vista del bloque, sin copia)")
+
+
+class CashFlowSchedule:
+    """
+    Cronograma de pagos: un bloque NumPy (conceptos x periodos) y el primer periodo
+    """
+    __slots__ = ('montos', 'primer_periodo')
+
+    def __init__(self, periodo, cuota, interes, amortizacion, saldo, prima, prima_calculo):
+        periodo = np.asarray(periodo)
+        if np.any(np.diff(periodo) != 1):
+            raise ValueError("Los periodos del cronograma deben ser consecutivos")
+        self.primer_periodo = int(periodo[0]) if len(periodo) else 1
+        self.montos = np.array([cuota, interes, amortizacion, saldo, prima, prima_calculo], dtype=float)
+        self.montos.shape = (len(MONTOS), len(periodo))
+
+    @classmethod
+    def from_block(cls, montos, primer_periodo=1):
+        """
+        Cronograma sobre un bloque (len(MONTOS) x periodos) ya construido, sin copiarlo
+        """
+        cronograma = cls.__new__(cls)
+        cronograma.montos = montos
+        cronograma.primer_periodo = primer_periodo
+        return cronograma
+
+    cuota = _monto(0)
+    interes = _monto(1)
+    amortizacion = _monto(2)
+    saldo = _monto(3)
+    prima = _monto(4)
+    prima_calculo = _monto(5)
+
+    @property
+    def periodo(self):
+        return np.arange(self.primer_periodo, self.primer_periodo + len(self))
+
+    def __len__(self):
+        return self.montos.shape[1]
+
+    def __getitem__(self, indice):
+        """
+        Con un slice, el sub-cronograma como vista del mismo bloque; con un
+        entero, la fila como diccionario
+        """
+        if isinstance(indice, slice):
+            inicio, fin, paso = indice.indices(len(self))
+            if paso != 1:
+                raise ValueError("Sólo se admiten rangos consecutivos de periodos")
+            return CashFlowSchedule.from_block(self.montos[:, inicio:max(inicio, fin)], self.primer_periodo + inicio)
+        fila = range(len(self))[indice]
+        return dict(zip(COLUMNAS, (self.primer_periodo + fila, *self.montos[:, fila].tolist())))
+
+    def __iter__(self):
+        """Filas como diccionarios, generadas una por una"""
+        for fila in range(len(self)):
+            yield self[fila]
+
+    @property
+    def flujo_total(self):
+        """Cuota más la prima efectivamente pagada en cada periodo"""
+        return self.cuota + self.prima_calculo
+
+    def to_dict(self, columnas=COLUMNAS, decimales=None):
+        """
+        Columnas como listas (serializable en JSON), opcionalmente redondeadas
+        """
+        if decimales is None:
+            return {nombre: getattr(self, nombre).tolist() for nombre in columnas}
+        return {
+            nombre: getattr(self, nombre).tolist() if nombre == 'periodo' else np.round(getattr(self, nombre), decimales).tolist()
+            for nombre in columnas
+        }
+
+    @classmethod
+    def from_dict(cls, datos):
+        """
+        Reconstruye el cronograma desde el resultado de to_dict()
+        """
+        return cls(**{nombre: datos[nombre] for nombre in COLUMNAS})
+
+    def as_rows(self, inicio=0, fin=None):
+        """
+        Filas [inicio, fin) del cronograma como lista de diccionarios, para las plantillas
+        """
+        ventana = self[inicio:fin]
+        columnas = [ventana.periodo.tolist(), *ventana.montos.tolist()]
+        return [dict(zip(COLUMNAS, fila)) for fila in zip(*columnas)]
+
+
+def cuota_francesa(valor, tep, periodos):
+    """
+    Cuota constante que amortiza `valor` en `periodos` pagos a la tasa `tep`
+    """
+    if periodos <= 0:
+        return 0.0
+    if tep == 0:
+        return valor / periodos
+    return (valor * tep) / (1 - (1 + tep) ** -periodos)
+
+
+def build_schedule(valor_nominal, tep, total_periodos, periodos_gracia=0, tipo_gracia=None, prima_pct=0.0,
+                   inicio=0, fin=None):
+    """
+    Construye el cronograma completo sin recorrer los periodos en Python.
+
+    Durante la gracia total el interés se capitaliza; en cualquier otro tipo de
+    gracia sólo se paga el interés. La cuota constante se calcula sobre el valor
+    nominal y el saldo residual se liquida en el último periodo. Con `inicio` y
+    `fin` sólo se construyen las filas [inicio, fin) (índices desde 0), con los
+    mismos valores que tendrían en el cronograma completo.
+    """
+    n = int(total_periodos)
+    g = min(int(periodos_gracia or 0), n)
+    gracia_total = tipo_gracia == 'total'
+    factor = 1 + tep
+    inicio = min(max(int(inicio), 0), n)
+    fin = n if fin is None else min(max(int(fin), inicio), n)
+    i = np.arange(inicio, fin)
+    filas = len(i)
+    # Las filas de gracia son siempre un prefijo del rango
+    k = min(max(g - inicio, 0), filas)
+
+    # Periodos sobre los que la cuota constante amortiza el valor nominal
+    periodos_cuota = n - int(periodos_gracia or 0) if tipo_gracia in ('total', 'parcial') else n
+    cuota_constante = cuota_francesa(valor_nominal, tep, periodos_cuota)
+
+    # Saldo al inicio de cada periodo (fórmulas cerradas por fase)
+    saldo_inicial = np.empty(filas)
+    if gracia_total:
+        saldo_inicial[:k] = valor_nominal * factor ** i[:k]
+        saldo_post_gracia = valor_nominal * factor ** g
+    else:
+        saldo_inicial[:k] = valor_nominal
+        saldo_post_gracia = valor_nominal
+
+    j = i[k:] - g
+    if tep == 0:
+        saldo_inicial[k:] = saldo_post_gracia - cuota_constante * j
+    elif len(j):
+        # Saldo = valor presente de las cuotas que faltan (una anualidad) más el
+        # interés capitalizado en la gracia total, que sigue creciendo a la tasa.
+        # Escrito así no se restan dos términos grandes casi iguales, como en
+        # saldo * (1 + tep)^j - cuota * ((1 + tep)^j - 1) / tep, que pierde toda
+        # la precisión en cronogramas largos o con tasas altas.
+        log_factor = np.log1p(tep)
+        anualidad = valor_nominal / -np.expm1(-periodos_cuota * log_factor)
+        saldo_inicial[k:] = anualidad * -np.expm1((j - periodos_cuota) * log_factor)
+        if gracia_total:
+            saldo_inicial[k:] += valor_nominal * np.expm1(g * log_factor) * np.exp(j * log_factor)
+
+    interes = saldo_inicial * tep
+    cuota = np.full(filas, cuota_constante)
+    amortizacion = cuota - interes
+    interes_mostrado = interes.copy()
+
+    if gracia_total:
+        cuota[:k] = 0
+        amortizacion[:k] = 0
+        interes_mostrado[:k] = 0
+        saldo = np.empty(filas)
+        saldo[:k] = saldo_inicial[:k] + interes[:k]
+        saldo[k:] = saldo_inicial[k:] - amortizacion[k:]
+    else:
+        cuota[:k] = interes[:k]
+        amortizacion[:k] = 0
+        saldo = saldo_inicial - amortizacion
+
+    ultimo = filas and fin == n
+    # Ajustar último periodo para evitar saldo residual
+    if ultimo and saldo[-1] > 0.01:
+        amortizacion[-1] += saldo[-1]
+        cuota[-1] = interes_mostrado[-1] + amortizacion[-1]
+        saldo[-1] = 0
+
+    # La prima se calcula sobre el valor nominal y se paga en el último periodo
+    prima_calculo = np.zeros(filas)
+    prima = np.zeros(filas)
+    if ultimo:
+        prima_calculo[-1] = (prima_pct / 100) * valor_nominal
+        prima[-1] = (prima_pct / 100) * amortizacion[-1]
+
+    montos = np.stack((cuota, interes_mostrado, amortizacion, saldo, prima, prima_calculo))
+    np.round(montos, 2, out=montos)
+    return CashFlowSchedule.from_block(montos, inicio + 1)
+
+
+def iter_schedule(valor_nominal, tep, total_periodos, periodos_gracia=0, tipo_gracia=None, prima_pct=0.0,
+                  bloque=4096):
+    """
+    Genera el cronograma por bloques de `bloque` periodos (cada uno, un CashFlowSchedule)
+    """
+    n = int(total_periodos)
+    for inicio in range(0, n, bloque):
+        yield build_schedule(valor_nominal, tep, n, periodos_gracia, tipo_gracia, prima_pct,
+                             inicio=inicio, fin=inicio + bloque)
@@ -0,0 +1,25 @@
+"""
+Fechas de pago del cronograma de un bono.
+
+Con frecuencias que dividen el año en meses enteros (anual, semestral, ...,
+mensual) cada pago cae el mismo día del mes que la emisión, o el último día
+del mes si ese día no existe. Con frecuencias mayores (diaria) los periodos
+duran dias_por_anio / frecuencia_cupon días, contados desde la emisión.
+"""
+import numpy as np
+
+
+def payment_dates(fecha_emision, frecuencia_cupon, dias_por_anio, total_periodos):
+    """
+    Fecha de pago de cada periodo 1..total_periodos (arreglo datetime64[D])
+    """
+    emision = np.datetime64(fecha_emision, 'D')
+    k = np.arange(1, int(total_periodos) + 1)
+    if 12 % frecuencia_cupon == 0:
+        meses = np.datetime64(emision, 'M') + k * (12 // frecuencia_cupon)
+        inicio_mes = meses.astype('datetime64[D]')
+        dias_mes = (meses + 1).astype('datetime64[D]') - inicio_mes
+        dia = emision - np.datetime64(emision, 'M').astype('datetime64[D]')
+        return inicio_mes + np.minimum(dia, dias_mes - 1)
+    dias = np.rint(k * (dias_por_anio / frecuencia_cupon)).astype('timedelta64[D]')
+    return emision + dias
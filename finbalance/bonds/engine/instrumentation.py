@@ -0,0 +1,209 @@
+"""
+Medición de tiempos por etapa (cronograma, TIR, ORM, plantillas, ...).
+
+Está desactivada por defecto: `stage()` devuelve entonces un contexto vacío
+compartido y no mide nada. Activada, cada etapa suma su duración a:
+- las etapas de la petición en curso (para la cabecera Server-Timing), y
+- un histograma global por etapa con buckets logarítmicos de tamaño fijo, del
+  que se estiman p50/p95/p99.
+
+Las etapas medidas en otro proceso (pool de cálculo, revalorización) no llegan
+solas a la petición ni a los histogramas del proceso principal: la tarea se
+ejecuta con capture(), que devuelve sus muestras junto al resultado, y el
+proceso principal las suma con merge().
+
+No depende de Django, así que el motor puede usarla directamente.
+"""
+import bisect
+import math
+import threading
+import time
+from contextvars import ContextVar
+
+_activa = False
+
+# Etapas medidas en la petición actual: {nombre: segundos}
+_peticion = ContextVar('finbalance_etapas', default=None)
+
+# Muestras [(nombre, segundos)] que capture() devuelve al proceso principal
+_capturadas = ContextVar('finbalance_muestras', default=None)
+
+# Límites superiores de los buckets (s): de 10 µs a ~100 s, 20 buckets por década
+LIMITES = tuple(10 ** (exp / 20) for exp in range(-100, 41))
+
+CUANTILES = (0.5, 0.95, 0.99)
+
+
+def enable(activa=True):
+    global _activa
+    _activa = activa
+
+
+def is_enabled():
+    return _activa
+
+
+class Histogram:
+    """
+    Conteos por bucket de duraciones; memoria constante sin importar las muestras
+    """
+    __slots__ = ('conteos', 'total', 'suma', 'maximo')
+
+    def __init__(self):
+        self.conteos = [0] * (len(LIMITES) + 1)
+        self.total = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def add(self, segundos):
+        self.conteos[bisect.bisect_left(LIMITES, segundos)] += 1
+        self.total += 1
+        self.suma += segundos
+        self.maximo = max(self.maximo, segundos)
+
+    def quantile(self, q):
+        """Límite superior del bucket donde cae el cuantil `q` (acotado por el máximo)"""
+        if not self.total:
+            return math.nan
+        objetivo = q * self.total
+        acumulado = 0
+        for indice, conteo in enumerate(self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return min(LIMITES[indice] if indice < len(LIMITES) else self.maximo, self.maximo)
+        return self.maximo
+
+
+class _Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histogramas = {}
+
+    def add(self, nombre, segundos):
+        with self._lock:
+            histograma = self.histogramas.get(nombre)
+            if histograma is None:
+                histograma = self.histogramas[nombre] = Histogram()
+            histograma.add(segundos)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                nombre: {
+                    'count': h.total,
+                    'sum': h.suma,
+                    'max': h.maximo,
+                    'quantiles': {q: h.quantile(q) for q in CUANTILES},
+                }
+                for nombre, h in sorted(self.histogramas.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self.histogramas = {}
+
+
+REGISTRO = _Registro()
+
+
+def record(nombre, segundos):
+    """Registra una duración ya medida"""
+    muestras = _capturadas.get()
+    if muestras is not None:
+        muestras.append((nombre, segundos))
+        return
+    REGISTRO.add(nombre, segundos)
+    etapas = _peticion.get()
+    if etapas is not None:
+        etapas[nombre] = etapas.get(nombre, 0.0) + segundos
+
+
+class _Etapa:
+    __slots__ = ('nombre', 'inicio')
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+class _Nada:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NADA = _Nada()
+
+
+def stage(nombre):
+    """
+    Contexto que mide la etapa `nombre`:
+
+        with stage('cronograma'):
+            flujos = generate_cash_flows(...)
+    """
+    return _Etapa(nombre) if _activa else _NADA
+
+
+def capture(activa, funcion, *args):
+    """
+    Ejecuta funcion(*args) (en otro proceso) con la medición `activa` y devuelve
+    (resultado, muestras); el proceso que la pidió registra las muestras con merge()
+    """
+    enable(activa)
+    token = _capturadas.set([])
+    try:
+        resultado = funcion(*args)
+        return resultado, _capturadas.get()
+    finally:
+        _capturadas.reset(token)
+
+
+def merge(muestras):
+    """Registra en este proceso (y en la petición en curso) las muestras de capture()"""
+    for nombre, segundos in muestras:
+        record(nombre, segundos)
+
+
+def begin_request():
+    """Empieza a acumular las etapas de una petición; devuelve el token para end_request"""
+    return _peticion.set({})
+
+
+def end_request(token):
+    """Termina la petición y devuelve sus etapas {nombre: segundos}"""
+    etapas = _peticion.get() or {}
+    _peticion.reset(token)
+    return etapas
+
+
+def server_timing(etapas):
+    """Valor de la cabecera Server-Timing para las etapas dadas (duraciones en ms)"""
+    return ', '.join(f'{nombre};dur={segundos * 1000:.2f}' for nombre, segundos in etapas.items())
+
+
+def prometheus_text(prefijo='finbalance_stage_seconds'):
+    """
+    Resumen de todas las etapas en el formato de texto de Prometheus
+    """
+    lineas = [
+        f'# HELP {prefijo} Duración de cada etapa instrumentada.',
+        f'# TYPE {prefijo} summary',
+    ]
+    for nombre, datos in REGISTRO.snapshot().items():
+        for q, valor in datos['quantiles'].items():
+            lineas.append(f'{prefijo}{{stage="{nombre}",quantile="{q}"}} {valor:.6g}')
+        lineas.append(f'{prefijo}_sum{{stage="{nombre}"}} {datos["sum"]:.6g}')
+        lineas.append(f'{prefijo}_count{{stage="{nombre}"}} {datos["count"]}')
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,300 @@
+"""
+Cálculo de las métricas financieras de un bono (método francés).
+
+Las funciones sólo leen atributos del bono, por lo que no dependen de Django.
+"""
+from .cashflows import build_schedule
+from .instrumentation import stage
+from .solver import solve_irr, annualize
+from .valuation import discount_factors, present_value, duration_convexity, duration_convexity_exact
+
+
+# Resultados numéricos de calculate_bond_metrics (además del cronograma y diagnósticos)
+ESCALARES = (
+    'tea', 'tep', 'cok_periodo', 'precio_actual', 'utilidad',
+    'duracion', 'convexidad', 'duracion_modificada', 'total_ratios',
+    'tcea_emisor', 'tcea_emisor_escudo', 'trea_bonista',
+    'costes_emisor', 'costes_bonista',
+)
+
+
+def calculate_bond_metrics(bond, exact=False):
+    """
+    Calcula todas las métricas financieras para un bono usando el método francés.
+
+    exact=True calcula la duración y convexidad en Decimal (modo auditoría).
+    """
+    # Cálculos básicos
+    periodos_por_anio = bond.frecuencia_cupon
+    total_periodos = bond.num_anios * periodos_por_anio
+    dias_capitalizacion = bond.dias_por_anio // periodos_por_anio
+    
+    # Convertir a float para cálculos matemáticos
+    tasa_descuento = float(bond.tasa_anual_descuento)
+    
+    # Cálculo de tasas (TEA y tasa efectiva por periodo)
+    tea, tep = calculate_rates(bond)
+    
+    # COK (Costo de oportunidad del capital)
+    cok_anual = tasa_descuento / 100
+    cok_periodo = (1 + cok_anual) ** (1 / periodos_por_anio) - 1
+    
+    # Cálculo de costes
+    costes_data = calculate_costes(bond)
+    costes_bonista = costes_data['bonista']
+    
+    # Generar flujos de caja (cronograma columnar)
+    with stage('cronograma'):
+        flujos = generate_cash_flows(bond, tep, total_periodos)
+    
+    # Factores de descuento compartidos por el precio y la duración
+    with stage('valor_presente'):
+        factores = discount_factors(cok_periodo, flujos.periodo)
+        # Cálculo del precio actual (valor presente)
+        precio_actual = calculate_present_value(flujos, cok_periodo, factores)
+    
+    # Cálculo de duración y convexidad (devuelve 4 valores)
+    with stage('duracion_convexidad'):
+        duracion, convexidad, duracion_modificada, total_ratios = calculate_duration_convexity(
+            flujos, cok_periodo, periodos_por_anio, factores=factores, exact=exact
+        )
+    
+    # Cálculo de TCEAs y TREA: cada TIR parte de la anterior (la primera, de la TEP)
+    with stage('tcea_emisor'):
+        tcea_emisor, tir_emisor = calculate_tcea_emisor(bond, flujos, costes_data, guess=tep)
+    with stage('tcea_emisor_escudo'):
+        tcea_emisor_escudo, tir_escudo = calculate_tcea_emisor_escudo(bond, flujos, costes_data, guess=tir_emisor.rate)
+    with stage('trea_bonista'):
+        trea_bonista, tir_bonista = calculate_trea_bonista(bond, flujos, costes_data, guess=tir_emisor.rate)
+    
+    # Utilidad/Pérdida (ahora ambos son float)
+    utilidad = -float(bond.valor_comercial) - costes_bonista + precio_actual
+    
+    
+    return {
+        'periodos_por_anio': periodos_por_anio,
+        'periodo_nombre': get_periodo_name(periodos_por_anio),
+        'dias_capitalizacion': dias_capitalizacion,
+        'tea': tea * 100,
+        'tep': tep * 100,
+        'cok_periodo': cok_periodo * 100,
+        'flujos': flujos,
+        'precio_actual': precio_actual,
+        'utilidad': utilidad,
+        'duracion': duracion,
+        'convexidad': convexidad,
+        'duracion_modificada': duracion_modificada,
+        'total_ratios': total_ratios,  # Usar el valor calculado
+        'tcea_emisor': tcea_emisor * 100,
+        'tcea_emisor_escudo': tcea_emisor_escudo * 100,
+        'trea_bonista': trea_bonista * 100,
+        'costes_emisor': costes_data['emisor'],
+        'costes_bonista': costes_data['bonista'],
+        'diagnostico_tir': {
+            'tcea_emisor': tir_emisor.to_dict(),
+            'tcea_emisor_escudo': tir_escudo.to_dict(),
+            'trea_bonista': tir_bonista.to_dict(),
+        },
+    }
+
+def calculate_rates(bond, tasa_interes=None):
+    """
+    Devuelve (TEA, TEP) del bono como fracciones.
+
+    `tasa_interes` (en %) reemplaza la tasa del bono, p. ej. para escenarios.
+    """
+    tasa_interes = float(bond.tasa_interes if tasa_interes is None else tasa_interes)
+    if bond.tipo_tasa_interes == 'efectiva':
+        tea = tasa_interes / 100
+    else:  # nominal
+        capitalizacion = bond.capitalizacion or 1
+        tea = (1 + (tasa_interes / 100) / capitalizacion) ** capitalizacion - 1
+    tep = (1 + tea) ** (1 / bond.frecuencia_cupon) - 1
+    return tea, tep
+
+def bond_schedule(bond, inicio=0, fin=None):
+    """
+    Sólo el cronograma de pagos del bono, sin valorizarlo; con `inicio` y `fin`,
+    sólo las filas [inicio, fin)
+    """
+    _, tep = calculate_rates(bond)
+    return generate_cash_flows(bond, tep, bond.num_anios * bond.frecuencia_cupon, inicio, fin)
+
+def calculate_costes(bond):
+    """
+    Calcula los costes iniciales del emisor y bonista
+    """
+    valor_comercial = float(bond.valor_comercial)
+    
+    costes_emisor = 0
+    costes_bonista = 0
+    
+    
+    # Estructuración
+    estr_pct = float(bond.porcentaje_estructuracion or 0)
+    estr_monto = (estr_pct / 100) * valor_comercial
+    if bond.tipo_estructuracion == 'emisor':
+        costes_emisor += estr_monto
+    elif bond.tipo_estructuracion == 'bonista':
+        costes_bonista += estr_monto
+    elif bond.tipo_estructuracion == 'ambos':
+        costes_emisor += estr_monto
+        costes_bonista += estr_monto
+    
+    # Colocación
+    coloc_pct = float(bond.porcentaje_colocacion or 0)
+    coloc_monto = (coloc_pct / 100) * valor_comercial
+    if bond.tipo_colocacion == 'emisor':
+        costes_emisor += coloc_monto
+    elif bond.tipo_colocacion == 'bonista':
+        costes_bonista += coloc_monto
+    elif bond.tipo_colocacion == 'ambos':
+        costes_emisor += coloc_monto 
+        costes_bonista += coloc_monto 
+    
+    # Flotación
+    flot_pct = float(bond.porcentaje_flotacion or 0)
+    flot_monto = (flot_pct / 100) * valor_comercial
+    if bond.tipo_flotacion == 'emisor':
+        costes_emisor += flot_monto
+    elif bond.tipo_flotacion == 'bonista':
+        costes_bonista += flot_monto
+    elif bond.tipo_flotacion == 'ambos':
+        costes_emisor += flot_monto 
+        costes_bonista += flot_monto 
+    
+    # Cavali
+    cavali_pct = float(bond.porcentaje_cavali or 0)
+    cavali_monto = (cavali_pct / 100) * valor_comercial
+    if bond.tipo_cavali == 'emisor':
+        costes_emisor += cavali_monto
+    elif bond.tipo_cavali == 'bonista':
+        costes_bonista += cavali_monto
+    elif bond.tipo_cavali == 'ambos':
+        costes_emisor += cavali_monto 
+        costes_bonista += cavali_monto 
+    
+    return {
+        'emisor': costes_emisor,
+        'bonista': costes_bonista
+    }
+
+def generate_cash_flows(bond, tep, total_periodos, inicio=0, fin=None):
+    """
+    Genera los flujos de caja usando el método francés (cronograma columnar)
+    """
+    periodos_gracia = 0
+    if bond.tiene_plazo_gracia:
+        periodos_gracia = bond.periodos_gracia or 0
+
+    return build_schedule(
+        valor_nominal=float(bond.valor_nominal),
+        tep=tep,
+        total_periodos=total_periodos,
+        periodos_gracia=periodos_gracia,
+        tipo_gracia=bond.tipo_gracia,
+        prima_pct=float(bond.porcentaje_prima or 0),
+        inicio=inicio,
+        fin=fin,
+    )
+
+def calculate_present_value(flujos, cok_periodo, factores=None):
+    """
+    Calcula el valor presente de los flujos de caja
+    """
+    if factores is None:
+        factores = discount_factors(cok_periodo, flujos.periodo)
+    return present_value(flujos.flujo_total, factores)
+
+def calculate_duration_convexity(flujos, cok_periodo, periodos_por_anio, factores=None, exact=False):
+    """
+    Calcula la duración y convexidad del bono.
+
+    Con exact=True se usa aritmética Decimal (sólo para auditoría).
+    """
+    if exact:
+        return duration_convexity_exact(flujos.cuota.tolist(), flujos.prima_calculo.tolist(), cok_periodo, periodos_por_anio)
+    if factores is None:
+        factores = discount_factors(cok_periodo, flujos.periodo)
+    return duration_convexity(flujos.flujo_total, flujos.periodo, factores, cok_periodo, periodos_por_anio)
+
+def calculate_tcea_emisor(bond, flujos, costes_data, guess=None):
+    """
+    Calcula la TCEA del emisor. Devuelve la tasa anual y el resultado del solver
+    """
+    # Flujo inicial (ingreso neto para el emisor)
+    flujo_inicial = float(bond.valor_comercial) - costes_data['emisor']
+    
+    # Flujos futuros (egresos para el emisor, por eso negativos)
+    flujos_futuros = -flujos.flujo_total
+    
+    # Calcular TIR (Newton con respaldo de Brent)
+    tir = solve_irr([flujo_inicial] + flujos_futuros.tolist(), guess=guess)
+    
+    # Convertir a tasa anual
+    periodos_por_anio = len(flujos) / bond.num_anios
+    tcea = annualize(tir.rate, periodos_por_anio)
+    
+    return tcea, tir
+
+def calculate_tcea_emisor_escudo(bond, flujos, costes_data, guess=None):
+    """
+    Calcula la TCEA del emisor considerando el escudo fiscal
+    """
+    # Flujo inicial
+    flujo_inicial = float(bond.valor_comercial) - costes_data['emisor']
+    
+    # Flujos futuros con escudo fiscal
+    impuesto_renta = float(bond.impuesto_renta or 0)
+    escudo_fiscal = flujos.interes * (impuesto_renta / 100)
+    interes_neto = flujos.interes - escudo_fiscal
+    flujos_futuros = -(interes_neto + flujos.amortizacion + flujos.prima_calculo)
+    
+    # Calcular TIR
+    tir = solve_irr([flujo_inicial] + flujos_futuros.tolist(), guess=guess)
+    
+    # Convertir a tasa anual
+    periodos_por_anio = len(flujos) / bond.num_anios
+    tcea = annualize(tir.rate, periodos_por_anio)
+    
+    return tcea, tir
+
+def calculate_trea_bonista(bond, flujos, costes_data, guess=None):
+    """
+    Calcula la TREA del bonista
+    """
+    # Flujo inicial (egreso para el bonista)
+    flujo_inicial = -(float(bond.valor_comercial) + costes_data['bonista'])
+    
+    # Flujos futuros (ingresos para el bonista)
+    flujos_futuros = flujos.flujo_total
+    
+    # Calcular TIR
+    tir = solve_irr([flujo_inicial] + flujos_futuros.tolist(), guess=guess)
+    
+    # Convertir a tasa anual
+    periodos_por_anio = len(flujos) / bond.num_anios
+    trea = annualize(tir.rate, periodos_por_anio)
+    
+    return trea, tir
+
+def newton_raphson_tir(flujos, guess=0.1):
+    """
+    Calcula la TIR periódica (se mantiene por compatibilidad, usa solve_irr)
+    """
+    return solve_irr(flujos, guess=guess).rate
+
+def get_periodo_name(periodos_por_anio):
+    """
+    Obtiene el nombre del periodo según la frecuencia
+    """
+    periodo_names = {
+        1: 'anual',
+        2: 'semestral',
+        3: 'cuatrimestral',
+        4: 'trimestral',
+        6: 'bimestral',
+        12: 'mensual',
+        360: 'diario'
+    }
+    return periodo_names.get(periodos_por_anio, 'período')
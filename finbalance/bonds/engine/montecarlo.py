@@ -0,0 +1,116 @@
+"""
+Simulación Monte Carlo del valor de un bono bajo tasas estocásticas.
+
+La tasa corta sigue un modelo de Vasicek, dr = a(b - r)dt + σ dW, simulado con
+su discretización exacta en cada periodo del cronograma. Cada trayectoria
+descuenta el cronograma con exp(-Σ r·dt). Las trayectorias se generan por
+bloques (cada uno con su propia semilla derivada de la semilla principal), así
+que el resultado es reproducible y la memoria queda acotada por el tamaño del
+bloque. La simulación corre en el proceso que la llama; las vistas la envían al
+ejecutor acotado de bonds.compute.
+"""
+import math
+
+import numpy as np
+
+from .metrics import calculate_rates, generate_cash_flows
+from .valuation import discount_factors, present_value
+
+# Celdas (trayectorias x periodos) por bloque (~16 MB por matriz)
+MAX_CELDAS = 1 << 21
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+NIVELES_VAR = (95, 99)
+BARRAS_HISTOGRAMA = 50
+
+
+def _valorizar_bloque(flujo_total, r0, media, reversion, volatilidad, dt, trayectorias, semilla):
+    """
+    Valor presente del cronograma en `trayectorias` trayectorias de tasas
+    """
+    rng = np.random.default_rng(semilla)
+    periodos = len(flujo_total)
+    phi = math.exp(-reversion * dt)
+    if reversion > 0:
+        desvio = volatilidad * math.sqrt((1 - phi ** 2) / (2 * reversion))
+    else:
+        desvio = volatilidad * math.sqrt(dt)
+
+    # tasas[t] es la tasa vigente durante el periodo t + 1 en cada trayectoria
+    # (periodos x trayectorias, para que cada paso recorra memoria contigua)
+    tasas = rng.standard_normal((periodos, trayectorias))
+    tasas *= desvio
+    tasas[0] = r0
+    deriva = media * (1 - phi)
+    for t in range(1, periodos):
+        tasas[t] += tasas[t - 1] * phi + deriva
+
+    # Factores de descuento exp(-dt·Σ r) en el mismo arreglo
+    np.cumsum(tasas, axis=0, out=tasas)
+    tasas *= -dt
+    np.exp(tasas, out=tasas)
+    return flujo_total @ tasas
+
+
+def _bloques(trayectorias, periodos, semilla):
+    """(tamaño, semilla) de cada bloque de trayectorias"""
+    tamano = max(1, MAX_CELDAS // max(periodos, 1))
+    cantidades = [min(tamano, trayectorias - inicio) for inicio in range(0, trayectorias, tamano)]
+    semillas = np.random.SeedSequence(semilla).spawn(len(cantidades))
+    return list(zip(cantidades, semillas))
+
+
+def simulate(bond, trayectorias=10_000, volatilidad=1.0, reversion=0.1, media=None, semilla=0,
+             flujos=None):
+    """
+    Distribución del valor presente del bono bajo tasas de Vasicek.
+
+    volatilidad y media se expresan en % anual (media: por defecto, la tasa anual
+    de descuento del bono, que también es la tasa inicial); reversion es la
+    velocidad de reversión a la media por año.
+    """
+    if trayectorias < 1:
+        raise ValueError("Se necesita al menos una trayectoria")
+    ppa = bond.frecuencia_cupon
+    if flujos is None:
+        _, tep = calculate_rates(bond)
+        flujos = generate_cash_flows(bond, tep, bond.num_anios * ppa)
+    flujo_total = np.ascontiguousarray(flujos.flujo_total, dtype=float)
+
+    # Tasas continuas equivalentes a las efectivas anuales
+    r0 = math.log1p(float(bond.tasa_anual_descuento) / 100)
+    b = r0 if media is None else math.log1p(media / 100)
+    parametros = (flujo_total, r0, b, reversion, volatilidad / 100, 1 / ppa)
+
+    valores = np.concatenate([
+        _valorizar_bloque(*parametros, cantidad, semilla_bloque)
+        for cantidad, semilla_bloque in _bloques(trayectorias, len(flujo_total), semilla)
+    ])
+    cok_periodo = (1 + float(bond.tasa_anual_descuento) / 100) ** (1 / ppa) - 1
+    return summarize(valores, precio_base=present_value(flujo_total, discount_factors(cok_periodo, flujos.periodo)))
+
+
+def summarize(valores, precio_base):
+    """
+    Media, percentiles, VaR (pérdida respecto de la media) y histograma de los valores
+    """
+    percentiles = np.percentile(valores, PERCENTILES)
+    media = float(valores.mean())
+    var, cvar = {}, {}
+    for nivel in NIVELES_VAR:
+        corte = np.percentile(valores, 100 - nivel)
+        var[nivel] = media - float(corte)
+        cvar[nivel] = media - float(valores[valores <= corte].mean())
+    conteos, bordes = np.histogram(valores, bins=BARRAS_HISTOGRAMA)
+    return {
+        'trayectorias': len(valores),
+        'precio_base': precio_base,
+        'media': media,
+        'desviacion': float(valores.std(ddof=1)) if len(valores) > 1 else 0.0,
+        'minimo': float(valores.min()),
+        'maximo': float(valores.max()),
+        'percentiles': {p: float(v) for p, v in zip(PERCENTILES, percentiles)},
+        'var': var,
+        'cvar': cvar,
+        'histograma': {'conteos': conteos.tolist(), 'bordes': bordes.tolist()},
+    }
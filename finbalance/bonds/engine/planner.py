@@ -0,0 +1,205 @@
+"""
+Recálculo incremental de las métricas de un bono por etapas.
+
+Cada etapa declara los campos del bono que lee y las etapas de las que
+depende; su huella cubre sólo esas entradas (directas y heredadas). Al editar
+un bono, las etapas cuyas entradas no cambiaron se reutilizan desde un almacén
+(p. ej. la caché de Django): cambiar los costes sólo recalcula los costes y las
+TIR, y cambiar la tasa de descuento revaloriza el cronograma sin reconstruirlo.
+El resultado es idéntico al de calculate_bond_metrics.
+"""
+from typing import Callable, NamedTuple
+
+from . import INPUT_FIELDS, fingerprint
+from .instrumentation import stage
+from .metrics import (
+    calculate_costes, calculate_duration_convexity, calculate_present_value, calculate_rates,
+    calculate_tcea_emisor, calculate_tcea_emisor_escudo, calculate_trea_bonista,
+    generate_cash_flows, get_periodo_name,
+)
+from .valuation import discount_factors
+
+
+class Stage(NamedTuple):
+    campos: tuple
+    depende: tuple
+    calcular: Callable
+
+
+def _cok_periodo(bond):
+    return (1 + float(bond.tasa_anual_descuento) / 100) ** (1 / bond.frecuencia_cupon) - 1
+
+
+def _tasas(bond, valores):
+    return calculate_rates(bond)
+
+
+def _costes(bond, valores):
+    return calculate_costes(bond)
+
+
+def _cronograma(bond, valores):
+    with stage('cronograma'):
+        return generate_cash_flows(bond, valores['tasas'][1], bond.num_anios * bond.frecuencia_cupon)
+
+
+def _valoracion(bond, valores):
+    """(precio, duración, convexidad, duración modificada, total)"""
+    flujos = valores['cronograma']
+    cok_periodo = _cok_periodo(bond)
+    with stage('valor_presente'):
+        factores = discount_factors(cok_periodo, flujos.periodo)
+        precio_actual = calculate_present_value(flujos, cok_periodo, factores)
+    with stage('duracion_convexidad'):
+        ratios = calculate_duration_convexity(flujos, cok_periodo, bond.frecuencia_cupon, factores=factores)
+    return (precio_actual, *ratios)
+
+
+def _tcea_emisor(bond, valores):
+    with stage('tcea_emisor'):
+        return calculate_tcea_emisor(bond, valores['cronograma'], valores['costes'], guess=valores['tasas'][1])
+
+
+def _tcea_emisor_escudo(bond, valores):
+    with stage('tcea_emisor_escudo'):
+        return calculate_tcea_emisor_escudo(bond, valores['cronograma'], valores['costes'],
+                                            guess=valores['tcea_emisor'][1].rate)
+
+
+def _trea_bonista(bond, valores):
+    with stage('trea_bonista'):
+        return calculate_trea_bonista(bond, valores['cronograma'], valores['costes'],
+                                      guess=valores['tcea_emisor'][1].rate)
+
+
+# Etapas en orden de cálculo (cada una después de las que usa)
+ETAPAS = {
+    'tasas': Stage(('tipo_tasa_interes', 'capitalizacion', 'tasa_interes', 'frecuencia_cupon'), (), _tasas),
+    'costes': Stage((
+        'valor_comercial',
+        'porcentaje_estructuracion', 'tipo_estructuracion', 'porcentaje_colocacion', 'tipo_colocacion',
+        'porcentaje_flotacion', 'tipo_flotacion', 'porcentaje_cavali', 'tipo_cavali',
+    ), (), _costes),
+    'cronograma': Stage((
+        'valor_nominal', 'num_anios', 'frecuencia_cupon',
+        'tiene_plazo_gracia', 'periodos_gracia', 'tipo_gracia', 'porcentaje_prima',
+    ), ('tasas',), _cronograma),
+    'valoracion': Stage(('tasa_anual_descuento', 'frecuencia_cupon'), ('cronograma',), _valoracion),
+    # La TIR del emisor parte de la TEP; las otras dos, de la TIR del emisor
+    'tcea_emisor': Stage(('valor_comercial', 'num_anios'), ('tasas', 'cronograma', 'costes'), _tcea_emisor),
+    'tcea_emisor_escudo': Stage(
+        ('valor_comercial', 'num_anios', 'impuesto_renta'), ('cronograma', 'costes', 'tcea_emisor'), _tcea_emisor_escudo,
+    ),
+    'trea_bonista': Stage(('valor_comercial', 'num_anios'), ('cronograma', 'costes', 'tcea_emisor'), _trea_bonista),
+}
+
+
+def _campos_heredados():
+    campos = {}
+    for nombre, etapa in ETAPAS.items():
+        propios = set(etapa.campos).union(*(campos[dependencia] for dependencia in etapa.depende))
+        campos[nombre] = tuple(campo for campo in INPUT_FIELDS if campo in propios)
+    return campos
+
+
+# Campos de entrada de cada etapa, incluidos los de las etapas de las que depende
+CAMPOS_ETAPA = _campos_heredados()
+
+
+def stage_fingerprints(bond):
+    """
+    Huella de las entradas de cada etapa ({etapa: huella})
+    """
+    return {nombre: fingerprint(bond, campos) for nombre, campos in CAMPOS_ETAPA.items()}
+
+
+def stage_keys(bond, prefijo='etapa'):
+    """
+    Clave de almacén de cada etapa ({etapa: clave})
+    """
+    return {nombre: f'{prefijo}:{nombre}:{huella}' for nombre, huella in stage_fingerprints(bond).items()}
+
+
+def plan(anterior, nuevo):
+    """
+    Etapas que hay que recalcular al pasar de los datos `anterior` a `nuevo`
+    """
+    antes, despues = stage_fingerprints(anterior), stage_fingerprints(nuevo)
+    return tuple(nombre for nombre in ETAPAS if antes[nombre] != despues[nombre])
+
+
+def compute_stages(bond, conocidas=None):
+    """
+    Calcula las etapas que no están en `conocidas` ({etapa: valor}) y devuelve sólo las nuevas
+    """
+    valores = dict(conocidas or {})
+    nuevas = {}
+    for nombre, etapa in ETAPAS.items():
+        if nombre not in valores:
+            valores[nombre] = nuevas[nombre] = etapa.calcular(bond, valores)
+    return nuevas
+
+
+def assemble(bond, valores):
+    """
+    Diccionario de calculate_bond_metrics a partir de los valores de todas las etapas
+    """
+    periodos_por_anio = bond.frecuencia_cupon
+    tea, tep = valores['tasas']
+    costes_data = valores['costes']
+    precio_actual, duracion, convexidad, duracion_modificada, total_ratios = valores['valoracion']
+    tcea_emisor, tir_emisor = valores['tcea_emisor']
+    tcea_emisor_escudo, tir_escudo = valores['tcea_emisor_escudo']
+    trea_bonista, tir_bonista = valores['trea_bonista']
+    return {
+        'periodos_por_anio': periodos_por_anio,
+        'periodo_nombre': get_periodo_name(periodos_por_anio),
+        'dias_capitalizacion': bond.dias_por_anio // periodos_por_anio,
+        'tea': tea * 100,
+        'tep': tep * 100,
+        'cok_periodo': _cok_periodo(bond) * 100,
+        'flujos': valores['cronograma'],
+        'precio_actual': precio_actual,
+        'utilidad': -float(bond.valor_comercial) - costes_data['bonista'] + precio_actual,
+        'duracion': duracion,
+        'convexidad': convexidad,
+        'duracion_modificada': duracion_modificada,
+        'total_ratios': total_ratios,
+        'tcea_emisor': tcea_emisor * 100,
+        'tcea_emisor_escudo': tcea_emisor_escudo * 100,
+        'trea_bonista': trea_bonista * 100,
+        'costes_emisor': costes_data['emisor'],
+        'costes_bonista': costes_data['bonista'],
+        'diagnostico_tir': {
+            'tcea_emisor': tir_emisor.to_dict(),
+            'tcea_emisor_escudo': tir_escudo.to_dict(),
+            'trea_bonista': tir_bonista.to_dict(),
+        },
+    }
+
+
+def calculate_incremental(bond, almacen, prefijo='etapa'):
+    """
+    Métricas del bono reutilizando las etapas guardadas en `almacen` (cualquier
+    objeto con get_many y set_many, como la caché de Django). Devuelve
+    (métricas, etapas recalculadas)
+    """
+    claves = stage_keys(bond, prefijo)
+    encontradas = almacen.get_many(list(claves.values()))
+    conocidas = {nombre: encontradas[clave] for nombre, clave in claves.items() if clave in encontradas}
+    nuevas = compute_stages(bond, conocidas)
+    if nuevas:
+        almacen.set_many({claves[nombre]: valor for nombre, valor in nuevas.items()})
+    return assemble(bond, {**conocidas, **nuevas}), tuple(nuevas)
+
+
+class MemoryStore(dict):
+    """
+    Almacén de etapas en memoria, para usar calculate_incremental sin Django
+    """
+
+    def get_many(self, claves):
+        return {clave: self[clave] for clave in claves if clave in self}
+
+    def set_many(self, valores):
+        self.update(valores)
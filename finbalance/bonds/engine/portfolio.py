@@ -0,0 +1,38 @@
+"""
+Valor presente, duración y convexidad de una cartera de bonos.
+
+Si cada flujo de la cartera se descuenta a la tasa de su bono, la duración de
+Macaulay de los flujos combinados (Σ t·VP / Σ VP) es el promedio de las
+duraciones de los bonos ponderado por el valor presente de cada posición; lo
+mismo vale para la duración modificada y la convexidad. Así se obtienen a
+partir de las métricas escalares de cada bono, sin volver a recorrer sus
+cronogramas.
+"""
+import numpy as np
+
+
+def aggregate(cantidades, precios, duraciones, duraciones_modificadas, convexidades):
+    """
+    Métricas de la cartera a partir de las de sus bonos (arreglos alineados).
+
+    Los bonos sin precio (NaN) se excluyen; 'pesos' es la fracción del valor
+    presente de cada posición (0 para los excluidos).
+    """
+    cantidades = np.asarray(cantidades, dtype=float)
+    precios = np.asarray(precios, dtype=float)
+    validos = ~np.isnan(precios)
+    valores = np.where(validos, cantidades * np.nan_to_num(precios), 0.0)
+    total = float(valores.sum())
+    pesos = valores / total if total else np.zeros_like(valores)
+
+    def promedio(metrica):
+        return float(pesos @ np.nan_to_num(np.asarray(metrica, dtype=float)))
+
+    return {
+        'valor_presente': total,
+        'duracion': promedio(duraciones),
+        'duracion_modificada': promedio(duraciones_modificadas),
+        'convexidad': promedio(convexidades),
+        'pesos': pesos,
+        'excluidos': int((~validos).sum()),
+    }
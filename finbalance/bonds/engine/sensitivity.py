@@ -0,0 +1,117 @@
+"""
+Sensibilidad del precio ante desplazamientos paralelos de tasas.
+
+En lugar de recalcular todas las métricas por escenario, el cronograma se
+construye una vez y se valoriza con una matriz de factores de descuento
+(escenarios x periodos): precio, duración y convexidad de todos los
+escenarios salen de un único producto matriz-vector.
+"""
+import numpy as np
+
+from .metrics import calculate_costes, calculate_rates, generate_cash_flows
+
+# Desplazamientos por defecto, en puntos básicos sobre la tasa anual de descuento
+SHOCKS_DESCUENTO = tuple(range(-300, 301, 5))
+# ... y sobre la tasa de interés del bono (cada uno requiere otro cronograma)
+SHOCKS_INTERES = (-200, -100, 0, 100, 200)
+
+# Celdas de la matriz de factores que se materializan a la vez (~16 MB)
+MAX_CELDAS = 1 << 21
+
+
+def _momentos(flujo_total, periodos, cok_periodos):
+    """
+    Para cada tasa por periodo k devuelve las sumas Σ F·v^t, Σ t·F·v^t y
+    Σ t(t+1)·F·v^t (v = 1/(1+k)), recorriendo los escenarios por bloques
+    """
+    t = np.asarray(periodos, dtype=float)
+    ponderados = np.column_stack((flujo_total, flujo_total * t, flujo_total * t * (t + 1)))
+    log_descuento = -np.log1p(np.asarray(cok_periodos, dtype=float))
+    momentos = np.empty((len(log_descuento), 3))
+    bloque = max(1, MAX_CELDAS // max(len(t), 1))
+    for inicio in range(0, len(log_descuento), bloque):
+        factores = np.exp(np.outer(log_descuento[inicio:inicio + bloque], t))
+        momentos[inicio:inicio + bloque] = factores @ ponderados
+    return momentos
+
+
+def _tasa_periodo(tasa_anual_pct, periodos_por_anio):
+    tasa = np.asarray(tasa_anual_pct, dtype=float) / 100
+    if np.any(tasa <= -1):
+        raise ValueError("Los desplazamientos dejan la tasa de descuento por debajo de -100%")
+    return (1 + tasa) ** (1 / periodos_por_anio) - 1
+
+
+def rate_shocks(bond, shocks_pb=SHOCKS_DESCUENTO, shocks_interes_pb=SHOCKS_INTERES, flujos=None):
+    """
+    Curva precio/rendimiento del bono ante desplazamientos de la tasa de descuento.
+
+    Devuelve un diccionario con, por cada desplazamiento (pb):
+    - rendimiento (%), precio, utilidad, duracion, duracion_modificada y
+      convexidad con las mismas definiciones que calculate_bond_metrics;
+    - precio_aproximado con la duración y convexidad del escenario base
+      (respecto de la tasa anual) y su error frente a la revalorización completa;
+    y la matriz precios_interes (desplazamientos de tasa_interes x de descuento).
+    """
+    ppa = bond.frecuencia_cupon
+    total_periodos = bond.num_anios * ppa
+    shocks = np.asarray(shocks_pb, dtype=float)
+    tasa_base = float(bond.tasa_anual_descuento)
+    rendimientos = tasa_base + shocks / 100
+    cok = _tasa_periodo(rendimientos, ppa)
+
+    if flujos is None:
+        _, tep = calculate_rates(bond)
+        flujos = generate_cash_flows(bond, tep, total_periodos)
+    flujo_total = flujos.flujo_total
+    momentos = _momentos(flujo_total, flujos.periodo, cok)
+    precio = momentos[:, 0]
+    duracion = momentos[:, 1] / precio / ppa
+    convexidad = momentos[:, 2] / (precio * (1 + cok) ** 2) / ppa ** 2
+
+    # Escenario base: derivadas del precio respecto de la tasa anual y
+    # (años t/ppa, v = 1/(1+y)): P' = -Σ τ·F·v^τ / (1+y), P'' = Σ τ(τ+1)·F·v^τ / (1+y)²
+    y = tasa_base / 100
+    base = _momentos(flujo_total, flujos.periodo, _tasa_periodo([tasa_base], ppa))[0]
+    suma_t, suma_t2 = base[1] / ppa, (base[2] - base[1]) / ppa ** 2
+    duracion_mod_anual = suma_t / base[0] / (1 + y)
+    convexidad_anual = (suma_t2 + suma_t) / base[0] / (1 + y) ** 2
+    dy = rendimientos / 100 - y
+    precio_aproximado = base[0] * (1 - duracion_mod_anual * dy + convexidad_anual * dy ** 2 / 2)
+
+    # Desplazamientos de la tasa de interés: un cronograma por escenario, todos
+    # valorizados contra la misma grilla de tasas de descuento
+    shocks_interes = np.asarray(shocks_interes_pb, dtype=float)
+    precios_interes = np.empty((len(shocks_interes), len(shocks)))
+    for fila, shock in enumerate(shocks_interes):
+        _, tep = calculate_rates(bond, float(bond.tasa_interes) + shock / 100)
+        flujos_escenario = generate_cash_flows(bond, tep, total_periodos)
+        precios_interes[fila] = _momentos(flujos_escenario.flujo_total, flujos_escenario.periodo, cok)[:, 0]
+
+    costes_bonista = calculate_costes(bond)['bonista']
+    return {
+        'shocks_pb': shocks,
+        'rendimiento': rendimientos,
+        'precio': precio,
+        'utilidad': precio - float(bond.valor_comercial) - costes_bonista,
+        'duracion': duracion,
+        'duracion_modificada': duracion / (1 + cok),
+        'convexidad': convexidad,
+        'precio_base': float(base[0]),
+        'duracion_modificada_anual': float(duracion_mod_anual),
+        'convexidad_anual': float(convexidad_anual),
+        'precio_aproximado': precio_aproximado,
+        'error_aproximacion': precio_aproximado - precio,
+        'shocks_interes_pb': shocks_interes,
+        'precios_interes': precios_interes,
+    }
+
+
+def to_dict(sensibilidad):
+    """
+    Resultado de rate_shocks serializable en JSON
+    """
+    return {
+        clave: valor.tolist() if isinstance(valor, np.ndarray) else valor
+        for clave, valor in sensibilidad.items()
+    }
@@ -0,0 +1,210 @@
+"""
+Cálculo de la TIR de una serie de flujos periódicos.
+
+El VPN y su derivada se evalúan con el esquema de Horner sobre x = 1 / (1 + r),
+sin calcular potencias. Primero se intenta Newton-Raphson desde la estimación
+inicial (normalmente la TIR de un cálculo anterior); si no converge se busca un
+intervalo con cambio de signo y se resuelve con el método de Brent.
+"""
+import math
+from typing import NamedTuple
+
+TOLERANCIA = 1e-10
+MAX_NEWTON = 12
+MAX_EVALUACIONES = 100
+
+# Tasa más baja que se evalúa al buscar el intervalo (en -1 el VPN no está definido)
+TASA_MINIMA = -1 + 1e-9
+
+
+class IRRResult(NamedTuple):
+    rate: float
+    iterations: int
+    converged: bool
+    method: str
+
+    def to_dict(self):
+        """Diccionario serializable en JSON (NaN se convierte en None)"""
+        datos = self._asdict()
+        if math.isnan(self.rate):
+            datos['rate'] = None
+        return datos
+
+
+def npv_and_derivative(flujos, r):
+    """
+    VPN de `flujos` (t = 0, 1, 2, ...) a la tasa `r` y su derivada respecto a r
+    """
+    x = 1.0 / (1.0 + r)
+    vpn = 0.0
+    derivada = 0.0
+    for flujo in reversed(flujos):
+        derivada = derivada * x + vpn
+        vpn = vpn * x + flujo
+    # d(vpn)/dr = d(vpn)/dx * dx/dr, con dx/dr = -x^2
+    return vpn, -derivada * x * x
+
+
+def npv(flujos, r):
+    """
+    VPN de `flujos` a la tasa `r` (Horner)
+    """
+    x = 1.0 / (1.0 + r)
+    vpn = 0.0
+    for flujo in reversed(flujos):
+        vpn = vpn * x + flujo
+    return vpn
+
+
+def solve_irr(flujos, guess=0.1, tol=TOLERANCIA):
+    """
+    Calcula la TIR periódica de `flujos` partiendo de `guess`.
+
+    Devuelve un IRRResult con la tasa, el número de evaluaciones del VPN, si
+    convergió y el método que encontró la raíz. Si los flujos no cambian de
+    signo no existe TIR y la tasa es NaN.
+    """
+    flujos = [float(f) for f in flujos]
+    if not any(f > 0 for f in flujos) or not any(f < 0 for f in flujos):
+        return IRRResult(math.nan, 0, False, 'sin_raiz')
+
+    if guess is None or not math.isfinite(guess) or guess <= -1:
+        guess = 0.1
+
+    # Newton-Raphson desde la estimación inicial
+    r = guess
+    evaluaciones = 0
+    for _ in range(MAX_NEWTON):
+        vpn, derivada = npv_and_derivative(flujos, r)
+        evaluaciones += 1
+        paso = newton_step(r, vpn, derivada, tol)
+        if paso is None:
+            break
+        r, convergio = paso
+        if convergio:
+            return IRRResult(r, evaluaciones, True, 'newton')
+
+    # Respaldo: intervalo con cambio de signo + Brent
+    return solve_bracketed(lambda tasa: npv(flujos, tasa), guess, tol, evaluaciones)
+
+
+def newton_step(r, vpn, derivada, tol=TOLERANCIA):
+    """
+    Un paso de Newton desde `r`: (tasa nueva, convergió) o None si hay que
+    abandonar Newton (derivada nula o tasa fuera de dominio)
+    """
+    if vpn == 0:
+        return r, True
+    if derivada == 0 or not math.isfinite(derivada):
+        return None
+    r_nueva = r - vpn / derivada
+    if not math.isfinite(r_nueva) or r_nueva <= -1:
+        return None
+    return r_nueva, abs(r_nueva - r) < tol * max(1.0, abs(r))
+
+
+def solve_bracketed(vpn, guess, tol=TOLERANCIA, evaluaciones=0):
+    """
+    Busca un intervalo con cambio de signo alrededor de `guess` y lo resuelve con
+    Brent. `vpn(r)` evalúa el VPN; `evaluaciones` son las ya hechas (p. ej. por Newton)
+    """
+    intervalo, usadas = _bracket(vpn, guess)
+    evaluaciones += usadas
+    if intervalo is None:
+        return IRRResult(math.nan, evaluaciones, False, 'sin_intervalo')
+
+    a, b, fa, fb = intervalo
+    raiz, usadas, convergio = _brent(vpn, a, b, fa, fb, tol, MAX_EVALUACIONES - evaluaciones)
+    evaluaciones += usadas
+    return IRRResult(raiz if convergio else math.nan, evaluaciones, convergio, 'brent')
+
+
+def _bracket(vpn, guess):
+    """
+    Busca [a, b] con VPN de signo opuesto, alejándose de `guess` hacia ambos lados
+    """
+    f_guess = vpn(guess)
+    evaluaciones = 1
+    if f_guess == 0:
+        return (guess, guess, f_guess, f_guess), evaluaciones
+
+    alto, bajo = guess, guess
+    f_alto = f_bajo = f_guess
+    paso = 0.05
+    while evaluaciones < MAX_EVALUACIONES // 2:
+        # Hacia tasas mayores con paso creciente
+        if alto < 1e6:
+            siguiente = alto + paso
+            paso *= 2
+            f_sig = vpn(siguiente)
+            evaluaciones += 1
+            if math.isfinite(f_sig) and f_sig * f_guess <= 0:
+                return (alto, siguiente, f_alto, f_sig), evaluaciones
+            alto, f_alto = siguiente, f_sig
+        # Hacia -1 acercándose geométricamente, sin llegar a -1
+        if bajo > TASA_MINIMA:
+            siguiente = max(-1 + (1 + bajo) / 8, TASA_MINIMA)
+            f_sig = vpn(siguiente)
+            evaluaciones += 1
+            if math.isfinite(f_sig) and f_sig * f_guess <= 0:
+                return (siguiente, bajo, f_sig, f_bajo), evaluaciones
+            bajo, f_bajo = siguiente, f_sig
+        elif alto >= 1e6:
+            break
+    return None, evaluaciones
+
+
+def _brent(vpn, a, b, fa, fb, tol, max_iter):
+    """
+    Método de Brent sobre un intervalo con cambio de signo
+    """
+    if fa == 0:
+        return a, 0, True
+    if fb == 0:
+        return b, 0, True
+
+    c, fc = b, fb
+    d = e = b - a
+    for iteracion in range(1, max(max_iter, 1) + 1):
+        if (fb > 0 and fc > 0) or (fb < 0 and fc < 0):
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol1 = 2 * 2.2e-16 * abs(b) + 0.5 * tol
+        xm = 0.5 * (c - b)
+        if abs(xm) <= tol1 or fb == 0:
+            return b, iteracion - 1, True
+        if abs(e) >= tol1 and abs(fa) > abs(fb):
+            # Interpolación inversa (secante o cuadrática)
+            s = fb / fa
+            if a == c:
+                p = 2 * xm * s
+                q = 1 - s
+            else:
+                q = fa / fc
+                r = fb / fc
+                p = s * (2 * xm * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2 * p < min(3 * xm * q - abs(tol1 * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                d = e = xm
+        else:
+            # Bisección
+            d = e = xm
+        a, fa = b, fb
+        b += d if abs(d) > tol1 else math.copysign(tol1, xm)
+        fb = vpn(b)
+    return b, max_iter, False
+
+
+def annualize(tasa_periodo, periodos_por_anio):
+    """
+    Convierte una tasa periódica en tasa efectiva anual
+    """
+    return (1 + tasa_periodo) ** periodos_por_anio - 1
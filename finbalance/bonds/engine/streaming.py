@@ -0,0 +1,192 @@
+"""
+Métricas de bonos muy largos (p. ej. diarios a 30 años) con memoria acotada.
+
+El cronograma se genera por bloques de BLOQUE periodos y cada bloque se descarta
+después de usarlo. En una sola pasada se acumulan el valor presente, los
+numeradores de la duración y la convexidad y el VPN (con su derivada) de los
+flujos de la TCEA del emisor, la TCEA con escudo y la TREA. Las siguientes
+iteraciones de Newton vuelven a generar los bloques (son fórmulas cerradas) en
+lugar de guardarlos, y evalúan juntas las tasas que aún no convergieron. Sólo
+se materializan las filas de la ventana pedida, para mostrarlas.
+"""
+import math
+
+import numpy as np
+
+from .cashflows import build_schedule, iter_schedule
+from .instrumentation import stage
+from .metrics import calculate_bond_metrics, calculate_costes, calculate_rates, get_periodo_name
+from .solver import MAX_NEWTON, TOLERANCIA, IRRResult, annualize, newton_step, solve_bracketed
+
+# Periodos por bloque (unos 200 KB de arreglos por bloque)
+BLOQUE = 4096
+
+# Filas [inicio, fin) del cronograma que se devuelven por defecto
+VENTANA = (0, 60)
+
+# Cronogramas con más periodos que este se calculan por bloques en la
+# aplicación (detalle, instantáneas, revalorización); ver needs_streaming
+UMBRAL_STREAMING = 2 * BLOQUE
+
+# Orden de las tasas internas de retorno en los arreglos de este módulo
+TASAS = ('tcea_emisor', 'tcea_emisor_escudo', 'trea_bonista')
+
+
+def needs_streaming(bond):
+    """
+    True si el cronograma del bono es más largo que UMBRAL_STREAMING
+    """
+    return bond.num_anios * bond.frecuencia_cupon > UMBRAL_STREAMING
+
+
+def bounded_bond_metrics(bond):
+    """
+    calculate_bond_metrics o, si el cronograma es largo, stream_bond_metrics
+    (con 'flujos' limitado a la ventana por defecto)
+    """
+    if needs_streaming(bond):
+        return stream_bond_metrics(bond)
+    return calculate_bond_metrics(bond)
+
+
+def _series(bloque, impuesto):
+    """
+    Flujos futuros del bloque para cada tasa de TASAS (una fila por tasa)
+    """
+    flujo_total = bloque.flujo_total
+    escudo = bloque.interes - bloque.interes * impuesto + bloque.amortizacion + bloque.prima_calculo
+    return np.stack((-flujo_total, -escudo, flujo_total))
+
+
+def _terminos(series, t, tasas):
+    """
+    Σ F·x^t y Σ t·F·x^t de cada fila de `series` con x = 1 / (1 + tasa)
+    """
+    with np.errstate(over='ignore', invalid='ignore'):
+        potencias = np.exp(np.outer(-np.log1p(tasas), t))
+        ponderados = series * potencias
+        return ponderados.sum(axis=1), ponderados @ t
+
+
+def stream_bond_metrics(bond, ventana=VENTANA, bloque=BLOQUE):
+    """
+    Las métricas de calculate_bond_metrics sin construir el cronograma completo.
+
+    'flujos' contiene sólo las filas [inicio, fin) de `ventana`; 'total_periodos'
+    es el largo del cronograma completo. La memoria usada depende de `bloque` y
+    del tamaño de la ventana, no del número de periodos.
+    """
+    periodos_por_anio = bond.frecuencia_cupon
+    total_periodos = bond.num_anios * periodos_por_anio
+    tea, tep = calculate_rates(bond)
+    cok_periodo = (1 + float(bond.tasa_anual_descuento) / 100) ** (1 / periodos_por_anio) - 1
+    costes_data = calculate_costes(bond)
+    valor_comercial = float(bond.valor_comercial)
+    impuesto = float(bond.impuesto_renta or 0) / 100
+    iniciales = np.array([
+        valor_comercial - costes_data['emisor'],
+        valor_comercial - costes_data['emisor'],
+        -(valor_comercial + costes_data['bonista']),
+    ])
+
+    parametros = (
+        float(bond.valor_nominal), tep, total_periodos,
+        (bond.periodos_gracia or 0) if bond.tiene_plazo_gracia else 0,
+        bond.tipo_gracia, float(bond.porcentaje_prima or 0),
+    )
+
+    # Pasada fusionada: valor presente, numeradores y VPN de las tres tasas (a la TEP)
+    tasas = np.full(len(TASAS), tep)
+    vpn = iniciales.copy()
+    suma_t = np.zeros(len(TASAS))
+    minimos, maximos = iniciales.copy(), iniciales.copy()
+    momentos = np.zeros(3)
+    log_descuento = -math.log1p(cok_periodo)
+    with stage('pasada_fusionada'):
+        for bloque_flujos in iter_schedule(*parametros, bloque=bloque):
+            t = bloque_flujos.periodo.astype(float)
+            vp_flujos = bloque_flujos.flujo_total * np.exp(t * log_descuento)
+            momentos += (vp_flujos.sum(), vp_flujos @ t, vp_flujos @ (t * (t + 1)))
+            series = _series(bloque_flujos, impuesto)
+            np.minimum(minimos, series.min(axis=1), out=minimos)
+            np.maximum(maximos, series.max(axis=1), out=maximos)
+            suma, ponderada = _terminos(series, t, tasas)
+            vpn += suma
+            suma_t += ponderada
+
+    def pasada(indices):
+        """VPN y derivada de las tasas `indices` en sus valores actuales"""
+        vpn = iniciales[indices].copy()
+        suma_t = np.zeros(len(indices))
+        for bloque_flujos in iter_schedule(*parametros, bloque=bloque):
+            t = bloque_flujos.periodo.astype(float)
+            suma, ponderada = _terminos(_series(bloque_flujos, impuesto)[indices], t, tasas[indices])
+            vpn += suma
+            suma_t += ponderada
+        return vpn, suma_t
+
+    # Newton para las tres tasas a la vez: cada iteración es una pasada más
+    resultados = [None] * len(TASAS)
+    for k in range(len(TASAS)):
+        if not (minimos[k] < 0 < maximos[k]):
+            resultados[k] = IRRResult(math.nan, 0, False, 'sin_raiz')
+    pendientes = [k for k in range(len(TASAS)) if resultados[k] is None]
+    respaldo = []
+    evaluaciones = 1
+    with stage('tir_streaming'):
+        while pendientes:
+            siguen = []
+            for k in pendientes:
+                # d(vpn)/dr = -Σ t·F·x^(t+1)
+                paso = newton_step(tasas[k], vpn[k], -suma_t[k] / (1 + tasas[k]))
+                if paso is None:
+                    respaldo.append(k)
+                    continue
+                tasas[k], convergio = paso
+                if convergio:
+                    resultados[k] = IRRResult(float(tasas[k]), evaluaciones, True, 'newton')
+                else:
+                    siguen.append(k)
+            pendientes = siguen
+            if evaluaciones == MAX_NEWTON:
+                respaldo.extend(pendientes)
+                break
+            if pendientes:
+                vpn[pendientes], suma_t[pendientes] = pasada(pendientes)
+                evaluaciones += 1
+
+        # Respaldo de Brent: cada evaluación del VPN vuelve a recorrer los bloques
+        for k in respaldo:
+            def vpn_tasa(r, k=k):
+                tasas[k] = r
+                return float(pasada([k])[0][0])
+            resultados[k] = solve_bracketed(vpn_tasa, tep, TOLERANCIA, evaluaciones)
+
+    precio_actual, numerador_duracion, numerador_convexidad = (float(m) for m in momentos)
+    duracion = numerador_duracion / precio_actual / periodos_por_anio
+    duracion_modificada = duracion / (1 + cok_periodo)
+    convexidad = numerador_convexidad / (precio_actual * (1 + cok_periodo) ** 2) / periodos_por_anio ** 2
+    periodos_anuales = total_periodos / bond.num_anios
+    anuales = {nombre: annualize(tir.rate, periodos_anuales) * 100 for nombre, tir in zip(TASAS, resultados)}
+
+    inicio, fin = ventana
+    return {
+        'periodos_por_anio': periodos_por_anio,
+        'periodo_nombre': get_periodo_name(periodos_por_anio),
+        'dias_capitalizacion': bond.dias_por_anio // periodos_por_anio,
+        'tea': tea * 100,
+        'tep': tep * 100,
+        'cok_periodo': cok_periodo * 100,
+        'flujos': build_schedule(*parametros, inicio=inicio, fin=fin),
+        'total_periodos': total_periodos,
+        'precio_actual': precio_actual,
+        'utilidad': -valor_comercial - costes_data['bonista'] + precio_actual,
+        'duracion': duracion,
+        'convexidad': convexidad,
+        'duracion_modificada': duracion_modificada,
+        'total_ratios': duracion + convexidad,
+        **anuales,
+        'costes_emisor': costes_data['emisor'],
+        'costes_bonista': costes_data['bonista'],
+        'diagnostico_tir': {nombre: tir.to_dict() for nombre, tir in zip(TASAS, resultados)},
+    }
@@ -0,0 +1,108 @@
+"""
+Términos de un bono: los datos de entrada del motor, sin Django.
+
+BondTerms es el objeto que reciben las funciones del motor fuera de la web
+(lotes, notebooks, la línea de comandos). Cualquier objeto con los mismos
+atributos sirve, incluido el modelo Bond; `from_bond` copia sólo esos atributos.
+"""
+from datetime import date
+from decimal import Decimal
+
+from . import INPUT_FIELDS
+
+# Campos opcionales y su valor por defecto (los mismos que el modelo Bond)
+DEFAULTS = {
+    'capitalizacion': None,
+    'tiene_plazo_gracia': False,
+    'periodos_gracia': None,
+    'tipo_gracia': None,
+    'porcentaje_prima': Decimal('0'),
+    'tipo_prima': 'emisor',
+    'porcentaje_estructuracion': Decimal('0'),
+    'tipo_estructuracion': 'emisor',
+    'porcentaje_colocacion': Decimal('0'),
+    'tipo_colocacion': 'emisor',
+    'porcentaje_flotacion': Decimal('0'),
+    'tipo_flotacion': 'emisor',
+    'porcentaje_cavali': Decimal('0'),
+    'tipo_cavali': 'emisor',
+    'metodo_amortizacion': 'Francés',
+}
+
+REQUIRED = tuple(campo for campo in INPUT_FIELDS if campo not in DEFAULTS)
+
+_ENTEROS = {'num_anios', 'frecuencia_cupon', 'dias_por_anio', 'capitalizacion', 'periodos_gracia'}
+_TEXTOS = {
+    'tipo_tasa_interes', 'tipo_gracia', 'tipo_prima', 'tipo_estructuracion', 'tipo_colocacion',
+    'tipo_flotacion', 'tipo_cavali', 'metodo_amortizacion',
+}
+_VERDADEROS = {'1', 'true', 't', 'si', 'sí', 'yes'}
+
+
+def _vacio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _convertir(campo, valor):
+    """Convierte un valor leído de CSV/JSON al tipo del campo"""
+    if _vacio(valor):
+        return DEFAULTS.get(campo)
+    try:
+        return _convertir_valor(campo, valor.strip() if isinstance(valor, str) else valor)
+    except (ArithmeticError, ValueError, TypeError):
+        raise ValueError(f"Valor inválido para {campo}: {valor!r}") from None
+
+
+def _convertir_valor(campo, valor):
+    if campo in _ENTEROS:
+        return int(valor)
+    if campo in _TEXTOS:
+        return str(valor)
+    if campo == 'tiene_plazo_gracia':
+        return valor if isinstance(valor, bool) else str(valor).lower() in _VERDADEROS
+    if campo == 'fecha_emision':
+        return valor if isinstance(valor, date) else date.fromisoformat(valor)
+    return valor if isinstance(valor, Decimal) else Decimal(str(valor))
+
+
+class BondTerms:
+    """
+    Datos de entrada de un bono (los INPUT_FIELDS) más un identificador opcional
+    """
+    __slots__ = ('id',) + INPUT_FIELDS
+
+    def __init__(self, id=None, **campos):
+        faltantes = [campo for campo in REQUIRED if campos.get(campo) is None]
+        if faltantes:
+            raise ValueError(f"Faltan datos del bono: {', '.join(faltantes)}")
+        desconocidos = set(campos) - set(INPUT_FIELDS)
+        if desconocidos:
+            raise ValueError(f"Campos desconocidos: {', '.join(sorted(desconocidos))}")
+        self.id = id
+        for campo in INPUT_FIELDS:
+            setattr(self, campo, campos[campo] if campo in campos else DEFAULTS.get(campo))
+
+    def __repr__(self):
+        return f'BondTerms(id={self.id!r}, valor_nominal={self.valor_nominal!r}, num_anios={self.num_anios!r})'
+
+    @classmethod
+    def from_mapping(cls, datos):
+        """
+        Construye los términos desde un diccionario (fila de CSV, objeto JSON o
+        registro .values()); convierte los textos y omite las claves que no son
+        datos de entrada. Un dato faltante o inválido lanza ValueError con el
+        nombre del campo
+        """
+        faltantes = [campo for campo in REQUIRED if _vacio(datos.get(campo))]
+        if faltantes:
+            raise ValueError(f"Faltan datos del bono: {', '.join(faltantes)}")
+        campos = {campo: _convertir(campo, datos[campo]) for campo in INPUT_FIELDS if campo in datos}
+        return cls(id=datos.get('id'), **campos)
+
+    @classmethod
+    def from_bond(cls, bond):
+        """Copia los datos de entrada de un Bond (o cualquier objeto con esos atributos)"""
+        return cls(id=getattr(bond, 'pk', None), **{campo: getattr(bond, campo) for campo in INPUT_FIELDS})
+
+    def to_dict(self):
+        return {'id': self.id, **{campo: getattr(self, campo) for campo in INPUT_FIELDS}}
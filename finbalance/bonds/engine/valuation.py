@@ -0,0 +1,80 @@
+"""
+Valor presente, duración y convexidad de un cronograma de pagos.
+
+Por defecto todo se calcula en punto flotante con un único vector de factores de
+descuento compartido entre el precio y la duración. El modo exacto (Decimal) se
+reserva para auditorías y reutiliza una tabla de factores en caché.
+"""
+from decimal import Decimal
+from functools import lru_cache
+
+import numpy as np
+
+
+def discount_factors(cok_periodo, periodos):
+    """
+    Factores de descuento 1 / (1 + cok)^t para cada periodo
+    """
+    return (1 + cok_periodo) ** -np.asarray(periodos, dtype=float)
+
+
+def present_value(flujo_total, factores):
+    """
+    Valor presente de los flujos dados sus factores de descuento
+    """
+    return float(flujo_total @ factores)
+
+
+def duration_convexity(flujo_total, periodos, factores, cok_periodo, periodos_por_anio):
+    """
+    Duración, convexidad, duración modificada y total (en años), en float
+    """
+    t = np.asarray(periodos, dtype=float)
+    vp_flujos = flujo_total * factores
+    valor_presente_total = vp_flujos.sum()
+
+    duracion = (vp_flujos @ t / valor_presente_total) / periodos_por_anio
+    duracion_modificada = duracion / (1 + cok_periodo)
+    convexidad = (vp_flujos @ (t * (t + 1)) / (valor_presente_total * (1 + cok_periodo) ** 2)) / periodos_por_anio ** 2
+
+    return float(duracion), float(convexidad), float(duracion_modificada), float(duracion + convexidad)
+
+
+@lru_cache(maxsize=128)
+def decimal_discount_table(cok_periodo, total_periodos):
+    """
+    Tabla de factores de descuento exactos (Decimal) para t = 1..total_periodos.
+
+    `cok_periodo` se recibe como texto para que la clave de la caché sea estable.
+    """
+    base = Decimal('1') + Decimal(cok_periodo)
+    return tuple(Decimal('1') / base ** t for t in range(1, total_periodos + 1))
+
+
+def duration_convexity_exact(cuotas, primas, cok_periodo, periodos_por_anio):
+    """
+    Duración y convexidad con aritmética Decimal (modo auditoría)
+    """
+    factores = decimal_discount_table(str(cok_periodo), len(cuotas))
+    cok = Decimal(str(cok_periodo))
+
+    duracion_numerador = Decimal('0')
+    valor_presente_total = Decimal('0')
+    convexidad_numerador = Decimal('0')
+
+    for periodo, (cuota, prima, factor) in enumerate(zip(cuotas, primas, factores), start=1):
+        vp_flujo = (Decimal(str(cuota)) + Decimal(str(prima))) * factor
+        duracion_numerador += vp_flujo * periodo
+        valor_presente_total += vp_flujo
+        convexidad_numerador += vp_flujo * periodo * (periodo + 1)
+
+    # Cálculo de duración (en años)
+    duracion = (duracion_numerador / valor_presente_total) / periodos_por_anio
+
+    # Duración modificada
+    duracion_modificada = duracion / (Decimal('1') + cok)
+
+    # Convexidad (en años)
+    convexidad = (convexidad_numerador / (valor_presente_total * (Decimal('1') + cok) ** 2)) / (Decimal(periodos_por_anio) ** 2)
+
+    return float(duracion), float(convexidad), float(duracion_modificada), float(duracion + convexidad)
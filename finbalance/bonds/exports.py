@@ -0,0 +1,238 @@
+"""
+Exportación de cronogramas de pago en CSV y XLSX por streaming.
+
+Los bonos se leen con .iterator() y el cronograma de cada uno se calcula justo
+antes de escribirlo, así que la memoria no depende de cuántos bonos o periodos
+se exporten y la descarga empieza con el primer bono. El XLSX se arma a mano
+(SpreadsheetML dentro de un zip escrito en streaming), sin openpyxl.
+
+Bajo ASGI, Django acumula en memoria todo el contenido de un generador
+síncrono antes de enviarlo; por eso ahí se usa aexport_schedules, que pide
+cada bloque al generador síncrono en el hilo de la base de datos.
+"""
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+
+from .engine.cashflows import COLUMNAS
+from .engine.metrics import bond_schedule
+
+ENCABEZADOS = ['Bono', 'Periodo', 'Cuota', 'Interés', 'Amortización', 'Saldo', 'Prima', 'Prima (cálculo)', 'Flujo total']
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Tamaño aproximado de cada bloque enviado al cliente
+CHUNK_BYTES = 64 * 1024
+
+# Bonos leídos por consulta al recorrer el queryset
+BONOS_POR_LOTE = 500
+
+# Límite de filas de una hoja de Excel (incluye el encabezado)
+MAX_FILAS_HOJA = 1_048_576
+
+
+def schedule_rows(bonds):
+    """
+    Genera las filas [bono, periodo, cuota, ...] de los cronogramas de `bonds`.
+
+    `bonds` puede ser un queryset (se recorre con .iterator()) o cualquier iterable.
+    """
+    if hasattr(bonds, 'iterator'):
+        bonds = bonds.iterator(chunk_size=BONOS_POR_LOTE)
+    for bond in bonds:
+        flujos = bond_schedule(bond)
+        columnas = [getattr(flujos, nombre).tolist() for nombre in COLUMNAS]
+        columnas.append(flujos.flujo_total.round(2).tolist())
+        for fila in zip(*columnas):
+            yield [bond.pk, *fila]
+
+
+class _Buffer:
+    """
+    Archivo de sólo escritura que acumula lo escrito hasta que se vacía con drain()
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._pendiente = 0
+        self._posicion = 0
+
+    def write(self, datos):
+        self._partes.append(datos)
+        self._pendiente += len(datos)
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    @property
+    def pendiente(self):
+        """Bytes (o caracteres) escritos desde el último drain()"""
+        return self._pendiente
+
+    def drain(self):
+        # Sirve tanto para texto (csv) como para bytes (zip)
+        datos = self._partes[0][:0].join(self._partes) if self._partes else b''
+        self._partes = []
+        self._pendiente = 0
+        return datos
+
+
+def stream_csv(filas, encabezados=ENCABEZADOS):
+    """
+    Convierte las filas en bloques de texto CSV de ~CHUNK_BYTES
+    """
+    buffer = _Buffer()
+    buffer.write('\ufeff')  # BOM para que Excel reconozca UTF-8
+    writer = csv.writer(buffer)
+    writer.writerow(encabezados)
+    for fila in filas:
+        writer.writerow(fila)
+        if buffer.pendiente >= CHUNK_BYTES:
+            yield buffer.drain()
+    if buffer.pendiente:
+        yield buffer.drain()
+
+
+def _celda(valor, columna, fila):
+    referencia = f'{_columna_excel(columna)}{fila}'
+    if isinstance(valor, str):
+        return f'<c r="{referencia}" t="inlineStr"><is><t>{escape(valor)}</t></is></c>'
+    return f'<c r="{referencia}"><v>{valor!r}</v></c>'
+
+
+def _columna_excel(indice):
+    """0 -> A, 25 -> Z, 26 -> AA"""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _fila_xml(valores, numero):
+    celdas = ''.join(_celda(valor, columna, numero) for columna, valor in enumerate(valores))
+    return f'<row r="{numero}">{celdas}</row>'
+
+
+HOJA_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+HOJA_FIN = '</sheetData></worksheet>'
+
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{hojas}</Types>'
+)
+CONTENT_TYPE_HOJA = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+WORKBOOK_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{hojas}</sheets></workbook>'
+)
+WORKBOOK_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{hojas}</Relationships>'
+)
+
+
+def stream_xlsx(filas, encabezados=ENCABEZADOS, nombre_hoja='Flujos'):
+    """
+    Escribe las filas en un libro XLSX y lo entrega en bloques de ~CHUNK_BYTES.
+
+    Las hojas se escriben a medida que llegan las filas (una hoja nueva cada
+    MAX_FILAS_HOJA filas); el libro que las enumera se agrega al final del zip.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        hojas = 0
+        hoja = None
+        numero = MAX_FILAS_HOJA
+        for fila in filas:
+            if numero >= MAX_FILAS_HOJA:
+                if hoja is not None:
+                    hoja.write(HOJA_FIN.encode('utf-8'))
+                    hoja.close()
+                hojas += 1
+                hoja = libro.open(f'xl/worksheets/sheet{hojas}.xml', 'w', force_zip64=True)
+                hoja.write(HOJA_INICIO.encode('utf-8'))
+                hoja.write(_fila_xml(encabezados, 1).encode('utf-8'))
+                numero = 1
+            numero += 1
+            hoja.write(_fila_xml(fila, numero).encode('utf-8'))
+            if buffer.pendiente >= CHUNK_BYTES:
+                yield buffer.drain()
+
+        if hoja is None:
+            # Sin filas: una hoja con sólo el encabezado
+            hojas = 1
+            libro.writestr('xl/worksheets/sheet1.xml', HOJA_INICIO + _fila_xml(encabezados, 1) + HOJA_FIN)
+        else:
+            hoja.write(HOJA_FIN.encode('utf-8'))
+            hoja.close()
+
+        rango = range(1, hojas + 1)
+        libro.writestr('[Content_Types].xml', CONTENT_TYPES_XML.format(
+            hojas=''.join(CONTENT_TYPE_HOJA.format(n=n) for n in rango)))
+        libro.writestr('_rels/.rels', RELS_XML)
+        libro.writestr('xl/workbook.xml', WORKBOOK_XML.format(hojas=''.join(
+            f'<sheet name="{escape(nombre_hoja)}{"" if hojas == 1 else f" {n}"}" sheetId="{n}" r:id="rId{n}"/>'
+            for n in rango)))
+        libro.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS_XML.format(hojas=''.join(
+            f'<Relationship Id="rId{n}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{n}.xml"/>'
+            for n in rango)))
+    yield buffer.drain()
+
+
+STREAMS = {
+    'csv': stream_csv,
+    'xlsx': stream_xlsx,
+}
+
+
+def export_schedules(bonds, formato):
+    """
+    Generador con el contenido del archivo `formato` para los cronogramas de `bonds`
+    """
+    return STREAMS[formato](schedule_rows(bonds))
+
+
+async def aexport_schedules(bonds, formato):
+    """
+    Versión asíncrona de export_schedules, para StreamingHttpResponse bajo ASGI
+    """
+    bloques = export_schedules(bonds, formato)
+    siguiente = sync_to_async(next)
+    fin = object()
+    while (bloque := await siguiente(bloques, fin)) is not fin:
+        yield bloque
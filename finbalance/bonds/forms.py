@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from django import forms
 from .models import Bond
 
@@ -10,4 +12,180 @@ class BondForm(forms.ModelForm):
             'fecha_fin': forms.DateInput(attrs={'type': 'date'}),
             'periodo_gracia': forms.DateInput(attrs={'type': 'date', 'required': False}),
             'metodo_amortizacion': forms.TextInput(attrs={'disabled': True, 'value': 'Francés'}),
-        }
\ No newline at end of file
+        }
+
+FILTRO_INPUT_CLASS = 'w-full p-2 border border-gray-300 rounded focus:outline-none focus:ring-2 focus:ring-blue-500 text-sm'
+
+
+class BondFilterForm(forms.Form):
+    """
+    Filtros y orden del listado de bonos.
+
+    Cada rango y cada orden está respaldado por un índice de Bond (ver Meta.indexes).
+    """
+    ORDEN_CHOICES = [
+        ('-fecha_registro', 'Registro (más recientes)'),
+        ('fecha_registro', 'Registro (más antiguos)'),
+        ('-fecha_emision', 'Emisión (más recientes)'),
+        ('fecha_emision', 'Emisión (más antiguas)'),
+        ('-valor_nominal', 'Valor nominal (mayor)'),
+        ('valor_nominal', 'Valor nominal (menor)'),
+        ('-tasa_interes', 'Tasa (mayor)'),
+        ('tasa_interes', 'Tasa (menor)'),
+        ('-num_anios', 'Años (más)'),
+        ('num_anios', 'Años (menos)'),
+    ]
+
+    # (campo del modelo, filtro desde, filtro hasta)
+    RANGOS = [
+        ('tasa_interes', 'tasa_min', 'tasa_max'),
+        ('valor_nominal', 'nominal_min', 'nominal_max'),
+        ('fecha_emision', 'emision_desde', 'emision_hasta'),
+        ('num_anios', 'anios_min', 'anios_max'),
+    ]
+
+    q = forms.IntegerField(required=False, min_value=1, label="N° de bono")
+    tasa_min = forms.DecimalField(required=False, label="Tasa desde (%)")
+    tasa_max = forms.DecimalField(required=False, label="Tasa hasta (%)")
+    nominal_min = forms.DecimalField(required=False, label="Nominal desde")
+    nominal_max = forms.DecimalField(required=False, label="Nominal hasta")
+    emision_desde = forms.DateField(required=False, label="Emisión desde", widget=forms.DateInput(attrs={'type': 'date'}))
+    emision_hasta = forms.DateField(required=False, label="Emisión hasta", widget=forms.DateInput(attrs={'type': 'date'}))
+    anios_min = forms.IntegerField(required=False, min_value=0, label="Años desde")
+    anios_max = forms.IntegerField(required=False, min_value=0, label="Años hasta")
+    frecuencia_cupon = forms.TypedChoiceField(
+        required=False, coerce=int, empty_value=None, label="Frecuencia",
+        choices=[('', 'Todas')] + Bond.FRECUENCIA_CUPON_CHOICES,
+    )
+    tipo_gracia = forms.ChoiceField(
+        required=False, label="Gracia",
+        choices=[('', 'Todas'), ('sin', 'Sin gracia')] + Bond.TIPO_GRACIA_CHOICES,
+    )
+    orden = forms.ChoiceField(required=False, choices=ORDEN_CHOICES, label="Ordenar por")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs.setdefault('class', FILTRO_INPUT_CLASS)
+
+    def filter_queryset(self, queryset):
+        """
+        Aplica los filtros válidos al queryset
+        """
+        datos = self.cleaned_data if self.is_valid() else {}
+
+        if datos.get('q'):
+            queryset = queryset.filter(pk=datos['q'])
+        for campo, desde, hasta in self.RANGOS:
+            if datos.get(desde) is not None:
+                queryset = queryset.filter(**{f'{campo}__gte': datos[desde]})
+            if datos.get(hasta) is not None:
+                queryset = queryset.filter(**{f'{campo}__lte': datos[hasta]})
+        if datos.get('frecuencia_cupon') is not None:
+            queryset = queryset.filter(frecuencia_cupon=datos['frecuencia_cupon'])
+        if datos.get('tipo_gracia') == 'sin':
+            queryset = queryset.filter(tipo_gracia__isnull=True)
+        elif datos.get('tipo_gracia'):
+            queryset = queryset.filter(tipo_gracia=datos['tipo_gracia'])
+        return queryset
+
+    def has_filters(self):
+        datos = self.cleaned_data if self.is_valid() else {}
+        return any(valor not in (None, '') for nombre, valor in datos.items() if nombre != 'orden')
+
+    def ordering(self):
+        """
+        (campo, descendente) del orden elegido; por defecto el más reciente primero
+        """
+        orden = (self.cleaned_data.get('orden') if self.is_valid() else None) or '-fecha_registro'
+        return orden.lstrip('-'), orden.startswith('-')
+
+
+class SensitivityForm(forms.Form):
+    """
+    Rango de desplazamientos (puntos básicos) de la tasa anual de descuento
+    """
+    MAX_ESCENARIOS = 1001
+
+    desde = forms.IntegerField(required=False, initial=-300, min_value=-9900, max_value=10000, label="Desde (pb)")
+    hasta = forms.IntegerField(required=False, initial=300, min_value=-9900, max_value=10000, label="Hasta (pb)")
+    paso = forms.IntegerField(required=False, initial=5, min_value=1, label="Paso (pb)")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs.setdefault('class', FILTRO_INPUT_CLASS)
+
+    def clean(self):
+        datos = super().clean()
+        for campo in ('desde', 'hasta', 'paso'):
+            if datos.get(campo) is None and campo not in self.errors:
+                datos[campo] = self.fields[campo].initial
+        if self.errors:
+            return datos
+        if datos['hasta'] < datos['desde']:
+            raise forms.ValidationError("'Hasta' debe ser mayor o igual que 'desde'")
+        if (datos['hasta'] - datos['desde']) // datos['paso'] + 1 > self.MAX_ESCENARIOS:
+            raise forms.ValidationError(f"Como máximo {self.MAX_ESCENARIOS} escenarios; aumente el paso")
+        return datos
+
+    def shocks(self):
+        """Desplazamientos elegidos (los valores por defecto si el formulario no es válido)"""
+        datos = self.cleaned_data if self.is_valid() else {campo: f.initial for campo, f in self.fields.items()}
+        return tuple(range(datos['desde'], datos['hasta'] + 1, datos['paso']))
+
+
+class SimulationForm(forms.Form):
+    """
+    Parámetros de la simulación Monte Carlo de tasas (modelo de Vasicek)
+    """
+    trayectorias = forms.IntegerField(required=False, initial=10000, min_value=100, max_value=200000, label="Trayectorias")
+    volatilidad = forms.FloatField(required=False, initial=1.0, min_value=0, max_value=50, label="Volatilidad anual (%)")
+    reversion = forms.FloatField(required=False, initial=0.1, min_value=0, max_value=10, label="Reversión a la media")
+    media = forms.FloatField(required=False, min_value=-50, max_value=100, label="Tasa de largo plazo (%)")
+    semilla = forms.IntegerField(required=False, initial=0, min_value=0, label="Semilla")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs.setdefault('class', FILTRO_INPUT_CLASS)
+
+    def parameters(self):
+        """Parámetros para engine.montecarlo.simulate (los por defecto si el formulario no es válido)"""
+        datos = self.cleaned_data if self.is_valid() else {}
+        return {
+            campo: field.initial if datos.get(campo) is None else datos[campo]
+            for campo, field in self.fields.items()
+        }
+
+
+class LadderForm(forms.Form):
+    """
+    Rango de fechas y agrupación de la escalera de flujos de caja
+    """
+    AGRUPAR_CHOICES = [('mes', 'Por mes'), ('anio', 'Por año')]
+    DIAS_POR_DEFECTO = 365
+
+    desde = forms.DateField(required=False, label="Desde", widget=forms.DateInput(attrs={'type': 'date'}))
+    hasta = forms.DateField(required=False, label="Hasta (sin incluir)", widget=forms.DateInput(attrs={'type': 'date'}))
+    agrupar = forms.ChoiceField(required=False, initial='mes', choices=AGRUPAR_CHOICES, label="Agrupar")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs.setdefault('class', FILTRO_INPUT_CLASS)
+
+    def clean(self):
+        datos = super().clean()
+        if not datos.get('agrupar'):
+            datos['agrupar'] = self.fields['agrupar'].initial
+        if datos.get('desde') and datos.get('hasta') and datos['hasta'] <= datos['desde']:
+            raise forms.ValidationError("'Hasta' debe ser posterior a 'desde'")
+        return datos
+
+    def range(self, hoy):
+        """(desde, hasta, agrupar) elegidos; por defecto el año que empieza en `hoy`"""
+        datos = self.cleaned_data if self.is_valid() else {}
+        desde = datos.get('desde') or hoy
+        hasta = datos.get('hasta') or desde + timedelta(days=self.DIAS_POR_DEFECTO)
+        return desde, hasta, datos.get('agrupar') or self.fields['agrupar'].initial
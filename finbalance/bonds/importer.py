@@ -0,0 +1,225 @@
+"""
+Importación masiva de bonos desde CSV o JSON.
+
+Las filas se validan campo por campo con los campos del modelo y se insertan
+con bulk_create en lotes, cada uno en su propia transacción junto con sus
+flujos de caja fechados (ver ledger). Una fila inválida se reporta con su
+número de línea sin detener la importación.
+"""
+import csv
+import json
+import os
+from datetime import date
+from decimal import Decimal
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, models, transaction
+from django.utils import timezone
+
+from .engine import INPUT_FIELDS
+from .ledger import sync_cash_flows
+from .models import Bond
+
+FORMATOS = ('csv', 'json')
+
+TAMANO_LOTE = 1000
+
+# Valores aceptados para tiene_plazo_gracia además de los de BooleanField
+BOOLEANOS = {'si': True, 'sí': True, 'no': False}
+
+
+class RowError:
+    """
+    Fila rechazada: número de línea del archivo y mensajes por campo
+    """
+
+    def __init__(self, linea, errores):
+        self.linea = linea
+        self.errores = errores
+
+    def __str__(self):
+        detalle = '; '.join(f'{campo}: {" ".join(mensajes)}' for campo, mensajes in self.errores.items())
+        return f'Línea {self.linea}: {detalle}'
+
+
+class ImportResult:
+    """
+    Resumen de una importación
+    """
+
+    def __init__(self, fecha_registro):
+        self.fecha_registro = fecha_registro
+        self.creados = []
+        self.errores = []
+        self.filas = 0
+
+    def bonds(self):
+        """Bonos creados por esta importación"""
+        return Bond.objects.filter(pk__in=self.creados)
+
+    @property
+    def total_creados(self):
+        return len(self.creados)
+
+
+def detect_format(nombre):
+    """Formato según la extensión del archivo ('csv' si no se reconoce)"""
+    extension = os.path.splitext(nombre)[1].lower().lstrip('.')
+    return extension if extension in FORMATOS else 'csv'
+
+
+def read_rows(archivo, formato):
+    """
+    Genera (línea, fila) desde un archivo de texto CSV (con encabezados) o JSON
+    (una lista de objetos)
+    """
+    if formato == 'json':
+        datos = json.load(archivo)
+        if isinstance(datos, dict):
+            datos = datos.get('bonos', [])
+        for numero, fila in enumerate(datos, start=1):
+            yield numero, fila
+    else:
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila
+
+
+def _fast_parser(campo):
+    """
+    Conversión rápida para los tipos de campo del bono. Si falla, build_bond
+    recurre a campo.clean(), que produce el mensaje de error de Django.
+    """
+    opciones = {valor for valor, _ in campo.flatchoices} if campo.choices else None
+
+    if isinstance(campo, models.DecimalField):
+        exponente = Decimal(1).scaleb(-campo.decimal_places)
+        limite = Decimal(10) ** (campo.max_digits - campo.decimal_places)
+
+        def convertir(crudo):
+            valor = crudo if isinstance(crudo, Decimal) else Decimal(str(crudo))
+            redondeado = valor.quantize(exponente)
+            if redondeado != valor or abs(redondeado) >= limite:
+                raise ValueError(crudo)
+            return redondeado
+    elif isinstance(campo, models.IntegerField):
+        def convertir(crudo):
+            valor = int(crudo)
+            if valor != crudo and str(valor) != crudo:
+                raise ValueError(crudo)
+            return valor
+    elif isinstance(campo, models.CharField):
+        def convertir(crudo):
+            if not isinstance(crudo, str) or len(crudo) > campo.max_length:
+                raise ValueError(crudo)
+            return crudo
+    elif isinstance(campo, models.DateField):
+        def convertir(crudo):
+            return crudo if isinstance(crudo, date) else date.fromisoformat(crudo)
+    else:
+        return partial(campo.clean, model_instance=None)
+
+    if opciones is None:
+        return convertir
+
+    def convertir_opcion(crudo):
+        valor = convertir(crudo)
+        if valor not in opciones:
+            raise ValueError(crudo)
+        return valor
+    return convertir_opcion
+
+
+# (campo, conversión rápida) de cada dato de entrada del bono
+_CAMPOS = [(campo, _fast_parser(campo)) for campo in (Bond._meta.get_field(nombre) for nombre in INPUT_FIELDS)]
+
+
+def build_bond(fila, fecha_registro=None):
+    """
+    Valida una fila y devuelve el Bond sin guardar; lanza ValidationError por campo
+    """
+    valores = {}
+    errores = {}
+    for campo, convertir in _CAMPOS:
+        crudo = fila.get(campo.name)
+        if isinstance(crudo, str):
+            crudo = crudo.strip()
+            if campo.name == 'tiene_plazo_gracia':
+                crudo = BOOLEANOS.get(crudo.lower(), crudo)
+        if crudo in (None, ''):
+            if campo.has_default():
+                valores[campo.name] = campo.get_default()
+                continue
+            if not campo.null:
+                errores[campo.name] = [str(campo.error_messages['null'])]
+            valores[campo.name] = None
+            continue
+        try:
+            valores[campo.name] = convertir(crudo)
+        except (ValueError, TypeError, ArithmeticError, ValidationError):
+            try:
+                valores[campo.name] = campo.clean(crudo, None)
+            except ValidationError as e:
+                errores[campo.name] = e.messages
+
+    if errores:
+        raise ValidationError(errores)
+
+    # Mismas reglas que bond_create
+    if valores['tipo_tasa_interes'] != 'nominal':
+        valores['capitalizacion'] = None
+    if valores['tipo_gracia'] or valores['periodos_gracia']:
+        valores['tiene_plazo_gracia'] = True
+    if not valores['tiene_plazo_gracia']:
+        valores['periodos_gracia'] = None
+        valores['tipo_gracia'] = None
+
+    return Bond(fecha_registro=fecha_registro or timezone.now(), **valores)
+
+
+def _insert(bonos, resultado):
+    """
+    Inserta un lote; si la base rechaza el lote, reintenta fila por fila para
+    aislar las que fallan
+    """
+    try:
+        with transaction.atomic():
+            creados = Bond.objects.bulk_create([b for _, b in bonos])
+            sync_cash_flows(creados)
+        resultado.creados.extend(bono.pk for bono in creados)
+        return
+    except DatabaseError:
+        pass
+    for linea, bono in bonos:
+        try:
+            with transaction.atomic():
+                bono.save()
+                sync_cash_flows([bono])
+            resultado.creados.append(bono.pk)
+        except DatabaseError as e:
+            resultado.errores.append(RowError(linea, {'__all__': [str(e)]}))
+
+
+def import_bonds(filas, tamano_lote=TAMANO_LOTE):
+    """
+    Importa las filas (línea, dict) en lotes de `tamano_lote` y devuelve un ImportResult
+    """
+    fecha_registro = timezone.now()
+    resultado = ImportResult(fecha_registro)
+    lote = []
+    for linea, fila in filas:
+        resultado.filas += 1
+        if not isinstance(fila, dict):
+            resultado.errores.append(RowError(linea, {'__all__': ['La fila debe ser un objeto']}))
+            continue
+        try:
+            lote.append((linea, build_bond(fila, fecha_registro)))
+        except ValidationError as e:
+            resultado.errores.append(RowError(linea, e.message_dict))
+        if len(lote) >= tamano_lote:
+            _insert(lote, resultado)
+            lote = []
+    if lote:
+        _insert(lote, resultado)
+    return resultado
@@ -0,0 +1,143 @@
+"""
+Flujos de caja fechados (CashFlow) y consultas agregadas sobre ellos.
+
+El cronograma de cada bono se guarda fila por fila con su fecha de pago, así las
+escaleras de flujos, los próximos pagos y los totales de un rango de fechas son
+consultas SQL agregadas sobre el índice (fecha, bono) en lugar de recalcular
+todos los bonos en Python. Las filas se regeneran en bloque cuando se crea un
+bono o cambian los datos que afectan al cronograma o a sus fechas.
+
+Las consultas aceptan una cartera (Portfolio): entonces sólo cuentan sus bonos
+y cada monto se multiplica por la cantidad de la posición.
+"""
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Sum
+from django.db.models.functions import TruncMonth, TruncYear
+
+from .engine import INPUT_FIELDS, fingerprint
+from .engine.dates import payment_dates
+from .engine.metrics import bond_schedule
+from .engine.planner import CAMPOS_ETAPA
+from .models import CashFlow
+
+# Datos del bono de los que dependen las filas de CashFlow
+CAMPOS_FLUJOS = tuple(
+    campo for campo in INPUT_FIELDS
+    if campo in CAMPOS_ETAPA['cronograma'] or campo in ('fecha_emision', 'dias_por_anio')
+)
+
+# Filas por INSERT y bonos por transacción al regenerar
+TAMANO_LOTE = 2000
+BONOS_POR_TRANSACCION = 200
+
+AGRUPACIONES = {'mes': TruncMonth, 'anio': TruncYear}
+
+# Columnas que se suman en escaleras y totales
+MONTOS = ('flujo_total', 'interes', 'amortizacion', 'prima')
+
+
+def needs_sync(anterior, nuevo):
+    """
+    True si entre los datos `anterior` y `nuevo` cambia el cronograma o sus fechas
+    """
+    return fingerprint(anterior, CAMPOS_FLUJOS) != fingerprint(nuevo, CAMPOS_FLUJOS)
+
+
+def build_cash_flows(bond):
+    """
+    Filas de CashFlow (sin guardar) del cronograma del bono
+    """
+    flujos = bond_schedule(bond)
+    fechas = payment_dates(bond.fecha_emision, bond.frecuencia_cupon, bond.dias_por_anio, len(flujos))
+    columnas = zip(
+        flujos.periodo.tolist(), fechas.tolist(), flujos.cuota.tolist(), flujos.interes.tolist(),
+        flujos.amortizacion.tolist(), flujos.saldo.tolist(), flujos.prima_calculo.tolist(),
+        flujos.flujo_total.tolist(),
+    )
+    return [
+        CashFlow(bond_id=bond.pk, periodo=periodo, fecha=fecha, cuota=cuota, interes=interes,
+                 amortizacion=amortizacion, saldo=saldo, prima=prima, flujo_total=flujo_total)
+        for periodo, fecha, cuota, interes, amortizacion, saldo, prima, flujo_total in columnas
+    ]
+
+
+def sync_cash_flows(bonds, batch_size=TAMANO_LOTE):
+    """
+    Reemplaza las filas de CashFlow de `bonds` (ya guardados). Devuelve las filas creadas
+    """
+    bonds = list(bonds)
+    creadas = 0
+    for inicio in range(0, len(bonds), BONOS_POR_TRANSACCION):
+        grupo = bonds[inicio:inicio + BONOS_POR_TRANSACCION]
+        with transaction.atomic():
+            CashFlow.objects.filter(bond_id__in=[bond.pk for bond in grupo]).delete()
+            filas = []
+            for bond in grupo:
+                filas.extend(build_cash_flows(bond))
+                if len(filas) >= batch_size:
+                    CashFlow.objects.bulk_create(filas, batch_size=batch_size)
+                    creadas += len(filas)
+                    filas = []
+            CashFlow.objects.bulk_create(filas, batch_size=batch_size)
+            creadas += len(filas)
+    return creadas
+
+
+def _flujos(desde=None, hasta=None, bonds=None, portfolio=None):
+    """CashFlow en [desde, hasta), opcionalmente de algunos bonos (ids o queryset) o de una cartera"""
+    queryset = CashFlow.objects.all()
+    if portfolio is not None:
+        # Este filtro va antes que los montos para que usen la misma unión con las posiciones
+        queryset = queryset.filter(bond__posiciones__portfolio=portfolio)
+    if desde is not None:
+        queryset = queryset.filter(fecha__gte=desde)
+    if hasta is not None:
+        queryset = queryset.filter(fecha__lt=hasta)
+    if bonds is not None:
+        queryset = queryset.filter(bond__in=bonds)
+    return queryset
+
+
+def _montos(portfolio=None):
+    """Expresión de cada monto: la columna o, en una cartera, la columna por la cantidad"""
+    if portfolio is None:
+        return {monto: F(monto) for monto in MONTOS}
+    cantidad = F('bond__posiciones__cantidad')
+    return {monto: ExpressionWrapper(F(monto) * cantidad, output_field=FloatField()) for monto in MONTOS}
+
+
+def _sumas(portfolio=None):
+    return {monto: Sum(expresion) for monto, expresion in _montos(portfolio).items()}
+
+
+def cash_flow_ladder(desde=None, hasta=None, bonds=None, agrupar='mes', portfolio=None):
+    """
+    Escalera de flujos: por mes (o año), la suma de cada monto y el número de pagos
+    """
+    return list(
+        _flujos(desde, hasta, bonds, portfolio)
+        .annotate(inicio=AGRUPACIONES[agrupar]('fecha'))
+        .values('inicio')
+        .annotate(pagos=Count('id'), bonos=Count('bond', distinct=True), **_sumas(portfolio))
+        .order_by('inicio')
+    )
+
+
+def cash_flow_totals(desde=None, hasta=None, bonds=None, portfolio=None):
+    """
+    Totales de los flujos en [desde, hasta)
+    """
+    totales = _flujos(desde, hasta, bonds, portfolio).aggregate(pagos=Count('id'), **_sumas(portfolio))
+    return {clave: valor or 0 for clave, valor in totales.items()}
+
+
+def upcoming_payments(desde, hasta=None, bonds=None, limite=20, portfolio=None):
+    """
+    Próximos pagos desde `desde`, en orden de fecha
+    """
+    return list(
+        _flujos(desde, hasta, bonds, portfolio)
+        .order_by('fecha', 'bond_id')
+        .values('fecha', 'bond_id', 'periodo')
+        .annotate(**_montos(portfolio))[:limite]
+    )
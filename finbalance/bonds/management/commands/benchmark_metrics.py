@@ -0,0 +1,142 @@
+"""
+Benchmark del cálculo de métricas y de la página de detalle.
+
+Ejemplos:
+    python manage.py benchmark_metrics --quick --output antes.json
+    python manage.py benchmark_metrics --quick --baseline antes.json --threshold 0.15
+
+Las peticiones a bond_detail se hacen con el cliente de pruebas sobre una base
+de datos temporal (la de desarrollo no se toca) y con una caché en memoria
+propia, medidas sin caché (cálculo completo) y con la caché ya llena.
+"""
+import json
+import time
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from bonds.benchmarks import GRILLA_RAPIDA, case_key, case_terms, compare, environment, grid, time_stages
+from bonds.engine import INPUT_FIELDS
+from bonds.models import Bond, BondMetrics
+
+CACHE_BENCHMARK = {
+    'default': {
+        'BACKEND': 'bonds.cache_backends.InstrumentedLocMemCache',
+        'LOCATION': 'benchmark',
+        'TIMEOUT': None,
+    }
+}
+
+
+def _medir_peticion(cliente, url, repeticiones, antes=None):
+    tiempos = []
+    for _ in range(repeticiones):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        respuesta = cliente.get(url)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        if respuesta.status_code != 200:
+            raise CommandError(f"{url} respondió {respuesta.status_code}")
+    return {'min': min(tiempos), 'mediana': sorted(tiempos)[len(tiempos) // 2]}
+
+
+class Command(BaseCommand):
+    help = "Mide cada etapa del cálculo de métricas y la página de detalle sobre una grilla de bonos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quick', action='store_true', help="Grilla reducida")
+        parser.add_argument('--repeat', type=int, default=7, help="Muestras por etapa")
+        parser.add_argument('--detail-repeat', type=int, default=3, help="Repeticiones por petición de detalle")
+        parser.add_argument('--no-detail', action='store_true', help="No medir la página de detalle")
+        parser.add_argument('--output', help="Guardar los resultados en este archivo JSON")
+        parser.add_argument('--baseline', help="Comparar contra los resultados de una corrida anterior")
+        parser.add_argument('--threshold', type=float, default=0.2, help="Lentitud tolerada respecto de la base (0.2 = 20%%)")
+        parser.add_argument('--noise-floor-ms', type=float, default=0.05, help="Diferencias menores a esto se ignoran")
+
+    def handle(self, *args, **options):
+        casos = list(grid(**GRILLA_RAPIDA) if options['quick'] else grid())
+        resultados = [
+            {'caso_id': case_key(caso), 'caso': caso}
+            for caso in casos
+        ]
+
+        self.stdout.write(f"Midiendo {len(casos)} casos ({options['repeat']} muestras por etapa)")
+        for fila in resultados:
+            fila['etapas'], fila['periodos'] = time_stages(case_terms(**fila['caso']), options['repeat'])
+
+        if not options['no_detail']:
+            self._medir_detalle(resultados, options['detail_repeat'])
+
+        salida = {
+            'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'entorno': environment(),
+            'grilla': 'rapida' if options['quick'] else 'completa',
+            'repeticiones': options['repeat'],
+            'resultados': resultados,
+        }
+        self._resumen(resultados)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as archivo:
+                json.dump(salida, archivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Resultados guardados en {options['output']}")
+
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as archivo:
+                    base = json.load(archivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer la base {options['baseline']}: {e}")
+            regresiones = compare(salida, base, options['threshold'], options['noise_floor_ms'])
+            if regresiones:
+                for caso_id, etapa, ms_base, ms_actual in regresiones:
+                    self.stdout.write(self.style.ERROR(
+                        f"  {caso_id} {etapa}: {ms_base:.3f} ms -> {ms_actual:.3f} ms ({ms_actual / ms_base - 1:+.0%})"
+                    ))
+                raise CommandError(f"{len(regresiones)} etapas más lentas que la base (umbral {options['threshold']:.0%})")
+            self.stdout.write(self.style.SUCCESS("Sin regresiones respecto de la base"))
+
+    def _medir_detalle(self, resultados, repeticiones):
+        """
+        Tiempos de bond_detail por caso en una base temporal, sin caché y con caché
+        """
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=CACHE_BENCHMARK):
+                cliente = Client()
+                cliente.force_login(User.objects.create_user('benchmark'))
+                cache = caches['default']
+                for fila in resultados:
+                    terms = case_terms(**fila['caso'])
+                    bond = Bond.objects.create(**{campo: getattr(terms, campo) for campo in INPUT_FIELDS})
+                    url = reverse('bonds:detail', args=[bond.id])
+
+                    def sin_cache():
+                        cache.clear()
+                        BondMetrics.objects.filter(bond=bond).delete()
+
+                    fila['detalle'] = _medir_peticion(cliente, url, repeticiones, antes=sin_cache)
+                    fila['detalle_cache'] = _medir_peticion(cliente, url, repeticiones)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+    def _resumen(self, resultados):
+        self.stdout.write(f"{'caso':<34} {'periodos':>8} {'total ms':>9} {'detalle ms':>11} {'c/caché ms':>11}")
+        for fila in resultados:
+            detalle, con_cache = (
+                f"{fila[clave]['min']:.1f}" if clave in fila else '-' for clave in ('detalle', 'detalle_cache')
+            )
+            self.stdout.write(
+                f"{fila['caso_id']:<34} {fila['periodos']:>8} {fila['etapas']['total']['min']:>9.3f} "
+                f"{detalle:>11} {con_cache:>11}"
+            )
@@ -0,0 +1,56 @@
+"""
+Importa bonos desde un archivo CSV o JSON.
+
+Ejemplo:
+    python manage.py import_bonds cartera.csv --warm
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bonds.cache import invalidate_bond_count
+from bonds.batch import revalue_bonds
+from bonds.importer import FORMATOS, TAMANO_LOTE, detect_format, import_bonds, read_rows
+
+
+class Command(BaseCommand):
+    help = "Importa bonos en bloque desde un archivo CSV o JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo a importar")
+        parser.add_argument('--format', choices=FORMATOS, help="Formato del archivo (por defecto, según la extensión)")
+        parser.add_argument('--batch-size', type=int, default=TAMANO_LOTE, help="Filas por transacción")
+        parser.add_argument('--warm', action='store_true', help="Calcular las métricas de los bonos importados")
+        parser.add_argument('--workers', type=int, default=None, help="Procesos para --warm (por defecto, uno por CPU)")
+        parser.add_argument('--max-errors', type=int, default=20, help="Errores a mostrar en el reporte")
+
+    def handle(self, *args, **options):
+        formato = options['format'] or detect_format(options['archivo'])
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+                resultado = import_bonds(read_rows(archivo, formato), options['batch_size'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"No se pudo leer {options['archivo']}: {e}")
+        invalidate_bond_count()
+        segundos = time.perf_counter() - inicio
+
+        self.stdout.write(
+            f"{resultado.total_creados} bonos importados de {resultado.filas} filas "
+            f"en {segundos:.2f} s ({resultado.filas / max(segundos, 1e-9):,.0f} filas/s)"
+        )
+        if resultado.errores:
+            self.stdout.write(self.style.WARNING(f"{len(resultado.errores)} filas con errores:"))
+            for error in resultado.errores[:options['max_errors']]:
+                self.stdout.write(f"  {error}")
+            if len(resultado.errores) > options['max_errors']:
+                self.stdout.write(f"  ... y {len(resultado.errores) - options['max_errors']} más")
+
+        if options['warm'] and resultado.creados:
+            valorizacion = revalue_bonds(resultado.bonds(), workers=options['workers'])
+            self.stdout.write(
+                f"Métricas calculadas para {valorizacion.calculados} bonos en {valorizacion.segundos:.2f} s "
+                f"con {valorizacion.procesos} procesos"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Importación terminada"))
@@ -0,0 +1,80 @@
+"""
+Mide el tiempo de importación del proyecto (django.setup() + URLconf).
+
+Ejecuta un intérprete nuevo con `python -X importtime`, muestra los módulos más
+costosos y falla si se supera el presupuesto o si se importa al arrancar algún
+módulo que debe cargarse de forma diferida (por defecto, matplotlib).
+"""
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+CODIGO_ARRANQUE = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+MODULOS_DIFERIDOS = ['matplotlib']
+
+
+def parse_importtime(salida):
+    """
+    Convierte la salida de -X importtime en tuplas (módulo, propio_us, acumulado_us, nivel)
+    """
+    filas = []
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'imported package' in linea:
+            continue
+        propio, acumulado, modulo = linea[len('import time:'):].split('|')
+        nivel = (len(modulo) - len(modulo.lstrip()) - 1) // 2
+        filas.append((modulo.strip(), int(propio), int(acumulado), nivel))
+    return filas
+
+
+class Command(BaseCommand):
+    help = "Reporta los módulos más lentos de importar al arrancar el proyecto"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help="Cantidad de módulos a mostrar")
+        parser.add_argument(
+            '--budget-ms', type=float, default=getattr(settings, 'IMPORT_TIME_BUDGET_MS', None),
+            help="Falla si el tiempo total de importación supera este valor (ms)",
+        )
+        parser.add_argument(
+            '--lazy', nargs='*', default=getattr(settings, 'LAZY_IMPORTS', MODULOS_DIFERIDOS),
+            help="Paquetes que no deben importarse al arrancar",
+        )
+
+    def handle(self, *args, **options):
+        entorno = os.environ.copy()
+        entorno.setdefault('DJANGO_SETTINGS_MODULE', 'finbalance.settings')
+        proceso = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CODIGO_ARRANQUE],
+            cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+        )
+        if proceso.returncode != 0:
+            raise CommandError(f"El arranque falló:\n{proceso.stderr[-2000:]}")
+
+        filas = parse_importtime(proceso.stderr)
+        total_ms = sum(acumulado for _, _, acumulado, nivel in filas if nivel == 0) / 1000
+
+        self.stdout.write(f"Tiempo total de importación: {total_ms:.1f} ms ({len(filas)} módulos)\n")
+        self.stdout.write(f"{'acumulado ms':>13} {'propio ms':>10}  módulo")
+        raices = sorted((f for f in filas if f[3] == 0), key=lambda f: f[2], reverse=True)
+        for modulo, propio, acumulado, _ in raices[:options['top']]:
+            self.stdout.write(f"{acumulado / 1000:>13.1f} {propio / 1000:>10.1f}  {modulo}")
+
+        errores = []
+        importados = {modulo.split('.')[0] for modulo, _, _, _ in filas}
+        for paquete in options['lazy']:
+            if paquete in importados:
+                errores.append(f"'{paquete}' se importa al arrancar; debe importarse de forma diferida")
+        if options['budget_ms'] is not None and total_ms > options['budget_ms']:
+            errores.append(f"{total_ms:.1f} ms supera el presupuesto de {options['budget_ms']:.1f} ms")
+
+        if errores:
+            raise CommandError('\n'.join(errores))
+        self.stdout.write(self.style.SUCCESS("Importación dentro del presupuesto"))
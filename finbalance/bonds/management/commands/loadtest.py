@@ -0,0 +1,192 @@
+"""
+Prueba de carga de las vistas asíncronas sobre la aplicación ASGI, en el mismo proceso.
+
+    python manage.py loadtest
+    python manage.py loadtest --slow 8 --fast 300 --compare-inline
+
+Mide la latencia del listado (peticiones baratas) sola y mientras varios
+clientes piden sin pausa gráficos o detalles de bonos nuevos (cálculo completo
+en el ejecutor de procesos). Con --compare-inline repite la carga calculando en
+el mismo hilo que atiende las peticiones, para ver lo que aporta el ejecutor.
+Usa una base de datos temporal; la de desarrollo no se toca.
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from bonds.benchmarks import case_terms
+from bonds.compute import get_executor
+from bonds.engine import INPUT_FIELDS
+from bonds.models import Bond
+
+CACHE_CARGA = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'loadtest',
+        'TIMEOUT': None,
+    }
+}
+
+
+async def _get(app, path, cookie):
+    """
+    GET a la aplicación ASGI; devuelve (estado, segundos)
+    """
+    ruta, _, consulta = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(),
+        'query_string': consulta.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    terminada = asyncio.Event()
+    pedida = False
+    estado = None
+
+    async def receive():
+        nonlocal pedida
+        if not pedida:
+            pedida = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await terminada.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(mensaje):
+        nonlocal estado
+        if mensaje['type'] == 'http.response.start':
+            estado = mensaje['status']
+        elif mensaje['type'] == 'http.response.body' and not mensaje.get('more_body'):
+            terminada.set()
+
+    inicio = time.perf_counter()
+    await app(scope, receive, send)
+    return estado, time.perf_counter() - inicio
+
+
+def _resumen(tiempos):
+    if not tiempos:
+        return {'p50': float('nan'), 'p95': float('nan'), 'max': float('nan')}
+    ordenados = sorted(tiempos)
+    return {
+        'p50': statistics.median(ordenados) * 1000,
+        'p95': ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))] * 1000,
+        'max': ordenados[-1] * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = "Latencia del listado con y sin cálculos pesados en paralelo (aplicación ASGI en proceso)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fast', type=int, default=200, help="Peticiones al listado por escenario")
+        parser.add_argument('--fast-concurrency', type=int, default=4, help="Clientes concurrentes del listado")
+        parser.add_argument('--slow', type=int, default=6, help="Clientes que piden cálculos pesados sin pausa")
+        parser.add_argument('--slow-view', choices=('chart', 'detail'), default='chart', help="Vista pesada a pedir")
+        parser.add_argument('--slow-years', type=int, default=30, help="Años de los bonos pesados")
+        parser.add_argument('--slow-frequency', type=int, default=360, help="Frecuencia de cupón de los bonos pesados")
+        parser.add_argument('--workers', type=int, help="Procesos del ejecutor (por defecto, FINBALANCE_COMPUTE_WORKERS)")
+        parser.add_argument('--queue', type=int, help="Cola del ejecutor (por defecto, FINBALANCE_COMPUTE_QUEUE)")
+        parser.add_argument('--compare-inline', action='store_true', help="Repetir la carga calculando en línea")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        # Base temporal en archivo: varios hilos escriben a la vez
+        directorio = tempfile.mkdtemp(prefix='finbalance-loadtest-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directorio, 'loadtest.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            ajustes = {'CACHES': CACHE_CARGA, 'FINBALANCE_INSTRUMENTATION': False}
+            for opcion, ajuste in (('workers', 'FINBALANCE_COMPUTE_WORKERS'), ('queue', 'FINBALANCE_COMPUTE_QUEUE')):
+                if options[opcion] is not None:
+                    ajustes[ajuste] = options[opcion]
+            with override_settings(**ajustes):
+                self._ejecutar(options)
+        finally:
+            get_executor().shutdown()
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+    def _ejecutar(self, options):
+        cliente = Client()
+        cliente.force_login(User.objects.create_user('carga'))
+        cookie = f"sessionid={cliente.cookies['sessionid'].value}"
+        terms = case_terms(5, 2, None, 'sin_costes')
+        Bond.objects.bulk_create([Bond(**{campo: getattr(terms, campo) for campo in INPUT_FIELDS}) for _ in range(100)])
+        app = get_asgi_application()
+
+        escenarios = [('solo listado', None, None), ('con carga (ejecutor)', options['slow'], None)]
+        if options['compare_inline']:
+            escenarios.append(('con carga (en línea)', options['slow'], 0))
+
+        self.stdout.write(
+            f"Listado: {options['fast']} peticiones, {options['fast_concurrency']} clientes · "
+            f"carga: {options['slow']} clientes pidiendo '{options['slow_view']}' de bonos de "
+            f"{options['slow_years'] * options['slow_frequency']} periodos"
+        )
+        self.stdout.write(f"{'escenario':<24} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>9} {'pesadas':>8} {'pesadas p50 ms':>15} {'503':>5}")
+        for nombre, lentos, workers in escenarios:
+            ajustes = {} if workers is None else {'FINBALANCE_COMPUTE_WORKERS': workers}
+            with override_settings(**ajustes):
+                rapidas, pesadas, ocupado = asyncio.run(self._escenario(app, cookie, options, lentos or 0))
+            resumen, resumen_pesadas = _resumen(rapidas), _resumen(pesadas)
+            self.stdout.write(
+                f"{nombre:<24} {resumen['p50']:>8.1f} {resumen['p95']:>8.1f} {resumen['max']:>9.1f} "
+                f"{len(pesadas):>8} {resumen_pesadas['p50']:>15.1f} {ocupado:>5}"
+            )
+
+    async def _escenario(self, app, cookie, options, lentos):
+        """
+        Latencias del listado mientras `lentos` clientes piden cálculos pesados
+        """
+        url_listado = reverse('bonds:list')
+        terms = case_terms(options['slow_years'], options['slow_frequency'], 'parcial', 'ambos')
+        datos_pesados = {campo: getattr(terms, campo) for campo in INPUT_FIELDS}
+        parar = asyncio.Event()
+        pesadas, rapidas = [], []
+        ocupado = creados = 0
+
+        async def cliente_pesado():
+            nonlocal ocupado, creados
+            while not parar.is_set():
+                # Un bono nuevo en cada vuelta, con otro valor nominal para que
+                # ninguna etapa del cálculo esté en caché
+                creados += 1
+                bond = await Bond.objects.acreate(**{**datos_pesados, 'valor_nominal': datos_pesados['valor_nominal'] + creados})
+                url = (reverse('bonds:chart', args=[bond.id, 'png']) if options['slow_view'] == 'chart'
+                       else reverse('bonds:detail', args=[bond.id]))
+                estado, segundos = await _get(app, url, cookie)
+                if estado == 503:
+                    ocupado += 1
+                    await asyncio.sleep(0.05)
+                else:
+                    pesadas.append(segundos)
+
+        pendientes = iter(range(options['fast']))
+
+        async def cliente_rapido():
+            for _ in pendientes:
+                estado, segundos = await _get(app, url_listado, cookie)
+                if estado != 200:
+                    raise RuntimeError(f"El listado respondió {estado}")
+                rapidas.append(segundos)
+
+        tareas_pesadas = [asyncio.create_task(cliente_pesado()) for _ in range(lentos)]
+        if lentos:
+            # Dar tiempo a que la carga se establezca antes de medir
+            await asyncio.sleep(0.5)
+        await asyncio.gather(*(cliente_rapido() for _ in range(options['fast_concurrency'])))
+        parar.set()
+        await asyncio.gather(*tareas_pesadas)
+        return rapidas, pesadas, ocupado
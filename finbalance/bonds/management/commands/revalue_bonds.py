@@ -0,0 +1,42 @@
+"""
+Recalcula las métricas de todos los bonos (revalorización de fin de día).
+
+Ejemplo:
+    python manage.py revalue_bonds --workers 8
+"""
+from django.core.management.base import BaseCommand
+
+from bonds.batch import TAMANO_LOTE, revalue_bonds
+from bonds.models import Bond
+
+
+class Command(BaseCommand):
+    help = "Recalcula en paralelo las métricas de los bonos y las guarda en bloque"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Procesos de cálculo (por defecto, uno por CPU)")
+        parser.add_argument('--chunk-size', type=int, default=TAMANO_LOTE, help="Bonos por lote enviado a cada proceso")
+        parser.add_argument('--stale-only', action='store_true', help="Sólo bonos sin métricas o con métricas desactualizadas")
+        parser.add_argument('--ids', nargs='*', type=int, help="Revalorizar sólo estos bonos")
+
+    def handle(self, *args, **options):
+        queryset = Bond.objects.all()
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+
+        def progress(resultado):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"  {resultado.leidos} bonos leídos, {resultado.calculados} calculados")
+
+        resultado = revalue_bonds(
+            queryset, workers=options['workers'], chunk_size=options['chunk_size'],
+            stale_only=options['stale_only'], progress=progress,
+        )
+
+        self.stdout.write(
+            f"{resultado.calculados} bonos revalorizados de {resultado.leidos} leídos en {resultado.segundos:.2f} s "
+            f"con {resultado.procesos} procesos ({resultado.bonos_por_segundo:,.0f} bonos/s)"
+        )
+        for pk, mensaje in resultado.errores:
+            self.stdout.write(self.style.WARNING(f"  Bono {pk}: {mensaje}"))
+        self.stdout.write(self.style.SUCCESS("Revalorización terminada"))
@@ -0,0 +1,44 @@
+"""
+Regenera los flujos de caja fechados (CashFlow) de los bonos.
+
+Ejemplo:
+    python manage.py sync_cash_flows --missing-only
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from bonds.ledger import BONOS_POR_TRANSACCION, sync_cash_flows
+from bonds.models import Bond
+
+
+class Command(BaseCommand):
+    help = "Regenera en bloque las filas de CashFlow a partir del cronograma de cada bono"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', nargs='*', type=int, help="Regenerar sólo estos bonos")
+        parser.add_argument('--missing-only', action='store_true', help="Sólo bonos sin filas de CashFlow")
+
+    def handle(self, *args, **options):
+        queryset = Bond.objects.order_by('pk')
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+        if options['missing_only']:
+            queryset = queryset.filter(flujos_caja__isnull=True)
+
+        inicio = time.perf_counter()
+        bonos = filas = 0
+        lote = []
+        for bond in queryset.iterator(chunk_size=BONOS_POR_TRANSACCION):
+            lote.append(bond)
+            if len(lote) == BONOS_POR_TRANSACCION:
+                filas += sync_cash_flows(lote)
+                bonos += len(lote)
+                lote = []
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f"  {bonos} bonos, {filas} filas")
+        filas += sync_cash_flows(lote)
+        bonos += len(lote)
+
+        self.stdout.write(f"{filas} flujos de {bonos} bonos en {time.perf_counter() - inicio:.2f} s")
+        self.stdout.write(self.style.SUCCESS("Flujos de caja sincronizados"))
@@ -0,0 +1,71 @@
+"""
+Middleware de medición de tiempos por etapa.
+
+Sólo se instala si FINBALANCE_INSTRUMENTATION está activo; si no, Django lo
+descarta al arrancar (MiddlewareNotUsed) y no añade ningún costo por petición.
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .engine import instrumentation
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    with instrumentation.stage('orm'):
+        return execute(sql, params, many, context)
+
+
+class ServerTimingMiddleware:
+    """
+    Mide cada petición (vista, consultas, métricas, plantilla, ...) y devuelve
+    las etapas en la cabecera Server-Timing; además alimenta los histogramas
+    que expone la vista de métricas.
+
+    En modo asíncrono las consultas corren en otros hilos y no se miden por
+    separado (sí las demás etapas).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'FINBALANCE_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        instrumentation.enable()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = instrumentation.begin_request()
+        inicio = time.perf_counter()
+        try:
+            with connections['default'].execute_wrapper(_medir_consulta):
+                response = self.get_response(request)
+        finally:
+            total, etapas = self._terminar(token, inicio)
+        return self._cabecera(response, etapas, total)
+
+    async def __acall__(self, request):
+        token = instrumentation.begin_request()
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            total, etapas = self._terminar(token, inicio)
+        return self._cabecera(response, etapas, total)
+
+    def _terminar(self, token, inicio):
+        total = time.perf_counter() - inicio
+        instrumentation.REGISTRO.add('peticion', total)
+        return total, instrumentation.end_request(token)
+
+    def _cabecera(self, response, etapas, total):
+        if not response.streaming:
+            response['Server-Timing'] = instrumentation.server_timing({**etapas, 'total': total})
+        return response
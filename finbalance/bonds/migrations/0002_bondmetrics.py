@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bonds', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BondMetrics',
+            fields=[
+                ('bond', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='metricas', serialize=False, to='bonds.bond', verbose_name='Bono')),
+                ('fingerprint', models.CharField(db_index=True, max_length=64, verbose_name='Huella de entradas')),
+                ('engine_version', models.PositiveIntegerField(verbose_name='Versión del motor')),
+                ('periodos_por_anio', models.IntegerField(verbose_name='Nº Períodos por Año')),
+                ('periodo_nombre', models.CharField(max_length=20, verbose_name='Nombre del período')),
+                ('dias_capitalizacion', models.IntegerField(verbose_name='Días capitalización')),
+                ('tea', models.FloatField(null=True, verbose_name='TEA (%)')),
+                ('tep', models.FloatField(null=True, verbose_name='TEP (%)')),
+                ('cok_periodo', models.FloatField(null=True, verbose_name='COK del período (%)')),
+                ('precio_actual', models.FloatField(null=True, verbose_name='Precio Actual')),
+                ('utilidad', models.FloatField(null=True, verbose_name='Utilidad / Pérdida')),
+                ('duracion', models.FloatField(null=True, verbose_name='Duración')),
+                ('convexidad', models.FloatField(null=True, verbose_name='Convexidad')),
+                ('duracion_modificada', models.FloatField(null=True, verbose_name='Duración modificada')),
+                ('total_ratios', models.FloatField(null=True, verbose_name='Total ratios')),
+                ('tcea_emisor', models.FloatField(null=True, verbose_name='TCEA Emisor (%)')),
+                ('tcea_emisor_escudo', models.FloatField(null=True, verbose_name='TCEA Emisor c/ Escudo (%)')),
+                ('trea_bonista', models.FloatField(null=True, verbose_name='TREA Bonista (%)')),
+                ('costes_emisor', models.FloatField(null=True, verbose_name='Costes Emisor')),
+                ('costes_bonista', models.FloatField(null=True, verbose_name='Costes Bonista')),
+                ('diagnostico_tir', models.JSONField(default=dict, verbose_name='Diagnóstico de TIR')),
+                ('flujos', models.JSONField(default=dict, verbose_name='Cronograma')),
+                ('fecha_calculo', models.DateTimeField(auto_now=True, verbose_name='Fecha de Cálculo')),
+            ],
+            options={
+                'verbose_name': 'Métricas de bono',
+                'verbose_name_plural': 'Métricas de bonos',
+            },
+        ),
+    ]
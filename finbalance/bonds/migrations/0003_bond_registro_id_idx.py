@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bonds', '0002_bondmetrics'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bond',
+            index=models.Index(fields=['fecha_registro', 'id'], name='bond_registro_id_idx'),
+        ),
+    ]
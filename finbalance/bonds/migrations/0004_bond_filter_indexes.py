@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bonds', '0003_bond_registro_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bond',
+            index=models.Index(fields=['fecha_emision', 'id'], name='bond_emision_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bond',
+            index=models.Index(fields=['valor_nominal', 'id'], name='bond_nominal_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bond',
+            index=models.Index(fields=['tasa_interes', 'id'], name='bond_tasa_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bond',
+            index=models.Index(fields=['num_anios', 'id'], name='bond_anios_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bond',
+            index=models.Index(fields=['frecuencia_cupon', 'num_anios'], name='bond_frecuencia_anios_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bond',
+            index=models.Index(fields=['tipo_gracia', 'tasa_interes'], name='bond_gracia_tasa_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bonds', '0004_bond_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFlow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.PositiveIntegerField(verbose_name='Periodo')),
+                ('fecha', models.DateField(verbose_name='Fecha de pago')),
+                ('cuota', models.FloatField(verbose_name='Cuota')),
+                ('interes', models.FloatField(verbose_name='Interés')),
+                ('amortizacion', models.FloatField(verbose_name='Amortización')),
+                ('saldo', models.FloatField(verbose_name='Saldo')),
+                ('prima', models.FloatField(verbose_name='Prima pagada')),
+                ('flujo_total', models.FloatField(verbose_name='Flujo total')),
+                ('bond', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flujos_caja', to='bonds.bond', verbose_name='Bono')),
+            ],
+            options={
+                'verbose_name': 'Flujo de caja',
+                'verbose_name_plural': 'Flujos de caja',
+                'indexes': [models.Index(fields=['fecha', 'bond'], name='flujo_fecha_bono_idx')],
+                'constraints': [models.UniqueConstraint(fields=('bond', 'periodo'), name='flujo_bono_periodo_unico')],
+            },
+        ),
+    ]
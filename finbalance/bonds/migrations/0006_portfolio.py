@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bonds', '0005_cashflow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Portfolio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True, verbose_name='Nombre')),
+                ('descripcion', models.TextField(blank=True, verbose_name='Descripción')),
+                ('fecha_creacion', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de creación')),
+            ],
+            options={
+                'verbose_name': 'Cartera',
+                'verbose_name_plural': 'Carteras',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PortfolioBond',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=6, default=Decimal('1'), max_digits=20, verbose_name='Cantidad')),
+                ('bond', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posiciones', to='bonds.bond', verbose_name='Bono')),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posiciones', to='bonds.portfolio', verbose_name='Cartera')),
+            ],
+            options={
+                'verbose_name': 'Posición',
+                'verbose_name_plural': 'Posiciones',
+            },
+        ),
+        migrations.AddField(
+            model_name='portfolio',
+            name='bonos',
+            field=models.ManyToManyField(related_name='carteras', through='bonds.PortfolioBond', to='bonds.bond', verbose_name='Bonos'),
+        ),
+        migrations.AddConstraint(
+            model_name='portfoliobond',
+            constraint=models.UniqueConstraint(fields=('portfolio', 'bond'), name='posicion_cartera_bono_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='portfoliobond',
+            constraint=models.CheckConstraint(condition=models.Q(('cantidad__gt', 0)), name='posicion_cantidad_positiva'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copiar_fecha_registro(apps, schema_editor):
+    # Sin historial de ediciones, las instantáneas existentes se dan por vigentes
+    # si se calcularon después del registro del bono
+    apps.get_model('bonds', 'Bond').objects.update(fecha_modificacion=F('fecha_registro'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bonds', '0006_portfolio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bond',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación'),
+        ),
+        migrations.RunPython(copiar_fecha_registro, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,14 @@
+import math
+
 from django.db import models
 from django.utils import timezone
 from decimal import Decimal
 
+from .engine import ENGINE_VERSION, fingerprint
+from .engine.cashflows import CashFlowSchedule
+from .engine.metrics import ESCALARES as METRICAS_ESCALARES
+from .engine.terms import BondTerms
+
 class Bond(models.Model):
     # Opciones para campos de selección
     FRECUENCIA_CUPON_CHOICES = [
@@ -68,11 +75,24 @@ class Bond(models.Model):
     # Campos del sistema
     metodo_amortizacion = models.CharField(max_length=50, default='Francés', verbose_name="Método de Amortización")
     fecha_registro = models.DateTimeField(default=timezone.now, verbose_name="Fecha de Registro")
+    # Comparada con BondMetrics.fecha_calculo para encontrar instantáneas desactualizadas en SQL
+    fecha_modificacion = models.DateTimeField(auto_now=True, verbose_name="Fecha de Modificación")
 
     class Meta:
         verbose_name = "Bono"
         verbose_name_plural = "Bonos"
         ordering = ['-fecha_registro']
+        indexes = [
+            # Paginación por cursor del listado: (campo de orden, id)
+            models.Index(fields=['fecha_registro', 'id'], name='bond_registro_id_idx'),
+            models.Index(fields=['fecha_emision', 'id'], name='bond_emision_id_idx'),
+            models.Index(fields=['valor_nominal', 'id'], name='bond_nominal_id_idx'),
+            models.Index(fields=['tasa_interes', 'id'], name='bond_tasa_id_idx'),
+            models.Index(fields=['num_anios', 'id'], name='bond_anios_id_idx'),
+            # Filtros que suelen combinarse
+            models.Index(fields=['frecuencia_cupon', 'num_anios'], name='bond_frecuencia_anios_idx'),
+            models.Index(fields=['tipo_gracia', 'tasa_interes'], name='bond_gracia_tasa_idx'),
+        ]
 
     def __str__(self):
         return f"Bono {self.id} - {self.valor_nominal} ({self.fecha_emision.year})"
@@ -96,6 +116,15 @@ class Bond(models.Model):
         
         return (total / Decimal('100')) * self.valor_nominal
 
+    @property
+    def fingerprint(self):
+        """Huella de los datos de entrada (cambia si cambia el bono o el motor)"""
+        return fingerprint(self)
+
+    def terms(self):
+        """Datos de entrada del bono como BondTerms (para usar el motor sin el ORM)"""
+        return BondTerms.from_bond(self)
+
     @property
     def costos_emisor(self):
         return self.costos_iniciales('emisor')
@@ -115,4 +144,151 @@ class Bond(models.Model):
             1: 360      # Anual
         }
         return dias.get(self.capitalizacion,"No aplica")
-    
\ No newline at end of file
+
+
+class BondMetrics(models.Model):
+    """
+    Instantánea de las métricas calculadas de un bono.
+
+    Es válida mientras `fingerprint` coincida con la huella actual del bono.
+    """
+    ESCALARES = METRICAS_ESCALARES
+
+    bond = models.OneToOneField(Bond, on_delete=models.CASCADE, primary_key=True, related_name='metricas', verbose_name="Bono")
+    fingerprint = models.CharField(max_length=64, db_index=True, verbose_name="Huella de entradas")
+    engine_version = models.PositiveIntegerField(verbose_name="Versión del motor")
+
+    periodos_por_anio = models.IntegerField(verbose_name="Nº Períodos por Año")
+    periodo_nombre = models.CharField(max_length=20, verbose_name="Nombre del período")
+    dias_capitalizacion = models.IntegerField(verbose_name="Días capitalización")
+    tea = models.FloatField(null=True, verbose_name="TEA (%)")
+    tep = models.FloatField(null=True, verbose_name="TEP (%)")
+    cok_periodo = models.FloatField(null=True, verbose_name="COK del período (%)")
+    precio_actual = models.FloatField(null=True, verbose_name="Precio Actual")
+    utilidad = models.FloatField(null=True, verbose_name="Utilidad / Pérdida")
+    duracion = models.FloatField(null=True, verbose_name="Duración")
+    convexidad = models.FloatField(null=True, verbose_name="Convexidad")
+    duracion_modificada = models.FloatField(null=True, verbose_name="Duración modificada")
+    total_ratios = models.FloatField(null=True, verbose_name="Total ratios")
+    tcea_emisor = models.FloatField(null=True, verbose_name="TCEA Emisor (%)")
+    tcea_emisor_escudo = models.FloatField(null=True, verbose_name="TCEA Emisor c/ Escudo (%)")
+    trea_bonista = models.FloatField(null=True, verbose_name="TREA Bonista (%)")
+    costes_emisor = models.FloatField(null=True, verbose_name="Costes Emisor")
+    costes_bonista = models.FloatField(null=True, verbose_name="Costes Bonista")
+    diagnostico_tir = models.JSONField(default=dict, verbose_name="Diagnóstico de TIR")
+    flujos = models.JSONField(default=dict, verbose_name="Cronograma")
+
+    fecha_calculo = models.DateTimeField(auto_now=True, verbose_name="Fecha de Cálculo")
+
+    class Meta:
+        verbose_name = "Métricas de bono"
+        verbose_name_plural = "Métricas de bonos"
+
+    def __str__(self):
+        return f"Métricas del bono {self.bond_id} (v{self.engine_version})"
+
+    @classmethod
+    def from_metrics(cls, bond, metricas, huella=None):
+        """Construye la instantánea a partir del resultado de calculate_bond_metrics"""
+        escalares = {
+            campo: None if math.isnan(metricas[campo]) else metricas[campo]
+            for campo in cls.ESCALARES
+        }
+        return cls(
+            bond=bond,
+            fingerprint=huella or bond.fingerprint,
+            engine_version=ENGINE_VERSION,
+            periodos_por_anio=metricas['periodos_por_anio'],
+            periodo_nombre=metricas['periodo_nombre'],
+            dias_capitalizacion=metricas['dias_capitalizacion'],
+            diagnostico_tir=metricas['diagnostico_tir'],
+            flujos=metricas['flujos'].to_dict(),
+            **escalares,
+        )
+
+    def to_metrics(self):
+        """Devuelve el mismo diccionario que calculate_bond_metrics"""
+        metricas = {
+            campo: math.nan if getattr(self, campo) is None else getattr(self, campo)
+            for campo in self.ESCALARES
+        }
+        metricas.update({
+            'periodos_por_anio': self.periodos_por_anio,
+            'periodo_nombre': self.periodo_nombre,
+            'dias_capitalizacion': self.dias_capitalizacion,
+            'diagnostico_tir': self.diagnostico_tir,
+            'flujos': CashFlowSchedule.from_dict(self.flujos),
+        })
+        return metricas
+
+
+class CashFlow(models.Model):
+    """
+    Un periodo del cronograma de un bono con su fecha de pago.
+
+    Las filas se regeneran en bloque (ver ledger.sync_cash_flows) cuando se crea
+    el bono o cambian los datos que afectan al cronograma o a sus fechas; sirven
+    para agregar flujos de muchos bonos en SQL sin recalcularlos.
+    """
+    bond = models.ForeignKey(Bond, on_delete=models.CASCADE, related_name='flujos_caja', verbose_name="Bono")
+    periodo = models.PositiveIntegerField(verbose_name="Periodo")
+    fecha = models.DateField(verbose_name="Fecha de pago")
+    cuota = models.FloatField(verbose_name="Cuota")
+    interes = models.FloatField(verbose_name="Interés")
+    amortizacion = models.FloatField(verbose_name="Amortización")
+    saldo = models.FloatField(verbose_name="Saldo")
+    prima = models.FloatField(verbose_name="Prima pagada")  # prima_calculo del cronograma
+    flujo_total = models.FloatField(verbose_name="Flujo total")
+
+    class Meta:
+        verbose_name = "Flujo de caja"
+        verbose_name_plural = "Flujos de caja"
+        constraints = [
+            models.UniqueConstraint(fields=['bond', 'periodo'], name='flujo_bono_periodo_unico'),
+        ]
+        indexes = [
+            # Escaleras y próximos pagos: rangos de fechas de todos los bonos o de algunos
+            models.Index(fields=['fecha', 'bond'], name='flujo_fecha_bono_idx'),
+        ]
+
+    def __str__(self):
+        return f"Bono {self.bond_id}, periodo {self.periodo} ({self.fecha})"
+
+
+class Portfolio(models.Model):
+    """
+    Cartera: un grupo de bonos, cada uno con la cantidad que se tiene de él.
+    """
+    nombre = models.CharField(max_length=100, unique=True, verbose_name="Nombre")
+    descripcion = models.TextField(blank=True, verbose_name="Descripción")
+    bonos = models.ManyToManyField(Bond, through='PortfolioBond', related_name='carteras', verbose_name="Bonos")
+    fecha_creacion = models.DateTimeField(default=timezone.now, verbose_name="Fecha de creación")
+
+    class Meta:
+        verbose_name = "Cartera"
+        verbose_name_plural = "Carteras"
+        ordering = ['nombre']
+
+    def __str__(self):
+        return self.nombre
+
+
+class PortfolioBond(models.Model):
+    """
+    Posición de una cartera: el bono y cuántas unidades tiene (admite fracciones,
+    así que también sirve como peso)
+    """
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='posiciones', verbose_name="Cartera")
+    bond = models.ForeignKey(Bond, on_delete=models.CASCADE, related_name='posiciones', verbose_name="Bono")
+    cantidad = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('1'), verbose_name="Cantidad")
+
+    class Meta:
+        verbose_name = "Posición"
+        verbose_name_plural = "Posiciones"
+        constraints = [
+            models.UniqueConstraint(fields=['portfolio', 'bond'], name='posicion_cartera_bono_unica'),
+            models.CheckConstraint(condition=models.Q(cantidad__gt=0), name='posicion_cantidad_positiva'),
+        ]
+
+    def __str__(self):
+        return f"{self.portfolio}: bono {self.bond_id} x {self.cantidad}"
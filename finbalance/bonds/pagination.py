@@ -0,0 +1,118 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+En lugar de OFFSET, cada página continúa desde el último registro de la anterior
+usando el par (campo de orden, id), que debe estar cubierto por un índice. El
+costo de cada página es el mismo sin importar cuántas filas haya en la tabla.
+"""
+import base64
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(valor, pk):
+    texto = f'{valor.isoformat() if hasattr(valor, "isoformat") else valor}|{pk}'
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, campo):
+    """
+    Devuelve (valor, pk) del cursor, con el valor convertido al tipo de `campo`
+    """
+    relleno = '=' * (-len(cursor) % 4)
+    texto = base64.urlsafe_b64decode((cursor + relleno).encode('ascii')).decode('utf-8')
+    valor, pk = texto.rsplit('|', 1)
+    return campo.to_python(valor), int(pk)
+
+
+class KeysetPage:
+    """
+    Página de resultados con los cursores para moverse a la anterior y siguiente
+    """
+
+    def __init__(self, items, has_next, has_previous, orden):
+        self.items = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self._orden = orden
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _cursor(self, item):
+        return encode_cursor(getattr(item, self._orden), item.pk)
+
+    @property
+    def next_cursor(self):
+        return self._cursor(self.items[-1]) if self.has_next and self.items else None
+
+    @property
+    def previous_cursor(self):
+        return self._cursor(self.items[0]) if self.has_previous and self.items else None
+
+
+class KeysetPaginator:
+    """
+    Pagina `queryset` ordenado por (`orden`, id), ascendente o descendente
+    """
+
+    def __init__(self, queryset, orden, descendente=True, por_pagina=25):
+        self.queryset = queryset
+        self.orden = orden
+        self.descendente = descendente
+        self.por_pagina = por_pagina
+        self.campo = queryset.model._meta.get_field(orden)
+
+    def _despues_de(self, valor, pk, descendente):
+        """Filas que van después de (valor, pk) en el orden indicado"""
+        if descendente:
+            return Q(**{f'{self.orden}__lte': valor}) & (Q(**{f'{self.orden}__lt': valor}) | Q(pk__lt=pk))
+        return Q(**{f'{self.orden}__gte': valor}) & (Q(**{f'{self.orden}__gt': valor}) | Q(pk__gt=pk))
+
+    def _ordenado(self, descendente):
+        signo = '-' if descendente else ''
+        return self.queryset.order_by(f'{signo}{self.orden}', f'{signo}pk')
+
+    def _consulta(self, despues, antes):
+        """
+        Consulta de la página pedida (con una fila de más, para saber si hay otra)
+        y su tipo: 'despues', 'antes' o None para la primera página.
+
+        Un cursor inválido se trata como si no hubiera cursor.
+        """
+        try:
+            if despues:
+                valor, pk = decode_cursor(despues, self.campo)
+                consulta = self._ordenado(self.descendente).filter(self._despues_de(valor, pk, self.descendente))
+                return consulta[:self.por_pagina + 1], 'despues'
+            if antes:
+                valor, pk = decode_cursor(antes, self.campo)
+                consulta = self._ordenado(not self.descendente).filter(self._despues_de(valor, pk, not self.descendente))
+                return consulta[:self.por_pagina + 1], 'antes'
+        except (ValueError, ValidationError, UnicodeDecodeError):
+            pass
+        return self._ordenado(self.descendente)[:self.por_pagina + 1], None
+
+    def _pagina(self, filas, tipo):
+        if tipo == 'antes':
+            hay_anterior = len(filas) > self.por_pagina
+            return KeysetPage(filas[:self.por_pagina][::-1], True, hay_anterior, self.orden)
+        return KeysetPage(filas[:self.por_pagina], len(filas) > self.por_pagina, tipo == 'despues', self.orden)
+
+    def page(self, despues=None, antes=None):
+        """
+        Página que sigue al cursor `despues`, o la que precede al cursor `antes`.
+
+        Sin cursores (o con un cursor inválido) devuelve la primera página.
+        """
+        consulta, tipo = self._consulta(despues, antes)
+        return self._pagina(list(consulta), tipo)
+
+    async def apage(self, despues=None, antes=None):
+        """Versión asíncrona de page()"""
+        consulta, tipo = self._consulta(despues, antes)
+        return self._pagina([fila async for fila in consulta], tipo)
@@ -0,0 +1,96 @@
+"""
+Métricas de carteras (Portfolio) a partir de las de sus bonos.
+
+Las métricas de cada bono se reutilizan desde su instantánea (BondMetrics). Los
+bonos sin instantánea vigente se encuentran con una consulta (snapshots.stale_q)
+y, si son pocos (hasta un lote), se calculan antes en el ejecutor de cálculo
+acotado; si son más, quedan fuera de los totales hasta que los calcule
+`manage.py revalue_bonds --stale-only`. Después basta una consulta con las
+métricas escalares de todas las posiciones, y la escalera de flujos de la
+cartera es una consulta agregada sobre CashFlow (ver ledger), así que el costo
+no depende del largo de los cronogramas.
+"""
+import math
+
+from asgiref.sync import sync_to_async
+from django.db.models import BooleanField, Case, Value, When
+
+from .batch import TAMANO_LOTE, save_results
+from .compute import get_executor
+from .engine import INPUT_FIELDS
+from .engine.batch import value_records
+from .engine.portfolio import aggregate
+from .models import Bond, PortfolioBond
+from .snapshots import stale_q
+
+# Métricas de cada bono que usa la cartera
+METRICAS_POSICION = ('precio_actual', 'duracion', 'duracion_modificada', 'convexidad')
+
+# Bonos sin métricas vigentes que se calculan al abrir la cartera (una tarea del ejecutor)
+MAX_CALCULO_EN_PETICION = TAMANO_LOTE
+
+
+def stale_members(portfolio):
+    """
+    Ids de los bonos de la cartera sin instantánea de métricas vigente
+    """
+    return list(
+        Bond.objects.filter(stale_q(), posiciones__portfolio=portfolio)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+
+
+async def arefresh_members(portfolio, limite=MAX_CALCULO_EN_PETICION):
+    """
+    Calcula en el ejecutor acotado las métricas que falten de los bonos de la
+    cartera, si no son más de `limite`. Devuelve los errores [(id, mensaje)];
+    lanza ComputeBusy si el ejecutor está lleno
+    """
+    registros = await sync_to_async(list)(
+        Bond.objects.filter(stale_q(), posiciones__portfolio=portfolio)
+        .order_by('pk').values('id', *INPUT_FIELDS)[:limite + 1]
+    )
+    if not registros or len(registros) > limite:
+        return []
+    resultados, errores = await get_executor().run(value_records, registros)
+    await sync_to_async(save_results)(resultados)
+    return errores
+
+
+def portfolio_positions(portfolio):
+    """
+    Posiciones de la cartera con las métricas de su bono, en orden de id del bono.
+    Las de bonos sin instantánea vigente llevan 'vigente' False y métricas NaN
+    """
+    campos = {metrica: f'bond__metricas__{metrica}' for metrica in METRICAS_POSICION}
+    posiciones = list(
+        PortfolioBond.objects.filter(portfolio=portfolio).order_by('bond_id')
+        .annotate(vigente=Case(When(stale_q('bond__'), then=Value(False)), default=Value(True), output_field=BooleanField()))
+        .values('bond_id', 'cantidad', 'vigente', *campos.values())
+    )
+    for posicion in posiciones:
+        for metrica, campo in campos.items():
+            valor = posicion.pop(campo)
+            posicion[metrica] = math.nan if valor is None or not posicion['vigente'] else valor
+    return posiciones
+
+
+def portfolio_metrics(portfolio):
+    """
+    Valor presente, duración de Macaulay y modificada y convexidad de la cartera,
+    con sus posiciones ('posiciones', cada una con su 'peso' y su 'valor') y el
+    número de bonos sin métricas vigentes ('desactualizados'), que no suman
+    """
+    posiciones = portfolio_positions(portfolio)
+    metricas = aggregate(
+        [float(posicion['cantidad']) for posicion in posiciones],
+        *([posicion[metrica] for posicion in posiciones] for metrica in METRICAS_POSICION),
+    )
+    for posicion, peso in zip(posiciones, metricas.pop('pesos').tolist()):
+        posicion['peso'] = peso
+        posicion['valor'] = peso * metricas['valor_presente']
+    metricas['posiciones'] = posiciones
+    metricas['desactualizados'] = sum(not posicion['vigente'] for posicion in posiciones)
+    # 'excluidos' queda sólo para los bonos cuyo precio no se pudo calcular
+    metricas['excluidos'] -= metricas['desactualizados']
+    return metricas
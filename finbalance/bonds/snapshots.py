@@ -0,0 +1,94 @@
+"""
+Instantáneas persistentes de las métricas de cada bono.
+
+Las métricas se calculan la primera vez que se consultan y se reutilizan mientras
+la huella del bono (datos de entrada + versión del motor) no cambie.
+"""
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.db.models import F, Q
+
+from .engine import ENGINE_VERSION
+from .engine.streaming import bounded_bond_metrics
+from .models import BondMetrics
+
+
+def stale_q(prefijo=''):
+    """
+    Condición de los bonos sin instantánea vigente: sin instantánea, de otra
+    versión del motor o calculada antes de la última modificación del bono.
+    Se resuelve en SQL, sin recalcular huellas; `prefijo` ('bond__') permite
+    usarla desde un modelo relacionado
+    """
+    return (
+        Q(**{f'{prefijo}metricas__isnull': True})
+        | ~Q(**{f'{prefijo}metricas__engine_version': ENGINE_VERSION})
+        | Q(**{f'{prefijo}metricas__fecha_calculo__lt': F(f'{prefijo}fecha_modificacion')})
+    )
+
+
+def get_bond_metrics(bond, calcular=bounded_bond_metrics):
+    """
+    Devuelve las métricas del bono desde su instantánea o las calcula con
+    `calcular(bond)` y la guarda
+    """
+    huella = bond.fingerprint
+    try:
+        snapshot = bond.metricas
+    except BondMetrics.DoesNotExist:
+        snapshot = None
+
+    if snapshot is not None and snapshot.fingerprint == huella:
+        return snapshot.to_metrics()
+
+    metricas = calcular(bond)
+    save_snapshot(bond, metricas, huella)
+    return metricas
+
+
+async def aget_bond_metrics(bond, calcular):
+    """
+    Versión asíncrona de get_bond_metrics; `calcular(bond)` es una corrutina
+    (p. ej. el cálculo en el ejecutor de procesos)
+    """
+    huella = bond.fingerprint
+    snapshot = await BondMetrics.objects.filter(bond_id=bond.pk).afirst()
+    if snapshot is not None and snapshot.fingerprint == huella:
+        return snapshot.to_metrics()
+
+    metricas = await calcular(bond)
+    await sync_to_async(save_snapshot)(bond, metricas, huella)
+    return metricas
+
+
+def save_snapshot(bond, metricas, huella=None):
+    """
+    Guarda (o reemplaza) la instantánea de métricas del bono
+    """
+    snapshot = BondMetrics.from_metrics(bond, metricas, huella)
+    try:
+        snapshot.save()
+    except IntegrityError:
+        # Otra petición guardó la misma instantánea al mismo tiempo
+        pass
+    return snapshot
+
+
+# Campos que se reemplazan cuando la instantánea del bono ya existe
+CAMPOS_ACTUALIZABLES = [
+    field.name for field in BondMetrics._meta.concrete_fields if not field.primary_key
+]
+
+
+def save_snapshots(instantaneas, batch_size=500):
+    """
+    Guarda en bloque instantáneas (BondMetrics sin guardar) de varios bonos.
+
+    Usa un único INSERT ... ON CONFLICT por lote en lugar de un save() por bono.
+    """
+    instantaneas = list(instantaneas)
+    BondMetrics.objects.bulk_create(
+        instantaneas, batch_size=batch_size,
+        update_conflicts=True, unique_fields=['bond'], update_fields=CAMPOS_ACTUALIZABLES,
+    )
+    return len(instantaneas)
@@ -1,3 +1,1088 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import csv
+import io
+import math
+import os
+import pickle
+import tempfile
+import time
+import zipfile
+from unittest import mock
+from datetime import date
+from decimal import Decimal, localcontext
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+
+from .batch import revalue_bonds
+from .benchmarks import case_terms
+from .cache_backends import STATS, CacheStats, InstrumentedLocMemCache
+from .cache import cached_bond_metrics
+from .compute import BoundedExecutor, ComputeBusy, get_executor
+from .engine import ENGINE_VERSION, instrumentation
+from .engine.__main__ import main as cli_main
+from .engine.batch import value_records
+from .engine.cashflows import CashFlowSchedule, build_schedule, iter_schedule
+from .engine.dates import payment_dates
+from .engine.metrics import ESCALARES, bond_schedule, calculate_bond_metrics
+from .engine.montecarlo import simulate
+from .engine.planner import MemoryStore, calculate_incremental, plan
+from .engine.sensitivity import rate_shocks
+from .engine.solver import npv, solve_irr
+from .engine.streaming import VENTANA, stream_bond_metrics
+from .engine.terms import BondTerms
+from .engine.valuation import decimal_discount_table, duration_convexity_exact
+from .exports import ENCABEZADOS
+from .importer import ImportResult, _insert, build_bond, import_bonds, read_rows
+from .ledger import cash_flow_ladder, cash_flow_totals, sync_cash_flows
+from .models import Bond, BondMetrics, Portfolio, PortfolioBond
+from .portfolios import arefresh_members, portfolio_metrics, stale_members
+from .snapshots import get_bond_metrics
+
+
+class BondListQueryPlanTests(TestCase):
+    """
+    El listado filtrado y ordenado debe resolverse con los índices de Bond,
+    sin recorrer la tabla completa ni ordenar en una tabla temporal.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('analista', password='clave')
+        Bond.objects.bulk_create([
+            Bond(
+                valor_nominal=Decimal(1000 + i * 10), valor_comercial=Decimal(1000 + i * 10),
+                num_anios=1 + i % 30, frecuencia_cupon=[12, 4, 2, 1][i % 4], dias_por_anio=360,
+                tipo_tasa_interes='efectiva', tasa_interes=Decimal('5') + i % 10,
+                tasa_anual_descuento=Decimal('4.5'), impuesto_renta=Decimal('30'),
+                fecha_emision=date(2020, 1 + i % 12, 1),
+                tipo_gracia=[None, 'total', 'parcial'][i % 3], periodos_gracia=i % 3,
+            )
+            for i in range(60)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def query_plan(self, **params):
+        """
+        Plan de SQLite de la consulta de página que ejecuta bond_list con `params`
+        """
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('bonds:list'), params)
+        self.assertEqual(respuesta.status_code, 200)
+        sql = next(q['sql'] for q in consultas if 'FROM "bonds_bond"' in q['sql'] and 'ORDER BY' in q['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return ' | '.join(fila[-1] for fila in cursor.fetchall())
+
+    def assertUsesIndex(self, plan, indice):
+        self.assertIn(indice, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotRegex(plan, r'SCAN bonds_bond(?! USING)')
+
+    def test_default_order_uses_registro_index(self):
+        self.assertUsesIndex(self.query_plan(), 'bond_registro_id_idx')
+
+    def test_sortable_columns_use_their_index(self):
+        casos = {
+            'tasa_interes': 'bond_tasa_id_idx',
+            'valor_nominal': 'bond_nominal_id_idx',
+            'fecha_emision': 'bond_emision_id_idx',
+            'num_anios': 'bond_anios_id_idx',
+        }
+        for campo, indice in casos.items():
+            for orden in (campo, f'-{campo}'):
+                with self.subTest(orden=orden):
+                    self.assertUsesIndex(self.query_plan(orden=orden), indice)
+
+    def test_range_filters_on_sort_field_use_index(self):
+        plan = self.query_plan(tasa_min='6', tasa_max='9', orden='tasa_interes')
+        self.assertUsesIndex(plan, 'bond_tasa_id_idx')
+        plan = self.query_plan(emision_desde='2020-03-01', emision_hasta='2020-06-30', orden='-fecha_emision')
+        self.assertUsesIndex(plan, 'bond_emision_id_idx')
+
+    def test_next_page_cursor_uses_index(self):
+        respuesta = self.client.get(reverse('bonds:list'), {'orden': '-valor_nominal'})
+        cursor = respuesta.context['pagina'].next_cursor
+        self.assertIsNotNone(cursor)
+        plan = self.query_plan(orden='-valor_nominal', despues=cursor)
+        self.assertUsesIndex(plan, 'bond_nominal_id_idx')
+
+    def test_filters_reduce_results(self):
+        respuesta = self.client.get(reverse('bonds:list'), {'frecuencia_cupon': '4', 'tipo_gracia': 'sin'})
+        bonos = list(respuesta.context['pagina'])
+        self.assertTrue(bonos)
+        self.assertTrue(all(b.frecuencia_cupon == 4 and b.tipo_gracia is None for b in bonos))
+        self.assertIsNone(respuesta.context['total_estimado'])
+
+
+class ImportTests(TestCase):
+    """
+    Importación masiva: conversión rápida, errores por fila y reintento fila por fila.
+    """
+    ENCABEZADO = ('valor_nominal,valor_comercial,num_anios,frecuencia_cupon,dias_por_anio,tipo_tasa_interes,'
+                  'tasa_interes,tasa_anual_descuento,impuesto_renta,fecha_emision,tipo_gracia,periodos_gracia\n')
+
+    def test_fast_parser_builds_typed_bond(self):
+        filas = read_rows(io.StringIO(self.ENCABEZADO + '1000,1050.5, 5 ,2,360,efectiva,8.25,6,30,2025-01-01,parcial,2\n'), 'csv')
+        resultado = import_bonds(filas)
+        self.assertEqual((resultado.filas, resultado.total_creados, resultado.errores), (1, 1, []))
+        bond = resultado.bonds().get()
+        self.assertEqual((bond.valor_comercial, bond.num_anios, bond.tasa_interes), (Decimal('1050.5'), 5, Decimal('8.25')))
+        self.assertEqual(bond.fecha_emision, date(2025, 1, 1))
+        self.assertTrue(bond.tiene_plazo_gracia)
+        self.assertEqual(bond.flujos_caja.count(), 10)
+
+    def test_invalid_rows_are_reported_by_line(self):
+        contenido = (self.ENCABEZADO
+                     + '1000,1050,5,2,360,efectiva,8,6,30,2025-01-01,,\n'
+                     + ',1050,5,2,360,efectiva,abc,6,30,2025-01-01,,\n'
+                     + '1000,1050,5,7,360,efectiva,8,6,30,2025-01-01,,\n')
+        resultado = import_bonds(read_rows(io.StringIO(contenido), 'csv'))
+        self.assertEqual(resultado.total_creados, 1)
+        self.assertEqual([error.linea for error in resultado.errores], [3, 4])
+        self.assertEqual(set(resultado.errores[0].errores), {'valor_nominal', 'tasa_interes'})
+        self.assertEqual(set(resultado.errores[1].errores), {'frecuencia_cupon'})
+        self.assertTrue(str(resultado.errores[0]).startswith('Línea 3: '))
+
+    def test_database_error_falls_back_to_row_by_row(self):
+        fila = dict(valor_nominal='1000', valor_comercial='1050', num_anios='2', frecuencia_cupon='1', dias_por_anio='360',
+                    tipo_tasa_interes='efectiva', tasa_interes='8', tasa_anual_descuento='6', impuesto_renta='30',
+                    fecha_emision='2025-01-01')
+        buenos = [build_bond(fila), build_bond(fila)]
+        malo = build_bond(fila)
+        malo.valor_nominal = None  # NOT NULL: la base rechaza el lote completo
+        resultado = ImportResult(timezone.now())
+        _insert([(2, buenos[0]), (3, malo), (4, buenos[1])], resultado)
+        self.assertEqual(len(resultado.creados), 2)
+        self.assertEqual([error.linea for error in resultado.errores], [3])
+        self.assertEqual(set(resultado.bonds()), set(buenos))
+
+
+class BondApiTests(TestCase):
+    """
+    La API devuelve 304 con la ETag vigente sin calcular ni leer métricas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sistema', password='clave')
+        cls.bond = Bond.objects.create(
+            valor_nominal=Decimal('1000'), valor_comercial=Decimal('1050'), num_anios=5,
+            frecuencia_cupon=2, dias_por_anio=360, tipo_tasa_interes='efectiva',
+            tasa_interes=Decimal('8'), tasa_anual_descuento=Decimal('6'), impuesto_renta=Decimal('30'),
+            fecha_emision=date(2025, 1, 1),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('bonds:api', args=[self.bond.id])
+
+    def test_fields_and_schedule(self):
+        datos = self.client.get(self.url, {'fields': 'tcea_emisor,duracion'}).json()
+        self.assertEqual(set(datos), {'id', 'huella', 'tcea_emisor', 'duracion'})
+        datos = self.client.get(self.url, {'fields': 'tea', 'schedule': '1'}).json()
+        self.assertEqual(len(datos['flujos']['periodo']), 10)
+        self.assertEqual(self.client.get(self.url, {'fields': 'otro'}).status_code, 400)
+
+    def test_if_none_match_returns_304_without_metrics(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertFalse(any('bonds_bondmetrics' in q['sql'] for q in consultas))
+        # Otra selección de campos es otra representación
+        self.assertNotEqual(self.client.get(self.url, {'schedule': '1'})['ETag'], etag)
+
+    def test_batch_reports_missing_ids(self):
+        datos = self.client.get(reverse('bonds:api_batch'), {'ids': f'{self.bond.id},999999'}).json()
+        self.assertEqual([bono['id'] for bono in datos['bonos']], [self.bond.id])
+        self.assertEqual(datos['no_encontrados'], [999999])
+
+
+class CacheBackendTests(SimpleTestCase):
+    """
+    La caché local expulsa por LRU y lleva la cuenta exacta de sus bytes.
+    """
+
+    def crear(self, nombre, **opciones):
+        local = InstrumentedLocMemCache(f'pruebas-{nombre}', {'OPTIONS': opciones})
+        local.clear()
+        self.addCleanup(local.clear)
+        return local
+
+    def assertBytes(self, local):
+        self.assertEqual(local.total_bytes, sum(tamano for _, tamano in local.entries()))
+
+    def test_lru_order(self):
+        local = self.crear('lru', MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        for clave in 'abc':
+            local.set(clave, clave)
+        local.get('a')
+        local.set('d', 'd')
+        self.assertEqual([clave.split(':')[-1] for clave, _ in local.entries()], ['d', 'a', 'c'])
+        self.assertIsNone(local.get('b'))
+
+    def test_bytes_after_overwrite_cull_and_delete(self):
+        local = self.crear('bytes', MAX_ENTRIES=2, CULL_FREQUENCY=2, MAX_BYTES=1000)
+        local.set('a', 'x' * 100)
+        local.set('b', 'x' * 100)
+        # Con la caché llena, reescribir la entrada menos reciente no la descuenta dos veces
+        local.set('a', 'x' * 300)
+        self.assertBytes(local)
+        local.set('c', 'x' * 50)
+        self.assertBytes(local)
+        local.set('d', 'x' * 950)
+        self.assertEqual([clave.split(':')[-1] for clave, _ in local.entries()], ['d'])
+        self.assertBytes(local)
+        local.delete('d')
+        self.assertEqual(local.total_bytes, 0)
+
+    def test_bytes_after_incr(self):
+        local = self.crear('incr', MAX_BYTES=1000)
+        local.set('conteo', 1)
+        # Cada incremento cambia el tamaño del valor serializado
+        for delta in (10 ** 6, 2 ** 70, -(2 ** 70)):
+            local.incr('conteo', delta)
+            self.assertBytes(local)
+        local.decr('conteo', 10 ** 6)
+        self.assertEqual(local.get('conteo'), 1)
+        self.assertBytes(local)
+        local.delete('conteo')
+        self.assertEqual(local.total_bytes, 0)
+
+    def test_stats(self):
+        estadisticas = CacheStats()
+        estadisticas.hit('metricas')
+        estadisticas.hit('metricas')
+        estadisticas.miss('metricas')
+        estadisticas.miss('grafico')
+        estadisticas.evicted(3)
+        self.assertEqual(estadisticas.summary(), [
+            {'namespace': 'grafico', 'hits': 0, 'misses': 1, 'hit_rate': 0.0},
+            {'namespace': 'metricas', 'hits': 2, 'misses': 1, 'hit_rate': 2 / 3 * 100},
+        ])
+        self.assertEqual(estadisticas.evictions, 3)
+        estadisticas.reset()
+        self.assertEqual((estadisticas.summary(), estadisticas.evictions), ([], 0))
+
+
+class EngineCliTests(SimpleTestCase):
+    """
+    Los datos faltantes o inválidos se reportan por campo y no detienen el lote.
+    """
+
+    def registro(self, id, **cambios):
+        datos = {campo: '' if valor is None else str(valor) for campo, valor in case_terms(5, 2, None, 'sin_costes').to_dict().items()}
+        return {**datos, 'id': id, **cambios}
+
+    def test_from_mapping_names_the_field(self):
+        with self.assertRaisesMessage(ValueError, 'Faltan datos del bono: fecha_emision'):
+            BondTerms.from_mapping(self.registro(1, fecha_emision=' '))
+        with self.assertRaisesMessage(ValueError, "Valor inválido para tasa_interes: 'ocho'"):
+            BondTerms.from_mapping(self.registro(1, tasa_interes='ocho'))
+        self.assertEqual(BondTerms.from_mapping(self.registro(1)).tasa_interes, Decimal('8'))
+
+    def test_value_records_reports_invalid_records(self):
+        resultados, errores = value_records([self.registro(1), self.registro(2, num_anios='cinco')])
+        self.assertEqual([id for id, _, _ in resultados], [1])
+        self.assertEqual(errores, [(2, "Valor inválido para num_anios: 'cinco'")])
+        # Con la huella guardada vigente el bono se omite
+        huella = resultados[0][1]
+        self.assertEqual(value_records([self.registro(1, huella_guardada=huella)]), ([], []))
+
+    def test_cli_reports_bad_rows_and_values_the_rest(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            entrada, salida = os.path.join(directorio, 'bonos.csv'), os.path.join(directorio, 'salida.csv')
+            filas = [self.registro(7), self.registro('', tasa_interes='ocho')]
+            with open(entrada, 'w', newline='', encoding='utf-8') as archivo:
+                writer = csv.DictWriter(archivo, fieldnames=list(filas[0]))
+                writer.writeheader()
+                writer.writerows(filas)
+            errores = io.StringIO()
+            with contextlib.redirect_stderr(errores):
+                codigo = cli_main([entrada, '--output-format', 'csv', '-o', salida])
+            with open(salida, newline='', encoding='utf-8') as archivo:
+                resultados = list(csv.DictReader(archivo))
+        self.assertEqual(codigo, 1)
+        self.assertEqual(errores.getvalue(), "Bono 2: Valor inválido para tasa_interes: 'ocho'\n")
+        self.assertEqual([fila['id'] for fila in resultados], ['7'])
+        esperado = calculate_bond_metrics(BondTerms.from_mapping(self.registro(7)))['precio_actual']
+        self.assertAlmostEqual(float(resultados[0]['precio_actual']), esperado, places=6)
+
+
+class SolverTests(SimpleTestCase):
+    """
+    TIR por Newton, respaldo de Brent y flujos sin raíz real.
+    """
+
+    def test_newton_from_close_guess(self):
+        tir = solve_irr([-100, 10, 110], guess=0.05)
+        self.assertEqual((tir.method, tir.converged), ('newton', True))
+        self.assertAlmostEqual(tir.rate, 0.1, places=12)
+
+    def test_brent_when_newton_fails(self):
+        tir = solve_irr([-100, 10, 110], guess=50)
+        self.assertEqual((tir.method, tir.converged), ('brent', True))
+        self.assertAlmostEqual(tir.rate, 0.1, places=10)
+        self.assertAlmostEqual(npv([-100, 10, 110], tir.rate), 0, places=8)
+
+    def test_no_real_root(self):
+        for guess in (0.1, -0.99):
+            tir = solve_irr([-100, 300, -230], guess=guess)
+            self.assertFalse(tir.converged)
+            self.assertTrue(math.isnan(tir.rate))
+        self.assertEqual(solve_irr([100, 10]).method, 'sin_raiz')
+
+
+class ExactModeTests(SimpleTestCase):
+    """
+    El modo exacto (Decimal) coincide con el cálculo en float dentro de la tolerancia.
+    """
+
+    def test_exact_matches_float_path(self):
+        for caso in [(10, 12, None, 'ambos'), (5, 2, 'total', 'sin_costes'), (30, 1, 'parcial', 'emisor')]:
+            with self.subTest(caso=caso):
+                terms = case_terms(*caso)
+                rapido = calculate_bond_metrics(terms)
+                exacto = calculate_bond_metrics(terms, exact=True)
+                for clave in ('duracion', 'convexidad', 'duracion_modificada', 'total_ratios'):
+                    self.assertAlmostEqual(exacto[clave], rapido[clave], delta=abs(rapido[clave]) * 1e-9)
+                self.assertEqual(exacto['precio_actual'], rapido['precio_actual'])
+
+    def test_exact_values_come_from_decimal(self):
+        terms = case_terms(10, 12, None, 'ambos')
+        metricas = calculate_bond_metrics(terms, exact=True)
+        flujos = metricas['flujos']
+        cok = (1 + float(terms.tasa_anual_descuento) / 100) ** (1 / terms.frecuencia_cupon) - 1
+        factores = decimal_discount_table(str(cok), len(flujos))
+        self.assertIsInstance(factores[0], Decimal)
+        self.assertIs(decimal_discount_table(str(cok), len(flujos)), factores)
+        self.assertEqual(factores[-1], Decimal(1) / (1 + Decimal(str(cok))) ** len(flujos))
+        # Referencia en Decimal, calculada aparte
+        montos = [Decimal(str(cuota)) + Decimal(str(prima)) for cuota, prima in zip(flujos.cuota.tolist(), flujos.prima_calculo.tolist())]
+        valores = [monto * factor for monto, factor in zip(montos, factores)]
+        duracion = sum(valor * t for t, valor in enumerate(valores, start=1)) / sum(valores) / terms.frecuencia_cupon
+        self.assertEqual(metricas['duracion'], float(duracion))
+        self.assertEqual(
+            duration_convexity_exact(flujos.cuota.tolist(), flujos.prima_calculo.tolist(), cok, terms.frecuencia_cupon)[0],
+            metricas['duracion'],
+        )
+
+
+class RateShockTests(SimpleTestCase):
+    """
+    La valorización vectorizada coincide con recalcular cada escenario.
+    """
+
+    def test_matches_full_repricing(self):
+        sensibilidad = rate_shocks(case_terms(10, 12, 'parcial', 'ambos'), shocks_pb=(-200, 0, 150))
+        for indice, shock in enumerate((-200, 0, 150)):
+            terms = case_terms(10, 12, 'parcial', 'ambos')
+            terms.tasa_anual_descuento += Decimal(shock) / 100
+            metricas = calculate_bond_metrics(terms)
+            for campo, clave in (('precio', 'precio_actual'), ('utilidad', 'utilidad'),
+                                 ('duracion_modificada', 'duracion_modificada'), ('convexidad', 'convexidad')):
+                self.assertAlmostEqual(sensibilidad[campo][indice], metricas[clave], places=8)
+        # La aproximación es exacta en el escenario base y pierde precisión al alejarse
+        errores = abs(sensibilidad['error_aproximacion'])
+        self.assertAlmostEqual(errores[1], 0, places=8)
+        self.assertGreater(errores[0], errores[2] * 0.5)
+
+    def test_interest_rate_shocks_rebuild_schedule(self):
+        sensibilidad = rate_shocks(case_terms(5, 2, None, 'sin_costes'), shocks_pb=(0,), shocks_interes_pb=(100,))
+        terms = case_terms(5, 2, None, 'sin_costes')
+        terms.tasa_interes += 1
+        self.assertAlmostEqual(sensibilidad['precios_interes'][0][0], calculate_bond_metrics(terms)['precio_actual'], places=8)
+
+
+class MonteCarloTests(SimpleTestCase):
+    """
+    Sin volatilidad la simulación reproduce el precio con tasa fija; con
+    volatilidad, la misma semilla da siempre la misma distribución.
+    """
+
+    def test_zero_volatility_matches_flat_price(self):
+        terms = case_terms(10, 4, None, 'ambos')
+        resultado = simulate(terms, trayectorias=200, volatilidad=0)
+        self.assertAlmostEqual(resultado['media'], calculate_bond_metrics(terms)['precio_actual'], places=6)
+        self.assertAlmostEqual(resultado['desviacion'], 0, places=6)
+
+    def test_seeded_paths_are_reproducible(self):
+        terms = case_terms(10, 12, None, 'sin_costes')
+        primera = simulate(terms, trayectorias=2000, volatilidad=2, semilla=7)
+        self.assertEqual(primera, simulate(terms, trayectorias=2000, volatilidad=2, semilla=7))
+        self.assertNotEqual(primera['media'], simulate(terms, trayectorias=2000, volatilidad=2, semilla=8)['media'])
+        self.assertGreater(primera['var'][99], primera['var'][95])
+        self.assertEqual(sum(primera['histograma']['conteos']), 2000)
+
+
+class BuildScheduleTests(SimpleTestCase):
+    """
+    build_schedule reproduce las filas del cálculo periodo a periodo original.
+    """
+
+    # (periodo, cuota, interes, amortizacion, saldo, prima, prima_calculo) del
+    # bucle original para 1000 al 5 % por periodo con prima de 1 %
+    ESPERADOS = {
+        (6, 2, 'parcial'): [
+            (1, 50.0, 50.0, 0, 1000, 0, 0),
+            (2, 50.0, 50.0, 0, 1000, 0, 0),
+            (3, 282.01, 50.0, 232.01, 767.99, 0, 0),
+            (4, 282.01, 38.4, 243.61, 524.38, 0, 0),
+            (5, 282.01, 26.22, 255.79, 268.58, 0, 0),
+            (6, 282.01, 13.43, 268.58, 0, 2.69, 10.0),
+        ],
+        (6, 2, 'total'): [
+            (1, 0, 0, 0, 1050.0, 0, 0),
+            (2, 0, 0, 0, 1102.5, 0, 0),
+            (3, 282.01, 55.12, 226.89, 875.61, 0, 0),
+            (4, 282.01, 43.78, 238.23, 637.38, 0, 0),
+            (5, 282.01, 31.87, 250.14, 387.24, 0, 0),
+            (6, 406.6, 19.36, 387.24, 0, 3.87, 10.0),
+        ],
+        (4, 3, 'total'): [
+            (1, 0, 0, 0, 1050.0, 0, 0),
+            (2, 0, 0, 0, 1102.5, 0, 0),
+            (3, 0, 0, 0, 1157.62, 0, 0),
+            (4, 1215.51, 57.88, 1157.62, 0, 11.58, 10.0),
+        ],
+        (4, 3, 'parcial'): [
+            (1, 50.0, 50.0, 0, 1000, 0, 0),
+            (2, 50.0, 50.0, 0, 1000, 0, 0),
+            (3, 50.0, 50.0, 0, 1000, 0, 0),
+            (4, 1050.0, 50.0, 1000.0, 0, 10.0, 10.0),
+        ],
+    }
+
+    def test_matches_original_rows(self):
+        for (periodos, gracia, tipo), esperados in self.ESPERADOS.items():
+            with self.subTest(periodos=periodos, gracia=gracia, tipo=tipo):
+                filas = build_schedule(1000, 0.05, periodos, gracia, tipo, 1.0).as_rows()
+                self.assertEqual(len(filas), len(esperados))
+                for fila, esperada in zip(filas, esperados):
+                    # Las fórmulas cerradas pueden redondear al otro lado un empate de medio céntimo
+                    for valor, valor_esperado in zip(fila.values(), esperada):
+                        self.assertAlmostEqual(valor, valor_esperado, delta=0.01 + 1e-9)
+
+    @staticmethod
+    def bucle_original(valor_nominal, tep, total_periodos, periodos_gracia, tipo_gracia):
+        """
+        (cuota, interes, amortizacion, saldo) del bucle original, en Decimal con
+        precisión suficiente: en float el propio bucle acumula error en
+        cronogramas largos, porque cada periodo multiplica el error por (1 + tep)
+        """
+        with localcontext() as contexto:
+            contexto.prec = 200
+            tasa = Decimal(repr(tep))
+            periodos_pago = total_periodos - periodos_gracia if tipo_gracia else total_periodos
+            cuota_constante = Decimal(valor_nominal) * tasa / (1 - (1 + tasa) ** -periodos_pago)
+            saldo = Decimal(valor_nominal)
+            filas = []
+            for periodo in range(1, total_periodos + 1):
+                interes = saldo * tasa
+                if periodo <= periodos_gracia:
+                    if tipo_gracia == 'total':
+                        cuota, amortizacion, interes_mostrado = 0, 0, 0
+                        saldo += interes
+                    else:
+                        cuota, amortizacion, interes_mostrado = interes, 0, interes
+                else:
+                    cuota, interes_mostrado = cuota_constante, interes
+                    amortizacion = cuota - interes
+                    saldo -= amortizacion
+                if periodo == total_periodos and saldo > Decimal('0.01'):
+                    amortizacion += saldo
+                    cuota = interes_mostrado + amortizacion
+                    saldo = 0
+                filas.append(tuple(float(valor) for valor in (cuota, interes_mostrado, amortizacion, saldo)))
+            return filas
+
+    def test_long_high_rate_schedules_keep_precision(self):
+        casos = [(720, 0.3, 0, None), (360, 0.1, 3, 'parcial'), (1200, 0.004, 12, 'parcial'),
+                 (120, 0.3, 0, None), (360, 0.3, 2, 'total')]
+        for periodos, tep, gracia, tipo in casos:
+            with self.subTest(periodos=periodos, tep=tep, gracia=gracia, tipo=tipo):
+                flujos = build_schedule(1000, tep, periodos, gracia, tipo)
+                columnas = zip(flujos.cuota.tolist(), flujos.interes.tolist(), flujos.amortizacion.tolist(), flujos.saldo.tolist())
+                for fila, esperada in zip(columnas, self.bucle_original(1000, tep, periodos, gracia, tipo)):
+                    for valor, valor_esperado in zip(fila, esperada):
+                        # Redondeo al céntimo; con gracia total el saldo crece sin límite y se compara en relativo
+                        self.assertAlmostEqual(valor, valor_esperado, delta=max(0.005 + 1e-9, abs(valor_esperado) * 1e-12))
+
+
+class CashFlowScheduleTests(SimpleTestCase):
+    """
+    Las columnas y los sub-cronogramas son vistas del mismo bloque de montos.
+    """
+
+    def test_columns_and_windows_share_the_block(self):
+        flujos = build_schedule(1000, 0.01, 24, prima_pct=1)
+        self.assertTrue(np.shares_memory(flujos.cuota, flujos.montos))
+        ventana = flujos[10:13]
+        self.assertTrue(np.shares_memory(ventana.montos, flujos.montos))
+        self.assertEqual(ventana.periodo.tolist(), [11, 12, 13])
+        self.assertEqual(list(ventana), flujos.as_rows(10, 13))
+        self.assertEqual(flujos[-1]['prima_calculo'], 10)
+
+    def test_round_trips(self):
+        flujos = build_schedule(1000, 0.01, 24, periodos_gracia=2, tipo_gracia='total')
+        self.assertEqual(CashFlowSchedule.from_dict(flujos.to_dict()).to_dict(), flujos.to_dict())
+        self.assertEqual(pickle.loads(pickle.dumps(flujos)).as_rows(), flujos.as_rows())
+
+
+class StreamingTests(SimpleTestCase):
+    """
+    El cálculo por bloques coincide con el cronograma completo.
+    """
+
+    def test_blocks_match_full_schedule(self):
+        completo = build_schedule(1000, 0.01, 50, periodos_gracia=3, tipo_gracia='total', prima_pct=1)
+        bloques = list(iter_schedule(1000, 0.01, 50, periodos_gracia=3, tipo_gracia='total', prima_pct=1, bloque=7))
+        self.assertEqual(len(bloques), 8)
+        filas = [fila for bloque in bloques for fila in bloque.as_rows()]
+        self.assertEqual(filas, completo.as_rows())
+
+    def test_metrics_match_full_calculation(self):
+        for gracia in (None, 'parcial', 'total'):
+            terms = case_terms(3, 12, gracia, 'ambos')
+            completo = calculate_bond_metrics(terms)
+            por_bloques = stream_bond_metrics(terms, ventana=(30, 40), bloque=5)
+            for clave in ESCALARES:
+                self.assertAlmostEqual(por_bloques[clave], completo[clave], places=6, msg=clave)
+            self.assertEqual(por_bloques['flujos'].as_rows(), completo['flujos'].as_rows(30, 40))
+            self.assertEqual(por_bloques['total_periodos'], len(completo['flujos']))
+
+
+@override_settings(FINBALANCE_COMPUTE_WORKERS=0)
+class BondDetailTests(TestCase):
+    """
+    La página de detalle muestra una página del cronograma; el gráfico recibe
+    el cronograma completo por columnas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('analista', password='clave')
+        cls.bond = Bond.objects.create(
+            valor_nominal=Decimal('1000'), valor_comercial=Decimal('1050'), num_anios=10,
+            frecuencia_cupon=12, dias_por_anio=360, tipo_tasa_interes='efectiva',
+            tasa_interes=Decimal('8'), tasa_anual_descuento=Decimal('6'), impuesto_renta=Decimal('30'),
+            fecha_emision=date(2025, 1, 1),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_table_is_paginated(self):
+        respuesta = self.client.get(reverse('bonds:detail', args=[self.bond.id]), {'pagina': 2})
+        self.assertEqual(respuesta.context['total_periodos'], 120)
+        self.assertEqual([fila['periodo'] for fila in respuesta.context['flujos']], list(range(61, 121)))
+
+    def test_schedule_json_is_columnar(self):
+        url = reverse('bonds:schedule_json', args=[self.bond.id])
+        respuesta = self.client.get(url)
+        datos = respuesta.json()
+        self.assertEqual(set(datos), {'periodo', 'interes', 'amortizacion', 'prima'})
+        self.assertEqual(len(datos['periodo']), 120)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+
+    def test_chart_returns_304_for_matching_etag(self):
+        cache.clear()
+        url = reverse('bonds:chart', args=[self.bond.id, 'svg'])
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', respuesta.content)
+        with mock.patch('bonds.views.render_recovery_chart') as render:
+            repetida = self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(repetida['ETag'], respuesta['ETag'])
+        self.assertFalse(render.called)
+        # Otro formato es otra representación
+        self.assertNotEqual(self.client.get(reverse('bonds:chart', args=[self.bond.id, 'png']))['ETag'], respuesta['ETag'])
+
+    @mock.patch('bonds.engine.streaming.UMBRAL_STREAMING', 100)
+    def test_long_schedules_keep_only_a_window(self):
+        cache.clear()
+        # Las métricas en caché traen sólo la ventana; no deben llegar a otras pruebas
+        self.addCleanup(cache.clear)
+        respuesta = self.client.get(reverse('bonds:detail', args=[self.bond.id]), {'pagina': 2})
+        completo = bond_schedule(self.bond)
+        self.assertEqual(respuesta.context['total_periodos'], 120)
+        self.assertEqual(respuesta.context['flujos'], completo.as_rows(60, 120))
+        esperadas = calculate_bond_metrics(self.bond)
+        self.assertAlmostEqual(respuesta.context['precio_actual'], esperadas['precio_actual'], places=6)
+
+        # La instantánea guarda sólo la ventana; el gráfico recibe el cronograma completo
+        snapshot = BondMetrics.objects.get(bond=self.bond)
+        self.assertEqual(snapshot.flujos['periodo'], list(range(VENTANA[0] + 1, VENTANA[1] + 1)))
+        datos = self.client.get(reverse('bonds:schedule_json', args=[self.bond.id])).json()
+        self.assertEqual(datos['periodo'], completo.periodo.tolist())
+
+    def test_simulation_runs_in_executor(self):
+        respuesta = self.client.get(reverse('bonds:api_simulation', args=[self.bond.id]),
+                                    {'trayectorias': 500, 'volatilidad': 2, 'semilla': 3})
+        esperado = simulate(self.bond.terms(), trayectorias=500, volatilidad=2, semilla=3)
+        self.assertAlmostEqual(respuesta.json()['media'], esperado['media'], places=8)
+        self.assertEqual(self.client.get(reverse('bonds:sensitivity', args=[self.bond.id])).status_code, 200)
+
+
+class ExportTests(TestCase):
+    """
+    Las exportaciones se envían por bloques; bajo ASGI el contenido es asíncrono.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('analista', password='clave')
+        cls.bond = Bond.objects.create(
+            valor_nominal=Decimal('1000'), valor_comercial=Decimal('1050'), num_anios=10,
+            frecuencia_cupon=12, dias_por_anio=360, tipo_tasa_interes='efectiva',
+            tasa_interes=Decimal('8'), tasa_anual_descuento=Decimal('6'), impuesto_renta=Decimal('30'),
+            fecha_emision=date(2025, 1, 1),
+        )
+
+    def test_csv_rows(self):
+        self.client.force_login(self.user)
+        respuesta = self.client.get(reverse('bonds:export', args=[self.bond.id, 'csv']))
+        filas = list(csv.reader(io.StringIO(b''.join(respuesta.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(filas[0], ENCABEZADOS)
+        self.assertEqual([int(fila[1]) for fila in filas[1:]], list(range(1, 121)))
+        flujos = calculate_bond_metrics(self.bond)['flujos']
+        self.assertAlmostEqual(sum(float(fila[-1]) for fila in filas[1:]), float(flujos.flujo_total.sum()), places=6)
+
+    async def test_asgi_streams_async_content(self):
+        await self.async_client.aforce_login(self.user)
+        respuesta = await self.async_client.get(reverse('bonds:export_all', args=['csv']))
+        self.assertTrue(respuesta.is_async)
+        contenido = b''.join([bloque async for bloque in respuesta.streaming_content])
+        self.assertEqual(len(contenido.decode('utf-8-sig').splitlines()), 121)
+
+        respuesta = await self.async_client.get(reverse('bonds:export', args=[self.bond.id, 'xlsx']))
+        contenido = b''.join([bloque async for bloque in respuesta.streaming_content])
+        with zipfile.ZipFile(io.BytesIO(contenido)) as archivo:
+            self.assertIsNone(archivo.testzip())
+            self.assertIn('xl/worksheets/sheet1.xml', archivo.namelist())
+            self.assertEqual(archivo.read('xl/worksheets/sheet1.xml').count(b'<row '), 121)
+
+
+@override_settings(FINBALANCE_INSTRUMENTATION=True, FINBALANCE_COMPUTE_WORKERS=1)
+class InstrumentationTests(TestCase):
+    """
+    Las etapas medidas en el proceso de cálculo llegan a Server-Timing y a los histogramas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('admin', password='clave', is_staff=True)
+        cls.bond = Bond.objects.create(
+            valor_nominal=Decimal('1000'), valor_comercial=Decimal('1050'), num_anios=5,
+            frecuencia_cupon=2, dias_por_anio=360, tipo_tasa_interes='efectiva',
+            tasa_interes=Decimal('8'), tasa_anual_descuento=Decimal('6'), impuesto_renta=Decimal('30'),
+            fecha_emision=date(2025, 1, 1),
+        )
+
+    def setUp(self):
+        cache.clear()
+        instrumentation.REGISTRO.reset()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        instrumentation.enable(False)
+        get_executor().shutdown()
+
+    def test_child_stages_reach_header_and_prometheus(self):
+        respuesta = self.client.get(reverse('bonds:detail', args=[self.bond.id]))
+        etapas = dict(
+            parte.strip().split(';dur=') for parte in respuesta['Server-Timing'].split(',')
+        )
+        self.assertIn('cronograma', etapas)
+        self.assertIn('tcea_emisor', etapas)
+        self.assertGreaterEqual(float(etapas['total']), float(etapas['cronograma']))
+
+        texto = self.client.get(reverse('bonds:metrics')).content.decode()
+        self.assertIn('# TYPE finbalance_stage_seconds summary', texto)
+        self.assertIn('finbalance_stage_seconds_count{stage="cronograma"} 1', texto)
+        self.assertIn('finbalance_stage_seconds{stage="tcea_emisor",quantile="0.99"}', texto)
+
+    def test_capture_returns_samples_instead_of_recording(self):
+        def medir():
+            with instrumentation.stage('prueba'):
+                return 7
+
+        resultado, muestras = instrumentation.capture(True, medir)
+        self.assertEqual(resultado, 7)
+        self.assertEqual([nombre for nombre, _ in muestras], ['prueba'])
+        self.assertNotIn('prueba', instrumentation.REGISTRO.snapshot())
+        instrumentation.merge(muestras)
+        self.assertEqual(instrumentation.REGISTRO.snapshot()['prueba']['count'], 1)
+
+
+@override_settings(FINBALANCE_COMPUTE_WORKERS=0, FINBALANCE_COMPUTE_QUEUE=0)
+class ComputeExecutorTests(TestCase):
+    """
+    Con el ejecutor lleno las vistas de cálculo responden 503 en lugar de esperar.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('analista', password='clave')
+        cls.bond = Bond.objects.create(
+            valor_nominal=Decimal('1000'), valor_comercial=Decimal('1050'), num_anios=5,
+            frecuencia_cupon=2, dias_por_anio=360, tipo_tasa_interes='efectiva',
+            tasa_interes=Decimal('8'), tasa_anual_descuento=Decimal('6'), impuesto_renta=Decimal('30'),
+            fecha_emision=date(2025, 1, 1),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_saturated_executor_returns_503(self):
+        ejecutor = get_executor()
+        # Ocupa el único lugar (sin cola) como lo haría un cálculo en curso
+        self.assertTrue(ejecutor._lugares.acquire(blocking=False))
+        try:
+            for url in (reverse('bonds:detail', args=[self.bond.id]), reverse('bonds:chart', args=[self.bond.id, 'svg'])):
+                respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 503)
+                self.assertEqual(respuesta['Retry-After'], '5')
+            # El listado no usa el ejecutor
+            self.assertEqual(self.client.get(reverse('bonds:list')).status_code, 200)
+        finally:
+            ejecutor._lugares.release()
+        self.assertEqual(self.client.get(reverse('bonds:detail', args=[self.bond.id])).status_code, 200)
+
+    def test_full_queue_rejects_instead_of_waiting(self):
+        ejecutor = BoundedExecutor(workers=1, cola=0)
+        self.addCleanup(ejecutor.shutdown)
+
+        async def competir():
+            primera = asyncio.ensure_future(ejecutor.run(time.sleep, 0.5))
+            await asyncio.sleep(0)
+            with self.assertRaises(ComputeBusy):
+                await ejecutor.run(time.sleep, 0)
+            await primera
+            # Al terminar la primera tarea vuelve a haber lugar
+            await ejecutor.run(time.sleep, 0)
+
+        asyncio.run(competir())
+
+
+class IncrementalPlanTests(SimpleTestCase):
+    """
+    Al editar un bono sólo se recalculan las etapas cuyas entradas cambiaron.
+    """
+
+    def test_reuses_unaffected_stages(self):
+        almacen = MemoryStore()
+        terms = case_terms(5, 12, 'parcial', 'ambos')
+        _, recalculadas = calculate_incremental(terms, almacen)
+        self.assertEqual(len(recalculadas), 7)
+
+        terms.tasa_anual_descuento = Decimal('7.5')
+        metricas, recalculadas = calculate_incremental(terms, almacen)
+        self.assertEqual(recalculadas, ('valoracion',))
+        completo = calculate_bond_metrics(terms)
+        for clave in ESCALARES:
+            self.assertEqual(metricas[clave], completo[clave], msg=clave)
+
+    def test_cost_changes_only_rerun_costs_and_rates(self):
+        anterior = case_terms(5, 12, None, 'ambos')
+        nuevo = case_terms(5, 12, None, 'ambos')
+        nuevo.tipo_cavali = 'bonista'
+        self.assertEqual(plan(anterior, nuevo), ('costes', 'tcea_emisor', 'tcea_emisor_escudo', 'trea_bonista'))
+
+
+@override_settings(FINBALANCE_COMPUTE_WORKERS=0)
+class SnapshotTests(TestCase):
+    """
+    La instantánea de métricas se reutiliza mientras la huella del bono no cambie.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.bond = Bond.objects.create(
+            valor_nominal=Decimal('1000'), valor_comercial=Decimal('1050'), num_anios=5,
+            frecuencia_cupon=2, dias_por_anio=360, tipo_tasa_interes='efectiva',
+            tasa_interes=Decimal('8'), tasa_anual_descuento=Decimal('6'), impuesto_renta=Decimal('30'),
+            fecha_emision=date(2025, 1, 1),
+        )
+        self.calculos = []
+
+    def calcular(self, bond):
+        self.calculos.append(bond.fingerprint)
+        return calculate_bond_metrics(bond)
+
+    def cargar(self):
+        return Bond.objects.select_related('metricas').get(pk=self.bond.pk)
+
+    def test_input_change_invalidates_snapshot(self):
+        primera = get_bond_metrics(self.cargar(), self.calcular)
+        self.assertEqual(get_bond_metrics(self.cargar(), self.calcular)['precio_actual'], primera['precio_actual'])
+        self.assertEqual(len(self.calculos), 1)
+
+        Bond.objects.filter(pk=self.bond.pk).update(tasa_anual_descuento=Decimal('7'))
+        bond = self.cargar()
+        segunda = get_bond_metrics(bond, self.calcular)
+        self.assertEqual(len(self.calculos), 2)
+        self.assertLess(segunda['precio_actual'], primera['precio_actual'])
+        self.assertEqual(BondMetrics.objects.get(bond=bond).fingerprint, bond.fingerprint)
+
+    def test_engine_version_bump_invalidates_snapshot_and_cache(self):
+        cached_bond_metrics(self.cargar())
+        huella = BondMetrics.objects.get(bond=self.bond).fingerprint
+        STATS.reset()
+        cached_bond_metrics(self.cargar())
+        self.assertEqual((STATS.hits['metricas'], STATS.misses['metricas']), (1, 0))
+
+        with mock.patch('bonds.engine.ENGINE_VERSION', ENGINE_VERSION + 1), \
+                mock.patch('bonds.models.ENGINE_VERSION', ENGINE_VERSION + 1):
+            bond = self.cargar()
+            self.assertNotEqual(bond.fingerprint, huella)
+            cached_bond_metrics(bond)
+            self.assertEqual(STATS.misses['metricas'], 1)
+            snapshot = BondMetrics.objects.get(bond=bond)
+            self.assertEqual((snapshot.fingerprint, snapshot.engine_version), (bond.fingerprint, ENGINE_VERSION + 1))
+            get_bond_metrics(self.cargar(), self.calcular)
+        self.assertEqual(self.calculos, [])
+
+
+class BondUpdateTests(TestCase):
+    """
+    La edición guarda el bono y recalcula sólo lo que depende de los cambios.
+    """
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('analista'))
+        self.bond = Bond.objects.create(
+            valor_nominal=Decimal('1000'), valor_comercial=Decimal('1050'), num_anios=5,
+            frecuencia_cupon=12, dias_por_anio=360, tipo_tasa_interes='efectiva',
+            tasa_interes=Decimal('8'), tasa_anual_descuento=Decimal('6'), impuesto_renta=Decimal('30'),
+            fecha_emision=date(2025, 1, 1),
+        )
+
+    def test_form_is_prefilled(self):
+        respuesta = self.client.get(reverse('bonds:update', args=[self.bond.id]))
+        self.assertEqual(respuesta.context['form_data']['tasa_interes'], '8.00')
+        self.assertContains(respuesta, 'id="datos-bono"')
+
+    def test_noop_edit_reruns_nothing(self):
+        self.client.get(reverse('bonds:detail', args=[self.bond.id]))
+        datos = self.client.get(reverse('bonds:update', args=[self.bond.id])).context['form_data']
+        # 8.001 se guarda como 8.00: la huella en memoria debe ser la de la base de datos
+        datos['tasa_interes'] = '8.001'
+        STATS.reset()
+        respuesta = self.client.post(reverse('bonds:update', args=[self.bond.id]), datos, follow=True)
+        self.assertEqual([str(mensaje) for mensaje in respuesta.context['messages']],
+                         ["Bono actualizado; los cambios no afectan a las métricas."])
+        self.assertEqual(STATS.misses['etapas'], 0)
+        self.assertEqual(STATS.misses['metricas'], 0)
+        huella = self.bond.fingerprint
+        self.bond.refresh_from_db()
+        self.assertEqual(self.bond.fingerprint, huella)
+
+    def test_discount_rate_change_only_revalues(self):
+        self.client.get(reverse('bonds:detail', args=[self.bond.id]))
+        datos = self.client.get(reverse('bonds:update', args=[self.bond.id])).context['form_data']
+        datos['tasa_anual_descuento'] = '7'
+        STATS.reset()
+        respuesta = self.client.post(reverse('bonds:update', args=[self.bond.id]), datos, follow=True)
+        self.assertRedirects(respuesta, reverse('bonds:detail', args=[self.bond.id]))
+        self.assertEqual([str(mensaje) for mensaje in respuesta.context['messages']],
+                         ["Bono actualizado; se recalculó: precio y duración."])
+        self.assertEqual(STATS.misses['etapas'], 1)
+        self.bond.refresh_from_db()
+        self.assertEqual(self.bond.tasa_anual_descuento, Decimal('7'))
+        self.assertEqual(respuesta.context['precio_actual'], calculate_bond_metrics(self.bond)['precio_actual'])
+
+
+class BatchValuationTests(TestCase):
+    """
+    La revalorización por lotes guarda las mismas métricas que el cálculo de cada bono.
+    """
+
+    def setUp(self):
+        casos = [(5, 2, None, 'ambos'), (10, 12, 'total', 'emisor'), (3, 4, 'parcial', 'sin_costes'),
+                 (30, 1, None, 'emisor'), (1, 360, None, 'ambos')]
+        self.bonds = Bond.objects.bulk_create([
+            Bond(**{campo: valor for campo, valor in case_terms(*caso).to_dict().items() if campo != 'id'})
+            for caso in casos
+        ])
+
+    def test_batch_matches_single_valuation(self):
+        resultado = revalue_bonds(chunk_size=2)
+        self.assertEqual((resultado.leidos, resultado.calculados, resultado.errores), (5, 5, []))
+        for bond in Bond.objects.select_related('metricas').order_by('pk'):
+            with self.subTest(bond=bond.pk):
+                esperado = calculate_bond_metrics(bond)
+                guardado = bond.metricas.to_metrics()
+                self.assertEqual(bond.metricas.fingerprint, bond.fingerprint)
+                for clave in ESCALARES:
+                    if math.isnan(esperado[clave]):
+                        self.assertTrue(math.isnan(guardado[clave]))
+                    else:
+                        self.assertEqual(guardado[clave], esperado[clave])
+                self.assertEqual(guardado['flujos'].to_dict(), esperado['flujos'].to_dict())
+        # Con las instantáneas vigentes no queda nada por calcular
+        self.assertEqual(revalue_bonds(stale_only=True).calculados, 0)
+
+
+class CashFlowLedgerTests(TestCase):
+    """
+    Los flujos fechados se guardan al crear o editar un bono y se agregan en SQL.
+    """
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('analista'))
+        self.bond = Bond.objects.create(
+            valor_nominal=Decimal('1000'), valor_comercial=Decimal('1050'), num_anios=2,
+            frecuencia_cupon=12, dias_por_anio=360, tipo_tasa_interes='efectiva',
+            tasa_interes=Decimal('8'), tasa_anual_descuento=Decimal('6'), impuesto_renta=Decimal('30'),
+            fecha_emision=date(2025, 1, 31),
+        )
+        sync_cash_flows([self.bond])
+
+    def test_payment_dates_follow_calendar_months(self):
+        fechas = payment_dates(date(2025, 1, 31), 12, 360, 3).tolist()
+        self.assertEqual(fechas, [date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)])
+        self.assertEqual(payment_dates(date(2025, 1, 1), 360, 360, 2).tolist(), [date(2025, 1, 2), date(2025, 1, 3)])
+
+    def test_rows_match_schedule(self):
+        flujos = calculate_bond_metrics(self.bond)['flujos']
+        filas = list(self.bond.flujos_caja.order_by('periodo'))
+        self.assertEqual(len(filas), 24)
+        self.assertEqual(filas[-1].fecha, date(2027, 1, 31))
+        self.assertAlmostEqual(sum(fila.flujo_total for fila in filas), float(flujos.flujo_total.sum()))
+
+    def test_ladder_aggregates_by_month(self):
+        escalera = cash_flow_ladder(date(2025, 2, 1), date(2025, 4, 1))
+        self.assertEqual([fila['pagos'] for fila in escalera], [1, 1])
+        totales = cash_flow_totals(date(2025, 2, 1), date(2025, 4, 1))
+        self.assertAlmostEqual(totales['flujo_total'], sum(fila['flujo_total'] for fila in escalera))
+        respuesta = self.client.get(reverse('bonds:ladder'), {'desde': '2025-01-01', 'agrupar': 'anio'})
+        self.assertEqual(len(respuesta.context['escalera']), 1)
+
+    def test_update_resyncs_only_when_schedule_changes(self):
+        datos = self.client.get(reverse('bonds:update', args=[self.bond.id])).context['form_data']
+        datos['tasa_anual_descuento'] = '7'
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(reverse('bonds:update', args=[self.bond.id]), datos)
+        self.assertFalse(any('bonds_cashflow' in consulta['sql'] for consulta in consultas.captured_queries))
+        datos['num_anios'] = '3'
+        self.client.post(reverse('bonds:update', args=[self.bond.id]), datos)
+        self.assertEqual(self.bond.flujos_caja.count(), 36)
+
+
+class PortfolioTests(TestCase):
+    """
+    Las métricas y la escalera de una cartera equivalen a las de sus flujos combinados.
+    """
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('analista'))
+        datos = dict(
+            valor_comercial=Decimal('1050'), frecuencia_cupon=12, dias_por_anio=360, tipo_tasa_interes='efectiva',
+            tasa_interes=Decimal('8'), impuesto_renta=Decimal('30'), fecha_emision=date(2025, 1, 1),
+        )
+        self.bonds = [
+            Bond.objects.create(valor_nominal=Decimal('1000'), num_anios=2, tasa_anual_descuento=Decimal('6'), **datos),
+            Bond.objects.create(valor_nominal=Decimal('5000'), num_anios=5, tasa_anual_descuento=Decimal('9'), **datos),
+        ]
+        sync_cash_flows(self.bonds)
+        self.cantidades = [2.0, 0.5]
+        self.portfolio = Portfolio.objects.create(nombre='Renta fija')
+        for bond, cantidad in zip(self.bonds, self.cantidades):
+            PortfolioBond.objects.create(portfolio=self.portfolio, bond=bond, cantidad=Decimal(str(cantidad)))
+        # Otra cartera con el mismo bono no debe alterar los montos de la primera
+        otra = Portfolio.objects.create(nombre='Otra')
+        PortfolioBond.objects.create(portfolio=otra, bond=self.bonds[0], cantidad=Decimal('10'))
+
+    def test_metrics_match_combined_flows(self):
+        valor = tiempo = 0.0
+        for bond, cantidad in zip(self.bonds, self.cantidades):
+            flujos = calculate_bond_metrics(bond)['flujos']
+            factores = (1 + float(bond.tasa_anual_descuento) / 100) ** (-flujos.periodo / bond.frecuencia_cupon)
+            vp = cantidad * flujos.flujo_total * factores
+            valor += vp.sum()
+            tiempo += vp @ (flujos.periodo / bond.frecuencia_cupon)
+        self.assertEqual(stale_members(self.portfolio), [bond.pk for bond in self.bonds])
+        self.assertEqual(portfolio_metrics(self.portfolio)['desactualizados'], 2)
+        self.assertEqual(async_to_sync(arefresh_members)(self.portfolio), [])
+        self.assertEqual(stale_members(self.portfolio), [])
+        metricas = portfolio_metrics(self.portfolio)
+        self.assertAlmostEqual(metricas['valor_presente'], valor, places=6)
+        self.assertAlmostEqual(metricas['duracion'], tiempo / valor, places=9)
+        self.assertAlmostEqual(sum(posicion['peso'] for posicion in metricas['posiciones']), 1.0)
+        self.assertEqual((metricas['desactualizados'], metricas['excluidos']), (0, 0))
+
+    def test_stale_members_are_found_in_sql(self):
+        revalue_bonds()
+        self.assertEqual(stale_members(self.portfolio), [])
+        # Editar un bono deja su instantánea atrás; otra versión del motor, todas
+        self.bonds[1].save()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(stale_members(self.portfolio), [self.bonds[1].pk])
+        self.assertEqual(len(consultas), 1)
+        with mock.patch('bonds.snapshots.ENGINE_VERSION', ENGINE_VERSION + 1):
+            self.assertEqual(len(stale_members(self.portfolio)), 2)
+        self.assertEqual(revalue_bonds(stale_only=True).leidos, 1)
+        self.assertEqual(stale_members(self.portfolio), [])
+
+    def test_too_many_stale_members_are_excluded(self):
+        self.assertEqual(async_to_sync(arefresh_members)(self.portfolio, limite=1), [])
+        metricas = portfolio_metrics(self.portfolio)
+        self.assertEqual((metricas['desactualizados'], metricas['valor_presente']), (2, 0.0))
+        self.assertTrue(all(math.isnan(posicion['precio_actual']) for posicion in metricas['posiciones']))
+
+    @override_settings(FINBALANCE_COMPUTE_WORKERS=0, FINBALANCE_COMPUTE_QUEUE=0)
+    def test_detail_view_refreshes_in_executor(self):
+        url = reverse('bonds:portfolio_detail', args=[self.portfolio.id])
+        # Un bono cuyo cálculo falla no rompe la página: queda fuera de los totales
+        invalido = Bond.objects.create(
+            valor_nominal=Decimal('1000'), valor_comercial=Decimal('1050'), num_anios=2, frecuencia_cupon=0,
+            dias_por_anio=360, tipo_tasa_interes='efectiva', tasa_interes=Decimal('8'),
+            tasa_anual_descuento=Decimal('6'), impuesto_renta=Decimal('30'), fecha_emision=date(2025, 1, 1),
+        )
+        PortfolioBond.objects.create(portfolio=self.portfolio, bond=invalido, cantidad=Decimal('1'))
+        ejecutor = get_executor()
+        self.assertTrue(ejecutor._lugares.acquire(blocking=False))
+        try:
+            self.assertEqual(self.client.get(url).status_code, 503)
+        finally:
+            ejecutor._lugares.release()
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['metricas']['desactualizados'], 1)
+        self.assertEqual(stale_members(self.portfolio), [invalido.pk])
+        self.assertContains(respuesta, 'revalue_bonds --stale-only')
+
+    def test_ladder_is_weighted_by_quantity(self):
+        totales = cash_flow_totals(portfolio=self.portfolio)
+        esperado = sum(
+            cantidad * sum(flujo.flujo_total for flujo in bond.flujos_caja.all())
+            for bond, cantidad in zip(self.bonds, self.cantidades)
+        )
+        self.assertAlmostEqual(totales['flujo_total'], esperado, places=6)
+        self.assertEqual(totales['pagos'], 24 + 60)
+        escalera = cash_flow_ladder(portfolio=self.portfolio, agrupar='anio')
+        self.assertEqual([fila['bonos'] for fila in escalera], [2, 2, 2, 1, 1, 1])
+
+    def test_detail_view(self):
+        respuesta = self.client.get(reverse('bonds:portfolio_detail', args=[self.portfolio.id]),
+                                    {'desde': '2025-01-01', 'hasta': '2026-01-01'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['total_posiciones'], 2)
+        self.assertEqual(len(respuesta.context['escalera']), 11)
+        self.assertContains(self.client.get(reverse('bonds:portfolio_list')), 'Renta fija')
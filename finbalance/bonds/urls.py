@@ -1,5 +1,5 @@
 # bonds/urls.py
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 app_name = 'bonds'  # ¡Esto es crucial para el namespace!
@@ -7,6 +7,23 @@ app_name = 'bonds'  # ¡Esto es crucial para el namespace!
 urlpatterns = [
     path('', views.bond_list, name='list'),
     path('crear/', views.bond_create, name='create'),
+    path('importar/', views.bond_import, name='import'),
+    path('flujos/', views.bond_ladder, name='ladder'),
+    path('carteras/', views.portfolio_list, name='portfolio_list'),
+    path('carteras/<int:portfolio_id>/', views.portfolio_detail, name='portfolio_detail'),
     path('<int:bond_id>/', views.bond_detail, name='detail'),
+    path('<int:bond_id>/editar/', views.bond_update, name='update'),
     path('<int:pk>/delete/', views.bond_delete, name='delete'),
+    path('<int:bond_id>/sensibilidad/', views.bond_sensitivity, name='sensitivity'),
+    path('<int:bond_id>/simulacion/', views.bond_simulation, name='simulation'),
+    re_path(r'^(?P<bond_id>\d+)/grafico\.(?P<formato>png|svg)$', views.bond_chart, name='chart'),
+    re_path(r'^(?P<bond_id>\d+)/flujos\.(?P<formato>csv|xlsx)$', views.bond_export, name='export'),
+    path('<int:bond_id>/flujos.json', views.bond_schedule_json, name='schedule_json'),
+    re_path(r'^exportar\.(?P<formato>csv|xlsx)$', views.bonds_export, name='export_all'),
+    path('api/', views.bonds_api, name='api_batch'),
+    path('api/<int:bond_id>/', views.bond_api, name='api'),
+    path('api/<int:bond_id>/sensibilidad/', views.bond_sensitivity_api, name='api_sensitivity'),
+    path('api/<int:bond_id>/simulacion/', views.bond_simulation_api, name='api_simulation'),
+    path('cache/', views.cache_stats, name='cache_stats'),
+    path('metricas/', views.instrumentation_metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,47 +1,46 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from .models import Bond
+from .forms import BondFilterForm, LadderForm, SensitivityForm, SimulationForm
+from .models import Bond, Portfolio
+from django.db.models import Count, DecimalField
+from .cache import (
+    abond_count_estimate, acached_bond_metrics, ainvalidate_bond_count, amemoize, aplanned_bond_metrics,
+    cached_bond_metrics, cached_bonds_metrics, cache_report, chart_key,
+    invalidate_bond_count, schedule_json_key, sensitivity_key, simulation_key,
+)
+from .compute import ComputeBusy, get_executor
+from .pagination import KeysetPaginator
+from django.contrib.admin.views.decorators import staff_member_required
 from django.utils import timezone
-from decimal import Decimal, ROUND_HALF_DOWN
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from decimal import Decimal
 import math
-from datetime import datetime, timedelta
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from .charts import CONTENT_TYPES, render_recovery_chart
+from .engine import instrumentation
+from .engine.instrumentation import stage
+from .engine.montecarlo import simulate
+from .engine.metrics import bond_schedule
+from .engine.planner import compute_stages, plan
+from .engine.sensitivity import rate_shocks, to_dict as sensitivity_dict
+from .engine.streaming import needs_streaming, stream_bond_metrics
+from . import api, exports
+from .importer import detect_format, import_bonds, read_rows
+from .ledger import MONTOS as MONTOS_ESCALERA, cash_flow_ladder, needs_sync, sync_cash_flows, upcoming_payments
+from .portfolios import arefresh_members, portfolio_metrics
+from functools import partial
+import hashlib
+import io
+import json
+import logging
+import time
 
-import base64
-from io import BytesIO
+logger = logging.getLogger(__name__)
 
 
-def generar_grafico_recuperacion(flujos):
-    # Preparar datos
-    periodos = [f['periodo'] for f in flujos]
-    saldo_pendiente = [float(f['saldo']) for f in flujos]
-    recuperado = [float(flujos[0]['saldo'] - f['saldo']) for f in flujos]  # Diferencia desde el inicial
-    
-    # Crear gráfico
-    plt.figure(figsize=(10, 5))
-    plt.plot(periodos, saldo_pendiente, label="Saldo Pendiente", color='red', marker='o')
-    plt.plot(periodos, recuperado, label="Dinero Recuperado", color='green', marker='o')
-    
-    # Personalizar
-    plt.title("Recuperación de Capital")
-    plt.xlabel("Periodos")
-    plt.ylabel("Monto ($)")
-    plt.grid(True)
-    plt.legend()
-    plt.xticks(periodos)
-    
-    # Convertir a imagen base64
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png')
-    plt.close()
-    buffer.seek(0)
-    image_png = buffer.getvalue()
-    buffer.close()
-    
-    return base64.b64encode(image_png).decode('utf-8')
-
 def calcular_vna(tasa_descuento, flujos):
     """Calcula el Valor Neto Actual (VNA) similar a la función de Excel"""
     vna = Decimal('0')
@@ -49,462 +48,676 @@ def calcular_vna(tasa_descuento, flujos):
         vna += flujo / (1 + tasa_descuento)**periodo
     return vna
 
+# Columnas que muestra el listado de bonos
+LIST_FIELDS = ('id', 'fecha_registro', 'valor_nominal', 'valor_comercial', 'tasa_interes')
+BONOS_POR_PAGINA = 25
+
+# Columnas del listado que se pueden ordenar desde el encabezado
+COLUMNAS_ORDENABLES = ('fecha_registro', 'valor_nominal', 'tasa_interes')
+
+async def _arender(request, plantilla, contexto):
+    """render() fuera del bucle de eventos (las plantillas pueden tocar la sesión o el usuario)"""
+    with stage('plantilla'):
+        return await sync_to_async(render)(request, plantilla, contexto)
+
+def _busy_response():
+    response = HttpResponse("El servidor está ocupado calculando otros bonos; reintente en unos segundos.",
+                            status=503, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = '5'
+    return response
+
+async def _calcular_etapas(terms, conocidas):
+    return await get_executor().run(compute_stages, terms, conocidas)
+
+async def _calcular_metricas(bond):
+    """
+    Métricas del bono: las etapas que no están en caché se calculan en el ejecutor
+    de procesos. Los cronogramas largos se calculan por bloques y sus métricas
+    traen sólo la primera página del cronograma
+    """
+    if needs_streaming(bond):
+        return await get_executor().run(stream_bond_metrics, bond.terms())
+    return await aplanned_bond_metrics(bond, _calcular_etapas)
+
+async def _cronograma(bond):
+    """
+    Cronograma completo del bono: el de sus métricas o, si es largo (sus métricas
+    guardan sólo una ventana), construido en el ejecutor sin guardarlo
+    """
+    if needs_streaming(bond):
+        return await get_executor().run(bond_schedule, bond.terms())
+    return (await acached_bond_metrics(bond, _calcular_metricas))['flujos']
+
 @login_required
-def bond_list(request):
-    bonds = Bond.objects.all().order_by('-fecha_registro')
-    return render(request, 'bonds/list.html', {'bonds': bonds})
+async def bond_list(request):
+    filtros = BondFilterForm(request.GET or None)
+    campo, descendente = filtros.ordering() if filtros.is_bound else ('fecha_registro', True)
+
+    bonds = Bond.objects.only(*LIST_FIELDS, campo)
+    if filtros.is_bound:
+        bonds = filtros.filter_queryset(bonds)
+    paginator = KeysetPaginator(bonds, campo, descendente=descendente, por_pagina=BONOS_POR_PAGINA)
+    pagina = await paginator.apage(despues=request.GET.get('despues'), antes=request.GET.get('antes'))
+
+    # Los enlaces de orden y de página conservan los filtros (pero no el cursor)
+    parametros = request.GET.copy()
+    for clave in ('despues', 'antes', 'orden'):
+        parametros.pop(clave, None)
+    querystring_filtros = parametros.urlencode()
+    parametros['orden'] = f"{'-' if descendente else ''}{campo}"
+    querystring_pagina = parametros.urlencode()
+
+    columnas = {}
+    for nombre in COLUMNAS_ORDENABLES:
+        activo = nombre == campo
+        columnas[nombre] = {
+            'activo': activo,
+            'descendente': activo and descendente,
+            # Un segundo clic invierte el orden de la columna activa
+            'orden': nombre if activo and descendente else f'-{nombre}',
+        }
+
+    con_filtros = filtros.is_bound and filtros.has_filters()
+    contexto = {
+        'bonds': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
+        'con_filtros': con_filtros,
+        'columnas': columnas,
+        'querystring_filtros': querystring_filtros,
+        'querystring_pagina': querystring_pagina,
+        # Contar los resultados filtrados costaría un recorrido adicional
+        'total_estimado': None if con_filtros else await abond_count_estimate(),
+    }
+    return await _arender(request, 'bonds/list.html', contexto)
+
+def _asignar_datos(bond, datos):
+    """Copia al bono los datos del formulario de alta/edición (ValueError/KeyError si faltan o no son válidos)"""
+    # Convertir el valor de plazo de gracia a booleano
+    tiene_plazo_gracia = datos.get('tiene_plazo_gracia') == 'si'
+
+    bond.valor_nominal = Decimal(datos['valor_nominal'])
+    bond.valor_comercial = Decimal(datos['valor_comercial'])
+    bond.num_anios = int(datos['num_anios'])
+    bond.frecuencia_cupon = int(datos['frecuencia_cupon'])
+    bond.dias_por_anio = int(datos['dias_por_anio'])
+    bond.tipo_tasa_interes = datos['tipo_tasa_interes']
+    bond.capitalizacion = int(datos['capitalizacion']) if datos['tipo_tasa_interes'] == 'nominal' else None
+    bond.tasa_interes = Decimal(datos['tasa_interes'])
+    bond.tasa_anual_descuento = Decimal(datos['tasa_anual_descuento'])
+    bond.impuesto_renta = Decimal(datos['impuesto_renta'])
+    bond.fecha_emision = datos['fecha_emision']
+    bond.porcentaje_prima = Decimal(datos.get('porcentaje_prima', 0))
+    bond.tipo_prima = datos.get('tipo_prima', 'emisor')
+    bond.porcentaje_estructuracion = Decimal(datos.get('porcentaje_estructuracion', 0))
+    bond.tipo_estructuracion = datos.get('tipo_estructuracion', 'emisor')
+    bond.porcentaje_colocacion = Decimal(datos.get('porcentaje_colocacion', 0))
+    bond.tipo_colocacion = datos.get('tipo_colocacion', 'emisor')
+    bond.porcentaje_flotacion = Decimal(datos.get('porcentaje_flotacion', 0))
+    bond.tipo_flotacion = datos.get('tipo_flotacion', 'emisor')
+    bond.porcentaje_cavali = Decimal(datos.get('porcentaje_cavali', 0))
+    bond.tipo_cavali = datos.get('tipo_cavali', 'emisor')
+    bond.tiene_plazo_gracia = tiene_plazo_gracia
+    bond.periodos_gracia = int(datos.get('periodos_gracia', 0)) if tiene_plazo_gracia else None
+    bond.tipo_gracia = datos.get('tipo_gracia') if tiene_plazo_gracia else None
+    return _normalizar(bond)
+
+def _normalizar(bond):
+    """
+    Deja los decimales y la fecha como quedarán al guardarse, para que la huella
+    en memoria sea la misma que tendrá el bono leído de la base de datos
+    """
+    for field in bond._meta.concrete_fields:
+        valor = getattr(bond, field.attname)
+        if isinstance(field, DecimalField) and valor is not None:
+            setattr(bond, field.attname, valor.quantize(Decimal(1).scaleb(-field.decimal_places), context=field.context))
+    bond.fecha_emision = bond._meta.get_field('fecha_emision').to_python(bond.fecha_emision)
+    return bond
+
+# Campos del formulario de alta/edición
+CAMPOS_FORMULARIO = (
+    'valor_nominal', 'valor_comercial', 'num_anios', 'frecuencia_cupon', 'dias_por_anio',
+    'tipo_tasa_interes', 'capitalizacion', 'tasa_interes', 'tasa_anual_descuento', 'impuesto_renta',
+    'fecha_emision', 'porcentaje_prima', 'tipo_prima', 'porcentaje_estructuracion', 'tipo_estructuracion',
+    'porcentaje_colocacion', 'tipo_colocacion', 'porcentaje_flotacion', 'tipo_flotacion',
+    'porcentaje_cavali', 'tipo_cavali', 'periodos_gracia', 'tipo_gracia',
+)
+
+def _datos_formulario(bond):
+    """Valores del bono como los envía el formulario (para rellenarlo al editar)"""
+    datos = {campo: getattr(bond, campo) for campo in CAMPOS_FORMULARIO}
+    datos = {campo: '' if valor is None else str(valor) for campo, valor in datos.items()}
+    datos['tiene_plazo_gracia'] = 'si' if bond.tiene_plazo_gracia else 'no'
+    return datos
 
 @login_required
-def bond_create(request):
+async def bond_create(request):
     if request.method == 'POST':
         try:
-            # Convertir el valor de plazo de gracia a booleano
-            tiene_plazo_gracia = request.POST.get('tiene_plazo_gracia') == 'si'
-            
-            bond = Bond(
-                valor_nominal=Decimal(request.POST['valor_nominal']),
-                valor_comercial=Decimal(request.POST['valor_comercial']),
-                num_anios=int(request.POST['num_anios']),
-                frecuencia_cupon=int(request.POST['frecuencia_cupon']),
-                dias_por_anio=int(request.POST['dias_por_anio']),
-                tipo_tasa_interes=request.POST['tipo_tasa_interes'],
-                capitalizacion=int(request.POST['capitalizacion']) if request.POST['tipo_tasa_interes'] == 'nominal' else None,
-                tasa_interes=Decimal(request.POST['tasa_interes']),
-                tasa_anual_descuento=Decimal(request.POST['tasa_anual_descuento']),
-                impuesto_renta=Decimal(request.POST['impuesto_renta']),
-                fecha_emision=request.POST['fecha_emision'],
-                porcentaje_prima=Decimal(request.POST.get('porcentaje_prima', 0)),
-                tipo_prima=request.POST.get('tipo_prima', 'emisor'),
-                porcentaje_estructuracion=Decimal(request.POST.get('porcentaje_estructuracion', 0)),
-                tipo_estructuracion=request.POST.get('tipo_estructuracion', 'emisor'),
-                porcentaje_colocacion=Decimal(request.POST.get('porcentaje_colocacion', 0)),
-                tipo_colocacion=request.POST.get('tipo_colocacion', 'emisor'),
-                porcentaje_flotacion=Decimal(request.POST.get('porcentaje_flotacion', 0)),
-                tipo_flotacion=request.POST.get('tipo_flotacion', 'emisor'),
-                porcentaje_cavali=Decimal(request.POST.get('porcentaje_cavali', 0)),
-                tipo_cavali=request.POST.get('tipo_cavali', 'emisor'),
-                tiene_plazo_gracia=tiene_plazo_gracia,
-                periodos_gracia=int(request.POST.get('periodos_gracia', 0)) if tiene_plazo_gracia else None,
-                tipo_gracia=request.POST.get('tipo_gracia') if tiene_plazo_gracia else None,
-                metodo_amortizacion='Francés',
-                fecha_registro=timezone.now()
-            )
-            bond.save()
+            bond = _asignar_datos(Bond(metodo_amortizacion='Francés', fecha_registro=timezone.now()), request.POST)
+            await bond.asave()
+            await sync_to_async(sync_cash_flows)([bond])
+            await ainvalidate_bond_count()
             return redirect('bonds:list')
             
         except Exception as e:
-            print(f"Error al crear bono: {str(e)}")
-            return render(request, 'bonds/create.html', {
+            logger.exception("Error al crear bono")
+            return await _arender(request, 'bonds/create.html', {
                 'error': f"Error al crear el bono: {str(e)}",
-                'form_data': request.POST
+                'form_data': request.POST.dict()
             })
     
-    return render(request, 'bonds/create.html')
+    return await _arender(request, 'bonds/create.html', {})
+
+# Nombres de las etapas del cálculo para los mensajes
+ETIQUETAS_ETAPAS = {
+    'tasas': 'tasas', 'costes': 'costes', 'cronograma': 'cronograma', 'valoracion': 'precio y duración',
+    'tcea_emisor': 'TCEA emisor', 'tcea_emisor_escudo': 'TCEA con escudo', 'trea_bonista': 'TREA bonista',
+}
+
+@login_required
+async def bond_update(request, bond_id):
+    """
+    Edición de un bono.
+
+    Al guardar se recalculan sólo las etapas cuyas entradas cambiaron (ver
+    engine.planner); las demás se leen de la caché, así que probar variantes
+    de un bono ya calculado es casi inmediato.
+    """
+    bond = await aget_object_or_404(Bond, id=bond_id)
+    if request.method == 'POST':
+        anterior = bond.terms()
+        try:
+            _asignar_datos(bond, request.POST)
+            await bond.asave()
+            if needs_sync(anterior, bond):
+                await sync_to_async(sync_cash_flows)([bond])
+        except Exception as e:
+            return await _arender(request, 'bonds/create.html', {
+                'bond': bond,
+                'error': f"Error al actualizar el bono: {str(e)}",
+                'form_data': request.POST.dict(),
+            })
+
+        recalculadas = plan(anterior, bond)
+        try:
+            with stage('metricas'):
+                await acached_bond_metrics(bond, _calcular_metricas)
+        except ComputeBusy:
+            # El detalle las calculará cuando haya lugar en el ejecutor
+            pass
+        if recalculadas:
+            messages.info(request, f"Bono actualizado; se recalculó: {', '.join(ETIQUETAS_ETAPAS[nombre] for nombre in recalculadas)}.")
+        else:
+            messages.info(request, "Bono actualizado; los cambios no afectan a las métricas.")
+        return redirect('bonds:detail', bond_id=bond.id)
+
+    return await _arender(request, 'bonds/create.html', {'bond': bond, 'form_data': _datos_formulario(bond)})
+
 
+# Errores de importación que se muestran en la página
+MAX_ERRORES_IMPORTACION = 100
+
+@login_required
+def bond_import(request):
+    """
+    Importa bonos en bloque desde un archivo CSV o JSON subido por el usuario
+    """
+    context = {}
+    if request.method == 'POST' and 'archivo' in request.FILES:
+        subido = request.FILES['archivo']
+        inicio = time.perf_counter()
+        try:
+            archivo = io.TextIOWrapper(subido.file, encoding='utf-8-sig', newline='')
+            resultado = import_bonds(read_rows(archivo, detect_format(subido.name)))
+        except (ValueError, UnicodeDecodeError) as e:
+            context['error'] = f"No se pudo leer el archivo: {e}"
+        else:
+            invalidate_bond_count()
+            context.update({
+                'resultado': resultado,
+                'errores': resultado.errores[:MAX_ERRORES_IMPORTACION],
+                'segundos': time.perf_counter() - inicio,
+            })
+    return render(request, 'bonds/import.html', context)
 
 @login_required
 def bond_delete(request, pk):
     bond = get_object_or_404(Bond, pk=pk)
     if request.method == 'POST':
         bond.delete()
+        invalidate_bond_count()
         return redirect('bonds:list')  # Redirige a la lista de bonos
     return render(request, 'bonds/bond_confirm_delete.html', {'bond': bond})
 
-def calculate_bond_metrics(bond):
+# Pagos que muestra la escalera de flujos bajo la tabla
+PROXIMOS_PAGOS = 20
+
+@login_required
+def bond_ladder(request):
     """
-    Calcula todas las métricas financieras para un bono usando el método francés
+    Escalera de flujos de caja de todos los bonos por mes o año, con los totales
+    del rango y los próximos pagos (consultas agregadas sobre CashFlow)
     """
-    # Cálculos básicos
-    periodos_por_anio = bond.frecuencia_cupon
-    total_periodos = bond.num_anios * periodos_por_anio
-    dias_capitalizacion = bond.dias_por_anio // periodos_por_anio
-    
-    # Convertir a float para cálculos matemáticos
-    tasa_interes = float(bond.tasa_interes)
-    tasa_descuento = float(bond.tasa_anual_descuento)
-    valor_comercial = float(bond.valor_comercial)  # ← AGREGAR ESTA LÍNEA
-    
-    # Cálculo de tasas
-    if bond.tipo_tasa_interes == 'efectiva':
-        tea = tasa_interes / 100
-    else:  # nominal
-        capitalizacion = bond.capitalizacion or 1
-        tea = (1 + (tasa_interes / 100) / capitalizacion) ** capitalizacion - 1
-    
-    # Tasa efectiva por periodo
-    tep = (1 + tea) ** (1 / periodos_por_anio) - 1
-    
-    # COK (Costo de oportunidad del capital)
-    cok_anual = tasa_descuento / 100
-    cok_periodo = (1 + cok_anual) ** (1 / periodos_por_anio) - 1
-    
-    # Cálculo de costes
-    costes_data = calculate_costes(bond)
-    costes_bonista = costes_data['bonista']
-    
-    # Generar flujos de caja
-    flujos = generate_cash_flows(bond, tep, total_periodos)
-    
-    # Cálculo del precio actual (valor presente)
-    precio_actual = calculate_present_value(flujos, cok_periodo)
-    
-   # Cálculo de duración y convexidad (ahora devuelve 4 valores)
-    duracion, convexidad, duracion_modificada, total_ratios = calculate_duration_convexity(flujos, cok_periodo, periodos_por_anio)
-    
-    # Cálculo de TCEAs y TREA
-    tcea_emisor = calculate_tcea_emisor(bond, flujos, costes_data)
-    tcea_emisor_escudo = calculate_tcea_emisor_escudo(bond, flujos, costes_data)
-    trea_bonista = calculate_trea_bonista(bond, flujos, costes_data)
-    
-    # Utilidad/Pérdida (ahora ambos son float)
-    utilidad = -float(bond.valor_comercial) - costes_bonista + precio_actual
-    
-    
-    return {
-        'bond': bond,
-        'periodos_por_anio': periodos_por_anio,
-        'periodo_nombre': get_periodo_name(periodos_por_anio),
-        'dias_capitalizacion': dias_capitalizacion,
-        'tea': tea * 100,
-        'tep': tep * 100,
-        'cok_periodo': cok_periodo * 100,
-        'flujos': flujos,
-        'precio_actual': precio_actual,
-        'utilidad': utilidad,
-        'duracion': duracion,
-        'convexidad': convexidad,
-        'duracion_modificada': duracion_modificada,
-        'total_ratios': total_ratios,  # Usar el valor calculado
-        'tcea_emisor': tcea_emisor * 100,
-        'tcea_emisor_escudo': tcea_emisor_escudo * 100,
-        'trea_bonista': trea_bonista * 100,
-        'costes_emisor': costes_data['emisor'],
-        'costes_bonista': costes_data['bonista'],
-    }
+    form = LadderForm(request.GET or None)
+    desde, hasta, agrupar = form.range(timezone.localdate())
+    context = {'form': form, **_escalera(desde, hasta, agrupar)}
+    with stage('plantilla'):
+        return render(request, 'bonds/ladder.html', context)
+
+def _escalera(desde, hasta, agrupar, portfolio=None):
+    """Contexto de la escalera de flujos (de todos los bonos o de una cartera)"""
+    with stage('escalera'):
+        escalera = cash_flow_ladder(desde, hasta, agrupar=agrupar, portfolio=portfolio)
+        maximo = max((abs(fila['flujo_total']) for fila in escalera), default=0)
+        for fila in escalera:
+            fila['ancho'] = abs(fila['flujo_total']) / maximo * 100 if maximo else 0
+        return {
+            'desde': desde,
+            'hasta': hasta,
+            'agrupar': agrupar,
+            'escalera': escalera,
+            # Los totales del rango son la suma de las filas de la escalera (sin otra consulta)
+            'totales': {clave: sum(fila[clave] for fila in escalera) for clave in ('pagos', *MONTOS_ESCALERA)},
+            'proximos': upcoming_payments(desde, hasta, limite=PROXIMOS_PAGOS, portfolio=portfolio),
+        }
+
+# Posiciones de mayor valor que muestra el detalle de una cartera
+POSICIONES_VISIBLES = 50
 
-def calculate_costes(bond):
+@login_required
+def portfolio_list(request):
+    carteras = Portfolio.objects.annotate(total_bonos=Count('posiciones'))
+    return render(request, 'bonds/portfolio_list.html', {'carteras': carteras})
+
+@login_required
+async def portfolio_detail(request, portfolio_id):
     """
-    Calcula los costes iniciales del emisor y bonista
+    Detalle de una cartera: valor presente, duración y convexidad de sus flujos
+    combinados y su escalera de flujos ponderada por la cantidad de cada bono.
+
+    Las métricas que falten (hasta un lote de bonos) se calculan antes en el
+    ejecutor acotado; con el ejecutor lleno se responde 503.
     """
-    valor_comercial = float(bond.valor_comercial)
-    
-    costes_emisor = 0
-    costes_bonista = 0
-    
-    
-    # Estructuración
-    estr_pct = float(bond.porcentaje_estructuracion or 0)
-    estr_monto = (estr_pct / 100) * valor_comercial
-    if bond.tipo_estructuracion == 'emisor':
-        costes_emisor += estr_monto
-    elif bond.tipo_estructuracion == 'bonista':
-        costes_bonista += estr_monto
-    elif bond.tipo_estructuracion == 'ambos':
-        costes_emisor += estr_monto
-        costes_bonista += estr_monto
-    
-    # Colocación
-    coloc_pct = float(bond.porcentaje_colocacion or 0)
-    coloc_monto = (coloc_pct / 100) * valor_comercial
-    if bond.tipo_colocacion == 'emisor':
-        costes_emisor += coloc_monto
-    elif bond.tipo_colocacion == 'bonista':
-        costes_bonista += coloc_monto
-    elif bond.tipo_colocacion == 'ambos':
-        costes_emisor += coloc_monto 
-        costes_bonista += coloc_monto 
-    
-    # Flotación
-    flot_pct = float(bond.porcentaje_flotacion or 0)
-    flot_monto = (flot_pct / 100) * valor_comercial
-    if bond.tipo_flotacion == 'emisor':
-        costes_emisor += flot_monto
-    elif bond.tipo_flotacion == 'bonista':
-        costes_bonista += flot_monto
-    elif bond.tipo_flotacion == 'ambos':
-        costes_emisor += flot_monto 
-        costes_bonista += flot_monto 
-    
-    # Cavali
-    cavali_pct = float(bond.porcentaje_cavali or 0)
-    cavali_monto = (cavali_pct / 100) * valor_comercial
-    if bond.tipo_cavali == 'emisor':
-        costes_emisor += cavali_monto
-    elif bond.tipo_cavali == 'bonista':
-        costes_bonista += cavali_monto
-    elif bond.tipo_cavali == 'ambos':
-        costes_emisor += cavali_monto 
-        costes_bonista += cavali_monto 
-    
-    return {
-        'emisor': costes_emisor,
-        'bonista': costes_bonista
-    }
+    portfolio = await aget_object_or_404(Portfolio, id=portfolio_id)
+    form = LadderForm(request.GET or None)
+    desde, hasta, agrupar = form.range(timezone.localdate())
+    try:
+        with stage('metricas_cartera'):
+            await arefresh_members(portfolio)
+    except ComputeBusy:
+        return _busy_response()
+
+    def contexto():
+        with stage('metricas_cartera'):
+            metricas = portfolio_metrics(portfolio)
+        posiciones = sorted(metricas.pop('posiciones'), key=lambda posicion: posicion['valor'], reverse=True)
+        for posicion in posiciones[:POSICIONES_VISIBLES]:
+            posicion['porcentaje'] = posicion['peso'] * 100
+        return {
+            'portfolio': portfolio,
+            'form': form,
+            'metricas': metricas,
+            'total_posiciones': len(posiciones),
+            'posiciones': posiciones[:POSICIONES_VISIBLES],
+            **_escalera(desde, hasta, agrupar, portfolio),
+        }
 
-def generate_cash_flows(bond, tep, total_periodos):
+    return await _arender(request, 'bonds/portfolio_detail.html', await sync_to_async(contexto)())
+
+# Filas de la tabla de amortización por página del detalle
+PERIODOS_POR_PAGINA = 60
+# Columnas del cronograma que usa el gráfico de flujos del detalle
+COLUMNAS_GRAFICO = ('periodo', 'interes', 'amortizacion', 'prima')
+
+@login_required
+async def bond_detail(request, bond_id):
     """
-    Genera los flujos de caja usando el método francés
+    Vista para mostrar el detalle del bono con todos los cálculos.
+
+    El cálculo de métricas corre en el ejecutor de procesos; si está saturado
+    se responde 503 en lugar de encolar sin límite. La tabla muestra una
+    página del cronograma y el gráfico pide las columnas a bond_schedule_json,
+    así la página pesa lo mismo sea cual sea el número de periodos. Si las
+    métricas no traen las filas de la página (cronogramas largos, ver
+    needs_streaming), sólo esas filas se construyen aparte.
     """
-    flujos = []
-    valor_nominal = float(bond.valor_nominal)
-    prima_pct = float(bond.porcentaje_prima or 0)
-    # La prima se calcula como porcentaje del valor nominal y se paga en el último período
-    prima_total = (prima_pct / 100) * valor_nominal
-    
-    # Verificar si hay periodo de gracia
-    periodos_gracia = 0
-    if bond.tiene_plazo_gracia:
-        periodos_gracia = bond.periodos_gracia or 0
-    
-    # Cálculo de la cuota constante (método francés)
-    if bond.tiene_plazo_gracia and bond.tipo_gracia == 'total':
-        # Periodo de gracia total: no se paga ni interés ni capital
-        periodos_pago = total_periodos - periodos_gracia
-        if periodos_pago > 0:
-            cuota_constante = (valor_nominal * tep) / (1 - (1 + tep) ** -periodos_pago)
-        else:
-            cuota_constante = 0
-    elif bond.tiene_plazo_gracia and bond.tipo_gracia == 'parcial':
-        # Periodo de gracia parcial: solo se paga interés
-        periodos_pago = total_periodos - periodos_gracia
-        if periodos_pago > 0:
-            cuota_constante = (valor_nominal * tep) / (1 - (1 + tep) ** -periodos_pago)
-        else:
-            cuota_constante = 0
+    bond = await aget_object_or_404(Bond, id=bond_id)
+    try:
+        with stage('metricas'):
+            metricas = await acached_bond_metrics(bond, _calcular_metricas)
+    except ComputeBusy:
+        return _busy_response()
+
+    flujos = metricas['flujos']
+    total_periodos = bond.num_anios * bond.frecuencia_cupon
+    total_paginas = max(1, math.ceil(total_periodos / PERIODOS_POR_PAGINA))
+    try:
+        pagina = min(max(int(request.GET.get('pagina', 1)), 1), total_paginas)
+    except ValueError:
+        pagina = 1
+    inicio = (pagina - 1) * PERIODOS_POR_PAGINA
+    fin = min(inicio + PERIODOS_POR_PAGINA, total_periodos)
+    if flujos.primer_periodo - 1 <= inicio and fin <= flujos.primer_periodo - 1 + len(flujos):
+        desde = inicio - flujos.primer_periodo + 1
+        filas = flujos.as_rows(desde, desde + fin - inicio)
     else:
-        # Sin periodo de gracia
-        cuota_constante = (valor_nominal * tep) / (1 - (1 + tep) ** -total_periodos)
-    
-    saldo_pendiente = valor_nominal
-    
-    for periodo in range(1, total_periodos + 1):
-        # Cálculo de interés
-        interes = saldo_pendiente * tep
-        
-        # Determinar tipo de periodo
-        if periodo <= periodos_gracia:
-            if bond.tipo_gracia == 'total':
-                # Periodo de gracia total
-                cuota = 0
-                amortizacion = 0
-                # El interés se capitaliza
-                saldo_pendiente += interes
-                interes_mostrado = 0
-            else:  # parcial
-                # Periodo de gracia parcial
-                cuota = interes
-                amortizacion = 0
-                interes_mostrado = interes
-        else:
-            # Periodo normal
-            cuota = cuota_constante
-            amortizacion = cuota - interes
-            saldo_pendiente -= amortizacion
-            interes_mostrado = interes
-        
-        # Ajustar último periodo para evitar saldo residual
-        if periodo == total_periodos and saldo_pendiente > 0.01:
-            amortizacion += saldo_pendiente
-            cuota = interes_mostrado + amortizacion
-            saldo_pendiente = 0
-        
-        # Asignar prima
-        prima_periodo = prima_total if periodo == total_periodos else 0
-        
-        # Prima mostrada
-        if periodo == total_periodos:
-            prima_mostrada = (prima_pct / 100) * amortizacion
-        else:
-            prima_mostrada = 0
-        
-        flujos.append({
-            'periodo': periodo,
-            'cuota': round(cuota, 2),
-            'interes': round(interes_mostrado, 2),
-            'amortizacion': round(amortizacion, 2),
-            'saldo': round(saldo_pendiente, 2),
-            'prima': round(prima_mostrada, 2),
-            'prima_calculo': round(prima_periodo, 2)
-        })
-    
-    return flujos
+        filas = bond_schedule(bond, inicio, fin).as_rows()
+    context = {
+        **metricas,
+        'bond': bond,
+        'flujos': filas,
+        'total_periodos': total_periodos,
+        'pagina': pagina,
+        'total_paginas': total_paginas,
+        'primer_periodo': inicio + 1,
+        'ultimo_periodo': inicio + len(filas),
+    }
+    return await _arender(request, 'bonds/detail.html', context)
 
-def calculate_present_value(flujos, cok_periodo):
+@login_required
+async def bond_schedule_json(request, bond_id):
     """
-    Calcula el valor presente de los flujos de caja
+    Cronograma en JSON por columnas (montos al céntimo) para el gráfico del detalle.
+
+    Se serializa una vez por huella y se guarda en caché; la ETag evita volver
+    a enviarlo si el navegador ya lo tiene.
     """
-    valor_presente = 0
-    for flujo in flujos:
-        prima_real = flujo.get('prima_calculo', flujo['prima'])
-        flujo_total = flujo['cuota'] + prima_real
-        valor_presente += flujo_total / ((1 + cok_periodo) ** flujo['periodo'])
-    
-    return valor_presente
+    bond = await aget_object_or_404(Bond, id=bond_id)
+    etag = quote_etag(f'{bond.fingerprint}-flujos')
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        async def serializar():
+            flujos = await _cronograma(bond)
+            return json.dumps(flujos.to_dict(COLUMNAS_GRAFICO, decimales=2), separators=(',', ':'))
+
+        try:
+            contenido = await amemoize('flujos_json', schedule_json_key(bond), serializar)
+        except ComputeBusy:
+            return _busy_response()
+        response = HttpResponse(contenido, content_type='application/json')
 
-def calculate_duration_convexity(flujos, cok_periodo, periodos_por_anio):
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=60 * 60 * 24)
+    return response
+
+@login_required
+async def bond_chart(request, bond_id, formato):
     """
-    Calcula la duración y convexidad del bono
+    Gráfico de recuperación de capital como imagen (PNG o SVG).
+
+    La ETag se deriva de la huella del bono: si el navegador ya tiene la imagen
+    se responde 304 sin renderizar; si no, se sirve desde la caché de gráficos.
     """
-    # Inicializar variables
-    duracion_numerador = Decimal('0')
-    valor_presente_total = Decimal('0')
-    convexidad_numerador = Decimal('0')
-    
-    for flujo in flujos:
-        prima_real = flujo.get('prima_calculo', flujo['prima'])
-        flujo_total = Decimal(str(flujo['cuota'])) + Decimal(str(prima_real))
-        factor_actualizacion = Decimal('1') / (Decimal('1') + Decimal(str(cok_periodo))) ** Decimal(str(flujo['periodo']))
-        vp_flujo = flujo_total * factor_actualizacion
-        
-        duracion_numerador += vp_flujo * Decimal(str(flujo['periodo']))
-        valor_presente_total += vp_flujo
-        convexidad_numerador += vp_flujo * Decimal(str(flujo['periodo'])) * (Decimal(str(flujo['periodo'])) + Decimal('1'))
-    
-    # Cálculo de duración (en años)
-    duracion = (duracion_numerador / valor_presente_total) / Decimal(str(periodos_por_anio))
-    
-    # Duración modificada
-    duracion_modificada = duracion / (Decimal('1') + Decimal(str(cok_periodo)))
-    
-    # Convexidad (en años)
-    convexidad = (convexidad_numerador / (valor_presente_total * (Decimal('1') + Decimal(str(cok_periodo)))**2)) / (Decimal(str(periodos_por_anio))**2)
-    
-    # Total ratios
-    total_ratios = duracion + convexidad
-    
-    return float(duracion), float(convexidad), float(duracion_modificada), float(total_ratios)
+    bond = await aget_object_or_404(Bond, id=bond_id)
+    etag = quote_etag(f'{bond.fingerprint}-{formato}')
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        async def render_chart():
+            flujos = await _cronograma(bond)
+            with stage('grafico'):
+                return await get_executor().run(render_recovery_chart, flujos, formato)
 
-def calculate_tcea_emisor(bond, flujos, costes_data):
+        try:
+            contenido = await amemoize('grafico', chart_key(bond, formato), render_chart)
+        except ComputeBusy:
+            return _busy_response()
+        response = HttpResponse(contenido, content_type=CONTENT_TYPES[formato])
+
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=60 * 60 * 24)
+    return response
+
+def _api_response(request, huellas, construir):
     """
-    Calcula la TCEA del emisor
+    Respuesta JSON condicional: 304 si la ETag coincide (sin calcular nada);
+    si no, el resultado de construir(campos, schedule)
     """
-    # Flujo inicial (ingreso neto para el emisor)
-    flujo_inicial = float(bond.valor_comercial) - costes_data['emisor']
-    
-    # Flujos futuros (egresos para el emisor)
-    flujos_futuros = []
-    for flujo in flujos:
-        prima_real = flujo.get('prima_calculo', flujo['prima'])
-        flujo_total = flujo['cuota'] + prima_real
-        flujos_futuros.append(-flujo_total)  # Negativo porque son egresos
-    
-    # Usar método de Newton-Raphson para encontrar la TIR
-    tir = newton_raphson_tir([flujo_inicial] + flujos_futuros)
-    
-    # Convertir a tasa anual
-    periodos_por_anio = len(flujos) / bond.num_anios
-    tcea = (1 + tir) ** periodos_por_anio - 1
-    
-    return tcea
+    try:
+        campos = api.parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    schedule = api.parse_flag(request.GET.get('schedule'))
+    etag = api.etag(huellas, campos, schedule)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(construir(campos, schedule), json_dumps_params={'ensure_ascii': False})
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
-def calculate_tcea_emisor_escudo(bond, flujos, costes_data):
+@login_required
+def bond_api(request, bond_id):
     """
-    Calcula la TCEA del emisor considerando el escudo fiscal
+    Métricas de un bono en JSON (?fields=tcea_emisor,duracion&schedule=1)
     """
-    # Flujo inicial
-    flujo_inicial = float(bond.valor_comercial) - costes_data['emisor']
-    
-    # Flujos futuros con escudo fiscal
-    flujos_futuros = []
-    impuesto_renta = float(bond.impuesto_renta or 0)
-    
-    for flujo in flujos:
-        interes_bruto = flujo['interes']
-        escudo_fiscal = interes_bruto * (impuesto_renta / 100)
-        interes_neto = interes_bruto - escudo_fiscal
-        prima_real = flujo.get('prima_calculo', flujo['prima'])
-        flujo_total = interes_neto + flujo['amortizacion'] + prima_real
-        flujos_futuros.append(-flujo_total)
-    
-    # Calcular TIR
-    tir = newton_raphson_tir([flujo_inicial] + flujos_futuros)
-    
-    # Convertir a tasa anual
-    periodos_por_anio = len(flujos) / bond.num_anios
-    tcea = (1 + tir) ** periodos_por_anio - 1
-    
-    return tcea
+    bond = Bond.objects.filter(id=bond_id).first()
+    if bond is None:
+        return JsonResponse({'error': f"No existe el bono {bond_id}"}, status=404)
+    return _api_response(
+        request, [bond.fingerprint],
+        lambda campos, schedule: api.metrics_payload(bond, cached_bond_metrics(bond), campos, schedule),
+    )
 
-def calculate_trea_bonista(bond, flujos, costes_data):
+@login_required
+def bonds_api(request):
     """
-    Calcula la TREA del bonista
+    Métricas de varios bonos en JSON (?ids=1,2,3); los ids inexistentes se listan aparte
     """
-    # Flujo inicial (egreso para el bonista)
-    flujo_inicial = -(float(bond.valor_comercial) + costes_data['bonista'])
-    
-    # Flujos futuros (ingresos para el bonista)
-    flujos_futuros = []
-    for flujo in flujos:
-        prima_real = flujo.get('prima_calculo', flujo['prima'])
-        flujo_total = flujo['cuota'] + prima_real
-        flujos_futuros.append(flujo_total)
-    
-    # Calcular TIR
-    tir = newton_raphson_tir([flujo_inicial] + flujos_futuros)
-    
-    # Convertir a tasa anual
-    periodos_por_anio = len(flujos) / bond.num_anios
-    trea = (1 + tir) ** periodos_por_anio - 1
-    
-    return trea
+    try:
+        ids = api.parse_ids(request.GET.get('ids'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    encontrados = Bond.objects.in_bulk(ids)
+    bonds = [encontrados[pk] for pk in ids if pk in encontrados]
+
+    def construir(campos, schedule):
+        metricas = cached_bonds_metrics(bonds)
+        return {
+            'bonos': [api.metrics_payload(bond, metricas[bond.id], campos, schedule) for bond in bonds],
+            'no_encontrados': [pk for pk in ids if pk not in encontrados],
+        }
+
+    # Los inexistentes también forman parte de la respuesta
+    huellas = [encontrados[pk].fingerprint if pk in encontrados else f'{pk}:-' for pk in ids]
+    return _api_response(request, huellas, construir)
+
+async def _sensitivity(bond, shocks):
+    """Curva de sensibilidad del bono sobre su cronograma en caché (calculada en el ejecutor)"""
+    async def calcular():
+        flujos = await _cronograma(bond)
+        with stage('sensibilidad'):
+            return await get_executor().run(partial(rate_shocks, bond.terms(), shocks, flujos=flujos))
+    return await amemoize('sensibilidad', sensitivity_key(bond, shocks), calcular)
+
+# Tamaño del gráfico SVG de la curva precio/rendimiento
+CURVA_ANCHO, CURVA_ALTO = 600, 220
+# Columnas (tasas de descuento) de la matriz de desplazamientos de la tasa de interés
+COLUMNAS_MATRIZ = 7
 
-def newton_raphson_tir(flujos):
+def _curve_points(x, y):
+    """Puntos de una polilínea SVG escalados al área del gráfico"""
+    x_min, x_max = float(x.min()), float(x.max())
+    y_min, y_max = float(y.min()), float(y.max())
+    ancho_x, ancho_y = (x_max - x_min) or 1.0, (y_max - y_min) or 1.0
+    return ' '.join(
+        f'{(xi - x_min) / ancho_x * CURVA_ANCHO:.1f},{CURVA_ALTO - (yi - y_min) / ancho_y * CURVA_ALTO:.1f}'
+        for xi, yi in zip(x.tolist(), y.tolist())
+    )
+
+@login_required
+async def bond_sensitivity(request, bond_id):
     """
-    Calcula la TIR usando el método de Newton-Raphson
+    Curva precio/rendimiento del bono ante desplazamientos de las tasas
     """
-    # Estimación inicial
-    r = 0.1
-    tolerance = 1e-10
-    max_iterations = 100
-    
-    for _ in range(max_iterations):
-        # Calcular VPN y su derivada
-        vpn = 0
-        vpn_derivada = 0
-        
-        for t, flujo in enumerate(flujos):
-            vpn += flujo / ((1 + r) ** t)
-            if t > 0:
-                vpn_derivada -= t * flujo / ((1 + r) ** (t + 1))
-        
-        # Verificar convergencia
-        if abs(vpn) < tolerance:
-            break
-        
-        # Actualizar estimación
-        if vpn_derivada != 0:
-            r_new = r - vpn / vpn_derivada
-        else:
-            break
-        
-        # Verificar convergencia en la tasa
-        if abs(r_new - r) < tolerance:
-            break
-        
-        r = r_new
-    
-    return r
+    bond = await aget_object_or_404(Bond, id=bond_id)
+    form = SensitivityForm(request.GET or None)
+    try:
+        s = await _sensitivity(bond, form.shocks())
+    except ComputeBusy:
+        return _busy_response()
 
-def get_periodo_name(periodos_por_anio):
+    campos = ('shocks_pb', 'rendimiento', 'precio', 'utilidad', 'duracion_modificada', 'convexidad',
+              'precio_aproximado', 'error_aproximacion')
+    escenarios = [dict(zip(campos, fila)) for fila in zip(*(s[campo].tolist() for campo in campos))]
+    n = len(s['shocks_pb'])
+    indices = sorted(set(range(0, n, max(1, (n - 1) // (COLUMNAS_MATRIZ - 1)))) | {n - 1})
+    context = {
+        'bond': bond,
+        'form': form,
+        'sensibilidad': s,
+        'escenarios': escenarios,
+        'curva_real': _curve_points(s['rendimiento'], s['precio']),
+        'curva_aproximada': _curve_points(s['rendimiento'], s['precio_aproximado']),
+        'curva_ancho': CURVA_ANCHO,
+        'curva_alto': CURVA_ALTO,
+        'matriz_columnas': [float(s['rendimiento'][i]) for i in indices],
+        'matriz_filas': [
+            (shock, [fila[i] for i in indices])
+            for shock, fila in zip(s['shocks_interes_pb'].tolist(), s['precios_interes'].tolist())
+        ],
+    }
+    return await _arender(request, 'bonds/sensitivity.html', context)
+
+@login_required
+async def bond_sensitivity_api(request, bond_id):
     """
-    Obtiene el nombre del periodo según la frecuencia
+    Sensibilidad del bono en JSON (?desde=-300&hasta=300&paso=5, en puntos básicos)
     """
-    periodo_names = {
-        1: 'anual',
-        2: 'semestral',
-        3: 'cuatrimestral',
-        4: 'trimestral',
-        6: 'bimestral',
-        12: 'mensual',
-        360: 'diario'
+    bond = await Bond.objects.filter(id=bond_id).afirst()
+    if bond is None:
+        return JsonResponse({'error': f"No existe el bono {bond_id}"}, status=404)
+    form = SensitivityForm(request.GET or None)
+    if form.is_bound and not form.is_valid():
+        return JsonResponse({'error': form.errors.get_json_data()}, status=400)
+    shocks = form.shocks()
+    etag = quote_etag(f'{bond.fingerprint}-sensibilidad-{shocks[0]}-{shocks[-1]}-{len(shocks)}')
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            response = JsonResponse({'id': bond.id, **sensitivity_dict(await _sensitivity(bond, shocks))})
+        except ComputeBusy:
+            return _busy_response()
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+async def _simulation(bond, parametros):
+    """Simulación Monte Carlo del bono sobre su cronograma en caché (calculada en el ejecutor)"""
+    async def calcular():
+        flujos = await _cronograma(bond)
+        with stage('simulacion'):
+            return await get_executor().run(partial(simulate, bond.terms(), flujos=flujos, **parametros))
+    return await amemoize('simulacion', simulation_key(bond, parametros), calcular)
+
+# Tamaño del histograma SVG de la simulación
+HISTOGRAMA_ANCHO, HISTOGRAMA_ALTO = 600, 220
+
+def _histogram_bars(histograma):
+    """Rectángulos (x, y, ancho, alto) del histograma escalados al área del gráfico"""
+    conteos = histograma['conteos']
+    ancho = HISTOGRAMA_ANCHO / len(conteos)
+    maximo = max(conteos) or 1
+    return [
+        (f'{i * ancho:.1f}', f'{HISTOGRAMA_ALTO - c / maximo * HISTOGRAMA_ALTO:.1f}', f'{ancho:.1f}', f'{c / maximo * HISTOGRAMA_ALTO:.1f}')
+        for i, c in enumerate(conteos)
+    ]
+
+def _histogram_x(histograma, valor):
+    bordes = histograma['bordes']
+    return f'{(valor - bordes[0]) / ((bordes[-1] - bordes[0]) or 1.0) * HISTOGRAMA_ANCHO:.1f}'
+
+@login_required
+async def bond_simulation(request, bond_id):
+    """
+    Distribución del valor del bono bajo trayectorias de tasas simuladas
+    """
+    bond = await aget_object_or_404(Bond, id=bond_id)
+    form = SimulationForm(request.GET or None)
+    try:
+        resultado = await _simulation(bond, form.parameters())
+    except ComputeBusy:
+        return _busy_response()
+    histograma = resultado['histograma']
+    context = {
+        'bond': bond,
+        'form': form,
+        'resultado': resultado,
+        'percentiles': sorted(resultado['percentiles'].items()),
+        'riesgos': [(nivel, resultado['var'][nivel], resultado['cvar'][nivel]) for nivel in sorted(resultado['var'])],
+        'barras': _histogram_bars(histograma),
+        'x_precio_base': _histogram_x(histograma, resultado['precio_base']),
+        'x_var95': _histogram_x(histograma, resultado['percentiles'][5]),
+        'histograma_ancho': HISTOGRAMA_ANCHO,
+        'histograma_alto': HISTOGRAMA_ALTO,
     }
-    return periodo_names.get(periodos_por_anio, 'período')
+    return await _arender(request, 'bonds/simulation.html', context)
+
+@login_required
+async def bond_simulation_api(request, bond_id):
+    """
+    Simulación Monte Carlo del bono en JSON (mismos parámetros que la página)
+    """
+    bond = await Bond.objects.filter(id=bond_id).afirst()
+    if bond is None:
+        return JsonResponse({'error': f"No existe el bono {bond_id}"}, status=404)
+    form = SimulationForm(request.GET or None)
+    if form.is_bound and not form.is_valid():
+        return JsonResponse({'error': form.errors.get_json_data()}, status=400)
+    parametros = form.parameters()
+    # La simulación es determinista para una semilla dada
+    etag = quote_etag(hashlib.sha256(simulation_key(bond, parametros).encode('utf-8')).hexdigest())
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            response = JsonResponse({'id': bond.id, 'parametros': parametros, **await _simulation(bond, parametros)})
+        except ComputeBusy:
+            return _busy_response()
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def _export_response(request, bonds, formato, nombre):
+    # Bajo ASGI un generador síncrono se acumularía entero antes de enviarse
+    exportar = exports.aexport_schedules if isinstance(request, ASGIRequest) else exports.export_schedules
+    response = StreamingHttpResponse(exportar(bonds, formato), content_type=exports.CONTENT_TYPES[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+    return response
 
 @login_required
-def bond_detail(request, bond_id):
+def bond_export(request, bond_id, formato):
     """
-    Vista para mostrar el detalle del bono con todos los cálculos
+    Descarga el cronograma de pagos de un bono en CSV o XLSX
     """
     bond = get_object_or_404(Bond, id=bond_id)
-    context = calculate_bond_metrics(bond)
-    return render(request, 'bonds/detail.html', context)
\ No newline at end of file
+    return _export_response(request, [bond], formato, f'bono_{bond.id:03d}_flujos')
+
+@login_required
+def bonds_export(request, formato):
+    """
+    Descarga los cronogramas de todos los bonos que cumplen los filtros del listado
+    """
+    filtros = BondFilterForm(request.GET or None)
+    bonds = Bond.objects.order_by('pk')
+    if filtros.is_bound:
+        bonds = filtros.filter_queryset(bonds)
+    return _export_response(request, bonds, formato, 'bonos_flujos')
+
+@staff_member_required
+def cache_stats(request):
+    """
+    Estadísticas de la caché de métricas y gráficos (sólo staff)
+    """
+    return render(request, 'bonds/cache_stats.html', cache_report())
+
+@staff_member_required
+def instrumentation_metrics(request):
+    """
+    Percentiles de tiempo por etapa en formato de texto de Prometheus (sólo staff)
+    """
+    return HttpResponse(instrumentation.prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,31 @@
+"""
+Funciones que corren en los procesos del pool de revalorización.
+
+Los procesos se crean con 'spawn', así que no heredan las conexiones a la base
+del proceso principal. Este módulo no importa Django al cargarse: init_worker
+lo configura antes de la primera tarea.
+"""
+import os
+
+
+def init_worker(settings_module, nombre_bd):
+    """
+    Inicializa Django en el proceso, apuntando a la misma base que el principal
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = nombre_bd
+    import django
+    django.setup()
+
+
+def value_and_save(registros):
+    """
+    Valoriza un lote de registros y guarda sus instantáneas desde el propio proceso
+    """
+    from .batch import save_results
+    from .engine.batch import value_records
+
+    resultados, errores = value_records(registros)
+    save_results(resultados)
+    return len(resultados), errores
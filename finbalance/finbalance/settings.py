@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -55,11 +58,23 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'bonds.middleware.ServerTimingMiddleware',
     # "django_browser_reload.middleware.BrowserReloadMiddleware"
 ]
 
 ROOT_URLCONF = 'finbalance.urls'
 
+# Medición de tiempos por etapa (cabecera Server-Timing y /bonds/metricas/).
+# Desactivada por defecto: FINBALANCE_INSTRUMENTATION=1 para activarla.
+FINBALANCE_INSTRUMENTATION = os.environ.get('FINBALANCE_INSTRUMENTATION', '') == '1'
+
+# Pool de procesos para el cálculo de métricas, gráficos, sensibilidad y simulación de las vistas asíncronas:
+# procesos y tareas que pueden esperar antes de responder 503 (0 procesos: en línea)
+FINBALANCE_COMPUTE_WORKERS = int(os.environ.get('FINBALANCE_COMPUTE_WORKERS', 2))
+FINBALANCE_COMPUTE_QUEUE = int(os.environ.get('FINBALANCE_COMPUTE_QUEUE', 8))
+# Prioridad (nice) de esos procesos respecto del servidor web
+FINBALANCE_COMPUTE_NICE = int(os.environ.get('FINBALANCE_COMPUTE_NICE', 10))
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -92,6 +107,55 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# FINBALANCE_CACHE_BACKEND: 'locmem' (por defecto), 'file', 'redis' o la ruta
+# completa de cualquier otro backend de Django (FINBALANCE_CACHE_URL = LOCATION).
+
+CACHE_BACKEND = os.environ.get('FINBALANCE_CACHE_BACKEND', 'locmem')
+CACHE_MAX_ENTRIES = int(os.environ.get('FINBALANCE_CACHE_MAX_ENTRIES', 1000))
+CACHE_MAX_BYTES = int(os.environ.get('FINBALANCE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+if CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'bonds.cache_backends.InstrumentedLocMemCache',
+            'LOCATION': 'finbalance',
+            'TIMEOUT': None,
+            'OPTIONS': {
+                'MAX_ENTRIES': CACHE_MAX_ENTRIES,
+                'MAX_BYTES': CACHE_MAX_BYTES,
+                'CULL_FREQUENCY': CACHE_MAX_ENTRIES,  # expulsar de a una entrada (LRU)
+            },
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('FINBALANCE_CACHE_URL', str(BASE_DIR / 'cache')),
+            'TIMEOUT': 60 * 60 * 24,
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+else:
+    if CACHE_BACKEND == 'redis':
+        # RedisCache importa el cliente recién en la primera consulta a la caché
+        try:
+            import redis  # noqa: F401
+        except ImportError:
+            raise ImproperlyConfigured(
+                "FINBALANCE_CACHE_BACKEND=redis necesita el paquete 'redis' (pip install -r requirements.txt)"
+            )
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache' if CACHE_BACKEND == 'redis' else CACHE_BACKEND,
+            'LOCATION': os.environ.get('FINBALANCE_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+            'TIMEOUT': 60 * 60 * 24,
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 